@@ -0,0 +1,67 @@
+"""
+Benchmark do tempo de importação de cada ponto de entrada.
+
+Cada ponto de entrada é importado em um processo Python novo, para medir a
+partida a frio: tempo de importação, RSS máximo do processo e quais
+dependências pesadas foram carregadas.
+
+Uso:
+    python benchmarks/bench_imports.py [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+ENTRY_POINTS = [
+    ('scraper', 'scrape_ad_from_url'),
+    ('analyzer', 'analyze_ad_creative'),
+    ('exporter', 'export_results'),
+]
+
+HEAVY_MODULES = ['requests', 'bs4', 'weasyprint', 'fpdf', 'markdown']
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+from {module} import {name}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'import_ms': elapsed * 1000,
+    'maxrss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'heavy': [m for m in {heavy!r} if m in sys.modules]
+}}))
+"""
+
+
+def probe(module, name):
+    """Importa um ponto de entrada em um processo novo e retorna as medições."""
+    code = PROBE.format(module=module, name=name, heavy=HEAVY_MODULES)
+    output = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=SRC_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'ponto de entrada':<22}{'import (ms)':>12}{'RSS (KiB)':>12}  dependências pesadas")
+    for module, name in ENTRY_POINTS:
+        runs = [probe(module, name) for _ in range(args.repeat)]
+        import_ms = statistics.median(r['import_ms'] for r in runs)
+        maxrss = statistics.median(r['maxrss_kib'] for r in runs)
+        heavy = ', '.join(runs[-1]['heavy']) or '-'
+        print(f"{name:<22}{import_ms:>12.2f}{maxrss:>12.0f}  {heavy}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark dos modos de PDF: WeasyPrint ('full') x fpdf2 ('draft').
+Modos cujo pacote não está instalado são ignorados.
+
+Uso:
+    python benchmarks/bench_pdf.py [--iterations 20]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from analyzer import analyze_ad_creative
+from exporter import ResultExporter, PDF_MODES
+
+SAMPLE_AD = {
+    'success': True,
+    'platform': 'meta',
+    'url': 'https://www.facebook.com/ads/library/?id=123',
+    'headline': 'Descubra o Segredo para Pele Jovem aos 50+',
+    'description': 'Este produto revolucionário está ajudando milhares de mulheres a recuperar a juventude da pele. Resultados visíveis em apenas 14 dias!',
+    'images': [],
+    'cta': 'Saiba Mais',
+    'landing_page': 'https://exemplo.com/produto'
+}
+
+
+def bench_mode(exporter, analysis, mode, iterations):
+    """Mede latência (ms) e pico de memória alocada (KiB) de um modo de PDF."""
+    # Aquecimento (fontes, caches internos)
+    exporter.render_pdf(SAMPLE_AD, analysis, mode=mode)
+
+    timings = []
+    tracemalloc.start()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        pdf_bytes = exporter.render_pdf(SAMPLE_AD, analysis, mode=mode)
+        timings.append((time.perf_counter() - start) * 1000)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'mode': mode,
+        'mean_ms': statistics.mean(timings),
+        'p95_ms': timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0],
+        'peak_kib': peak / 1024,
+        'size_kib': len(pdf_bytes) / 1024
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    exporter = ResultExporter(output_dir=None)
+    analysis = analyze_ad_creative(SAMPLE_AD)
+
+    print(f"{'modo':<8}{'média (ms)':>12}{'p95 (ms)':>12}{'pico (KiB)':>12}{'PDF (KiB)':>12}")
+    for mode in PDF_MODES:
+        try:
+            r = bench_mode(exporter, analysis, mode, args.iterations)
+        except ImportError as e:
+            # Modo sem o pacote instalado (ex.: weasyprint no 'full'): os demais continuam
+            print(f"{mode:<8}  ignorado: pacote opcional ausente: {e.name or e}")
+            continue
+        print(f"{r['mode']:<8}{r['mean_ms']:>12.1f}{r['p95_ms']:>12.1f}{r['peak_kib']:>12.0f}{r['size_kib']:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,400 @@
+"""
+Suíte de benchmarks de ponta a ponta: scraper, analisador e exportador.
+
+Roda sobre fixtures locais geradas na hora (páginas pequenas e de vários MB por
+plataforma, servidas pelo replay.FixtureServer no caso de scraping completo).
+Cada caso roda em um processo Python novo e reporta vazão, latências p50/p95/p99
+e RSS máximo. Os resultados podem ser gravados como baseline e comparados nas
+execuções seguintes; o script termina com código 1 se algum caso piorar além do
+limite, se algum caso falhar ou se não houver baseline. Só casos que dependem de
+um pacote opcional ausente (ex.: weasyprint) são ignorados.
+
+Uso:
+    python benchmarks/bench_suite.py [--only scrape] [--scale 0.2]
+    python benchmarks/bench_suite.py --save-baseline
+    python benchmarks/bench_suite.py --threshold 0.15
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baselines.json')
+SRC_DIR = os.path.join(BENCH_DIR, '..', 'src')
+
+# URL de cada plataforma usada nas fixtures
+PLATFORM_URLS = {
+    'meta': 'https://www.facebook.com/ads/library/?id=1234567890',
+    'taboola': 'https://trc.taboola.com/bench/ad',
+    'outbrain': 'https://widgets.outbrain.com/bench/ad',
+    'generic': 'https://loja-exemplo.com.br/produto/bench',
+}
+
+# Bloco característico de cada plataforma (seletores usados pelos extratores)
+PLATFORM_BLOCKS = {
+    'meta': (
+        '<div role="heading">Descubra o Segredo para Pele Jovem aos 50+</div>'
+        '<div data-ad-preview="message">Este produto revolucionário está ajudando milhares de mulheres '
+        'a recuperar a juventude da pele. Resultados visíveis em apenas 14 dias!</div>'
+        '<img src="https://scontent.xx.fbcdn.net/v/{i}.jpg">'
+        '<div aria-label="Saiba mais">Saiba mais</div>'
+        '<a href="https://l.facebook.com/l.php?u=https%3A%2F%2Fexemplo.com%2F{i}">link</a>'
+    ),
+    'taboola': (
+        '<h2 class="videoCube_title">Médicos ficam sem palavras com este truque simples</h2>'
+        '<img class="thumbnail" src="https://images.taboola.com/{i}.jpg">'
+        '<a class="videoCube_thumbnail_link" href="https://exemplo.com/oferta/{i}">ver</a>'
+    ),
+    'outbrain': (
+        '<span class="ob-rec-text">O método que especialistas não querem que você conheça</span>'
+        '<img class="ob-rec-image" src="https://images.outbrain.com/{i}.jpg">'
+        '<a class="ob-rec-link" href="https://exemplo.com/artigo/{i}">ler</a>'
+    ),
+    'generic': (
+        '<h1 class="product-title">Sérum Facial Rejuvenescedor Premium</h1>'
+        '<p class="product-description">Fórmula exclusiva com ácido hialurônico e vitamina C. '
+        'Garantia de 30 dias ou seu dinheiro de volta.</p>'
+        '<img class="product-image" src="/img/product-{i}.jpg">'
+        '<button class="buy-now">Comprar Agora</button>'
+    ),
+}
+
+# Conteúdo de preenchimento repetido nas páginas grandes
+FILLER_BLOCK = (
+    '<div class="feed-item"><span>Publicação patrocinada {i}</span>'
+    '<p>Conteúdo relacionado, comentários e marcação típica de uma página real de anúncios.</p>'
+    '<ul><li>item</li><li>item</li><li>item</li></ul></div>'
+)
+
+# Tamanho aproximado das páginas (bytes)
+PAGE_SIZES = {'small': 20 * 1024, 'large': 3 * 1024 * 1024}
+
+TEXT_FORMATS = ('html', 'markdown', 'landing_page')
+
+
+def build_page(platform, size):
+    """Gera uma página HTML sintética da plataforma com aproximadamente 'size' bytes."""
+    parts = [f"<html><head><title>Bench {platform}</title></head><body>", PLATFORM_BLOCKS[platform].format(i=0)]
+    total = sum(len(p) for p in parts)
+    i = 0
+    while total < size:
+        block = FILLER_BLOCK.format(i=i)
+        parts.append(block)
+        total += len(block)
+        i += 1
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+def fixture_url(platform, size):
+    return f"{PLATFORM_URLS[platform]}&size={size}" if '?' in PLATFORM_URLS[platform] else f"{PLATFORM_URLS[platform]}?size={size}"
+
+
+def write_fixtures(fixture_dir):
+    """Grava as páginas sintéticas de todas as plataformas e tamanhos no diretório de fixtures."""
+    from replay import FixtureStore
+
+    store = FixtureStore(fixture_dir)
+    for platform in PLATFORM_BLOCKS:
+        for size, nbytes in PAGE_SIZES.items():
+            store.add(fixture_url(platform, size), build_page(platform, nbytes).encode('utf-8'))
+    return store
+
+
+def build_corpus(count):
+    """Gera 'count' anúncios variados para os casos de análise e exportação."""
+    corpus = []
+    headlines = [
+        'Descubra o Segredo para Pele Jovem aos 50+',
+        'Últimas unidades com 70% OFF só hoje',
+        'Especialistas recomendam: o método comprovado para emagrecer',
+        'Você não vai acreditar no que aconteceu depois',
+    ]
+    for i in range(count):
+        corpus.append({
+            'success': True,
+            'platform': ('meta', 'taboola', 'outbrain', 'generic')[i % 4],
+            'url': f"https://exemplo.com/anuncio/{i}",
+            'headline': f"{headlines[i % len(headlines)]} #{i}",
+            'description': 'Este produto revolucionário está ajudando milhares de pessoas. '
+                           'Resultados visíveis em apenas 14 dias, garantia de satisfação!' * (1 + i % 3),
+            'images': [f"https://exemplo.com/img/{i}.jpg"],
+            'cta': 'Saiba Mais',
+            'landing_page': f"https://exemplo.com/produto/{i}",
+        })
+    return corpus
+
+
+# Casos: nome -> (função de preparo, iterações padrão).
+# O preparo recebe o diretório de fixtures e retorna a operação medida (sem argumentos).
+
+def _setup_extractor(platform, size):
+    def setup(fixture_dir):
+        from scraper import AdScraper
+        from replay import FixtureStore, fixture_key
+
+        url = fixture_url(platform, size)
+        _, body = FixtureStore(fixture_dir).get(fixture_key(url))
+        html = body.decode('utf-8')
+        scraper = AdScraper()
+        extractor = getattr(scraper, f"_scrape_{platform}_ad" if platform != 'generic' else '_scrape_generic_page')
+        return lambda: extractor(html, url)
+    return setup
+
+
+def _setup_scrape_replay(size):
+    def setup(fixture_dir):
+        from scraper import AdScraper
+        from replay import FixtureServer
+
+        server = FixtureServer(fixture_dir).start()
+        scraper = server.install(AdScraper())
+        urls = [fixture_url(platform, size) for platform in PLATFORM_BLOCKS]
+        state = {'i': 0}
+
+        def op():
+            url = urls[state['i'] % len(urls)]
+            state['i'] += 1
+            result = scraper.scrape_ad(url)
+            if not result.get('success'):
+                raise RuntimeError(result.get('error'))
+        return op
+    return setup
+
+
+def _setup_transport(shared):
+    # Só a camada HTTP: sessão nova por URL (como o antigo scrape_ad_from_url) vs. sessão reaproveitada.
+    # O servidor cobra um custo por conexão nova (handshake), evitado pelo keep-alive.
+    def setup(fixture_dir):
+        from scraper import AdScraper
+        from replay import FixtureServer
+
+        server = FixtureServer(fixture_dir, handshake=0.002).start()
+        urls = [fixture_url(platform, 'small') for platform in PLATFORM_BLOCKS]
+        state = {'i': 0, 'scraper': server.install(AdScraper())}
+
+        def op():
+            url = urls[state['i'] % len(urls)]
+            state['i'] += 1
+            scraper = state['scraper'] if shared else server.install(AdScraper())
+            scraper.session.get(url, timeout=15).raise_for_status()
+            if not shared:
+                scraper.session.close()
+        return op
+    return setup
+
+
+def _setup_analyze(fixture_dir):
+    from analyzer import CreativeAnalyzer
+
+    analyzer = CreativeAnalyzer()
+    corpus = build_corpus(1000)
+    state = {'i': 0}
+
+    def op():
+        analyzer.analyze_creative(corpus[state['i'] % len(corpus)])
+        state['i'] += 1
+    return op
+
+
+def _setup_variations(fixture_dir):
+    from analyzer import CreativeAnalyzer
+
+    analyzer = CreativeAnalyzer()
+    analyses = [analyzer.analyze_creative(ad) for ad in build_corpus(1000)]
+    state = {'i': 0}
+
+    def op():
+        analyzer.generate_variations(analyses[state['i'] % len(analyses)])
+        state['i'] += 1
+    return op
+
+
+def _setup_export(fmt, pdf_mode=None):
+    def setup(fixture_dir):
+        from analyzer import analyze_ad_creative
+        from exporter import ResultExporter
+
+        exporter = ResultExporter(output_dir=None)
+        ad = build_corpus(1)[0]
+        analysis = analyze_ad_creative(ad)
+        if fmt == 'pdf':
+            return lambda: exporter.render_pdf(ad, analysis, mode=pdf_mode)
+        return lambda: exporter.render(fmt, ad, analysis)
+    return setup
+
+
+CASES = {}
+for _platform in PLATFORM_BLOCKS:
+    CASES[f"extract_{_platform}_small"] = (_setup_extractor(_platform, 'small'), 50)
+    CASES[f"extract_{_platform}_large"] = (_setup_extractor(_platform, 'large'), 3)
+CASES['scrape_replay_small'] = (_setup_scrape_replay('small'), 40)
+CASES['scrape_replay_large'] = (_setup_scrape_replay('large'), 4)
+CASES['transport_new_session'] = (_setup_transport(False), 200)
+CASES['transport_shared_session'] = (_setup_transport(True), 200)
+CASES['analyze_creative'] = (_setup_analyze, 2000)
+CASES['generate_variations'] = (_setup_variations, 2000)
+for _fmt in TEXT_FORMATS:
+    CASES[f"export_{_fmt}"] = (_setup_export(_fmt), 200)
+CASES['export_pdf_full'] = (_setup_export('pdf', 'full'), 10)
+CASES['export_pdf_draft'] = (_setup_export('pdf', 'draft'), 50)
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_case(name, iterations, fixture_dir):
+    """Executa um caso no processo atual e retorna as medições."""
+    setup, _ = CASES[name]
+    op = setup(fixture_dir)
+    # Aquecimento (imports sob demanda, caches internos)
+    op()
+
+    timings = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter()
+        op()
+        timings.append(time.perf_counter() - t)
+    total = time.perf_counter() - start
+
+    timings.sort()
+    return {
+        'iterations': iterations,
+        'ops_per_s': iterations / total if total else 0.0,
+        'p50_ms': _percentile(timings, 0.50) * 1000,
+        'p95_ms': _percentile(timings, 0.95) * 1000,
+        'p99_ms': _percentile(timings, 0.99) * 1000,
+        'maxrss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def _missing_dependency(error):
+    """Mensagem de pacote opcional ausente, ou None se o erro for uma falha de verdade do caso."""
+    if isinstance(error, ModuleNotFoundError) and error.name:
+        # Um módulo do próprio projeto ausente é falha, não dependência opcional
+        if not os.path.exists(os.path.join(SRC_DIR, error.name.split('.')[0] + '.py')):
+            return f"pacote opcional ausente: {error.name}"
+    if isinstance(error, RuntimeError) and 'requer o pacote' in str(error):
+        return str(error)
+    return None
+
+
+def run_isolated(name, iterations, fixture_dir):
+    """Executa um caso em um processo novo (RSS máximo isolado por caso)."""
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--run-case', name,
+         '--iterations', str(iterations), '--fixtures', fixture_dir],
+        capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        # Falha do caso: reporta sem interromper a suíte, mas a execução termina com erro
+        lines = completed.stderr.strip().splitlines()
+        return {'failed': lines[-1] if lines else f"código {completed.returncode}"}
+    # Casos ignorados (dependência opcional ausente) também saem com código 0
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, threshold):
+    """Retorna a lista de regressões (caso, métrica, baseline, atual) além do limite relativo."""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base or 'skipped' in current or 'failed' in current or 'skipped' in base or 'failed' in base:
+            continue
+        if current['ops_per_s'] < base['ops_per_s'] * (1 - threshold):
+            regressions.append((name, 'ops_per_s', base['ops_per_s'], current['ops_per_s']))
+        for metric in ('p95_ms', 'maxrss_kib'):
+            if current[metric] > base[metric] * (1 + threshold):
+                regressions.append((name, metric, base[metric], current[metric]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--only', help='roda apenas os casos cujo nome contém este texto')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplica as iterações de cada caso')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='grava os resultados como nova baseline')
+    parser.add_argument('--threshold', type=float, default=0.2, help='piora relativa tolerada (0.2 = 20%%)')
+    parser.add_argument('--fixtures', help='diretório de fixtures (padrão: temporário)')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    parser.add_argument('--iterations', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        try:
+            result = run_case(args.run_case, args.iterations, args.fixtures)
+        except (ImportError, RuntimeError) as e:
+            missing = _missing_dependency(e)
+            if missing is None:
+                raise
+            result = {'skipped': missing}
+        print(json.dumps(result))
+        return 0
+
+    fixture_dir = args.fixtures or tempfile.mkdtemp(prefix='spy-bench-')
+    try:
+        write_fixtures(fixture_dir)
+        names = [name for name in CASES if not args.only or args.only in name]
+
+        results = {}
+        print(f"{'caso':<26}{'ops/s':>10}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}{'RSS (MiB)':>11}")
+        for name in names:
+            iterations = max(1, int(CASES[name][1] * args.scale))
+            r = results[name] = run_isolated(name, iterations, fixture_dir)
+            if 'skipped' in r:
+                print(f"{name:<26}  ignorado: {r['skipped']}")
+            elif 'failed' in r:
+                print(f"{name:<26}  FALHOU: {r['failed']}")
+            else:
+                print(f"{name:<26}{r['ops_per_s']:>10.1f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+                      f"{r['p99_ms']:>10.2f}{r['maxrss_kib'] / 1024:>11.1f}")
+    finally:
+        if not args.fixtures:
+            shutil.rmtree(fixture_dir, ignore_errors=True)
+
+    failed = [name for name, r in results.items() if 'failed' in r]
+    if failed:
+        print(f"\nCasos com falha: {', '.join(failed)}")
+        return 1
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"\nBaseline gravada em {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nSem baseline em {args.baseline}: grave uma com --save-baseline")
+        return 1
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        regressions = compare(results, json.load(f), args.threshold)
+    if regressions:
+        print(f"\nRegressões acima de {args.threshold:.0%}:")
+        for name, metric, base, current in regressions:
+            print(f"  {name}: {metric} {base:.2f} -> {current:.2f}")
+        return 1
+    print(f"\nNenhuma regressão acima de {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
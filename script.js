@@ -73,6 +73,9 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     };
     
+    // Resultado retornado pela API (null quando os dados de exemplo estão em uso)
+    let currentResult = null;
+    
     // Manipulação de eventos
     urlForm.addEventListener('submit', function(e) {
         e.preventDefault();
@@ -90,18 +93,54 @@ document.addEventListener('DOMContentLoaded', function() {
         // Mostra o loading
         showLoading();
         
-        // Simula uma chamada de API (em um ambiente real, isso seria uma chamada fetch)
-        setTimeout(() => {
-            // Atualiza os dados mockados com a URL inserida
-            mockData.adData.url = url;
-            
-            // Preenche os resultados com os dados mockados
-            fillResults(mockData.adData, mockData.analysisResult);
-            
-            // Esconde o loading e mostra os resultados
-            hideLoading();
-            showResults();
-        }, 2000);
+        // Chama o serviço local (src/server.py); sem ele (ex.: deploy estático), usa os dados de exemplo
+        fetch('/api/process', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ url: url })
+        })
+            // Falha de rede: o serviço local não está rodando
+            .catch(() => null)
+            .then(response => {
+                // Sem resposta ou sem a rota da API (deploy estático): dados de exemplo
+                if (!response || response.status === 404 || response.status === 405) {
+                    return null;
+                }
+                return response.json()
+                    .catch(() => ({}))
+                    .then(data => response.ok ? data : {
+                        success: false,
+                        error: data.error || `Erro do servidor (HTTP ${response.status})`
+                    });
+            })
+            .then(data => {
+                if (data === null) {
+                    // Atualiza os dados mockados com a URL inserida
+                    mockData.adData.url = url;
+                    currentResult = null;
+                    
+                    // Preenche os resultados com os dados mockados
+                    fillResults(mockData.adData, mockData.analysisResult);
+                    
+                    // Esconde o loading e mostra os resultados
+                    hideLoading();
+                    showResults();
+                    return;
+                }
+                if (!data.success) {
+                    hideLoading();
+                    showError(data.error || 'Não foi possível analisar o anúncio');
+                    return;
+                }
+                currentResult = { adData: data.ad_data, analysisResult: data.analysis_result };
+                fillResults(data.ad_data, data.analysis_result);
+                hideLoading();
+                showResults();
+            })
+            .catch(error => {
+                hideLoading();
+                showError(`Erro ao analisar o anúncio: ${error.message}`);
+            });
     });
     
     // Navegação por tabs
@@ -120,10 +159,10 @@ document.addEventListener('DOMContentLoaded', function() {
     });
     
     // Eventos de download
-    pdfBtn.addEventListener('click', () => simulateDownload('PDF'));
-    htmlBtn.addEventListener('click', () => simulateDownload('HTML'));
-    markdownBtn.addEventListener('click', () => simulateDownload('Markdown'));
-    landingBtn.addEventListener('click', () => simulateDownload('Landing Page'));
+    pdfBtn.addEventListener('click', () => download('pdf', 'PDF'));
+    htmlBtn.addEventListener('click', () => download('html', 'HTML'));
+    markdownBtn.addEventListener('click', () => download('markdown', 'Markdown'));
+    landingBtn.addEventListener('click', () => download('landing_page', 'Landing Page'));
     
     // Funções auxiliares
     function showError(message) {
@@ -199,6 +238,65 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
+    function download(format, label) {
+        if (!currentResult) {
+            simulateDownload(label);
+            return;
+        }
+        
+        fetch('/api/export', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                ad_data: currentResult.adData,
+                analysis_result: currentResult.analysisResult,
+                format: format
+            })
+        })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                // PDF é gerado em um job assíncrono: consulta o status até concluir
+                if (response.status === 202) {
+                    return response.json().then(job => waitForJob(job.status_url));
+                }
+                return response;
+            })
+            .then(response => saveResponse(response))
+            .catch(error => showError(`Erro ao exportar ${label}: ${error.message}`));
+    }
+    
+    function waitForJob(statusUrl) {
+        return fetch(statusUrl)
+            .then(response => response.json())
+            .then(job => {
+                if (job.status === 'done') {
+                    return fetch(job.result_url);
+                }
+                if (job.status === 'error') {
+                    throw new Error(job.error);
+                }
+                return new Promise(resolve => setTimeout(resolve, 1000)).then(() => waitForJob(statusUrl));
+            });
+    }
+    
+    function saveResponse(response) {
+        const disposition = response.headers.get('Content-Disposition') || '';
+        const match = disposition.match(/filename="([^"]+)"/);
+        const filename = match ? match[1] : 'spy-criativos';
+        
+        return response.blob().then(blob => {
+            const link = document.createElement('a');
+            link.href = URL.createObjectURL(blob);
+            link.download = filename;
+            document.body.appendChild(link);
+            link.click();
+            link.remove();
+            URL.revokeObjectURL(link.href);
+        });
+    }
+    
     function simulateDownload(format) {
         alert(`Download do arquivo em formato ${format} iniciado!\n\nEm um ambiente de produção, isso baixaria o arquivo real.`);
     }
@@ -0,0 +1,269 @@
+"""
+Módulo com a API assíncrona (asyncio) do scraper, do analisador e do exportador.
+As requisições HTTP são de fato assíncronas (httpx.AsyncClient), de modo que um
+único event loop mantém milhares de extrações em andamento; a análise do HTML, a
+pontuação dos ângulos e a geração de PDF rodam em executores configuráveis, sem
+bloquear o loop. Toda chamada aceita um tempo limite próprio e pode ser cancelada.
+
+Uso:
+    async with AsyncAdScraper() as scraper:
+        async for result in scraper.scrape_many(urls, concurrency=1000):
+            ...
+"""
+
+import asyncio
+import threading
+
+import metrics
+import transport
+
+# Parâmetros padrão do cliente assíncrono
+DEFAULT_MAX_CONNECTIONS = 1000
+DEFAULT_MAX_KEEPALIVE = 200
+DEFAULT_TIMEOUT = 15
+
+# Instâncias síncronas usadas dentro dos executores (uma por thread ou processo)
+_local = threading.local()
+
+
+def _parse_html(html_content, url, platform):
+    """Extração no executor; função de módulo para funcionar também em ProcessPoolExecutor."""
+    scraper = getattr(_local, 'scraper', None)
+    if scraper is None:
+        from scraper import AdScraper
+        scraper = _local.scraper = AdScraper()
+    with metrics.registry.timer('spy_parse_duration_seconds', platform=platform):
+        return scraper.parse_html(html_content, url, platform)
+
+
+def _export_to_pdf(output_dir, pdf_mode, ad_data, analysis_result, mode):
+    from exporter import ResultExporter
+    return ResultExporter(output_dir, pdf_mode=pdf_mode).export_to_pdf(ad_data, analysis_result, mode=mode)
+
+
+def _export_all(output_dir, pdf_mode, ad_data, analysis_result, force):
+    from exporter import ResultExporter
+    return ResultExporter(output_dir, pdf_mode=pdf_mode).export_all(ad_data, analysis_result, force=force)
+
+
+async def _offload(executor, timeout, func, *args):
+    """
+    Executa func no executor (None = executor padrão do loop) com tempo limite.
+    No tempo limite ou no cancelamento, tarefas ainda na fila do executor são
+    descartadas; as que já começaram terminam em segundo plano.
+    """
+    future = asyncio.get_running_loop().run_in_executor(executor, func, *args)
+    if timeout:
+        return await asyncio.wait_for(future, timeout)
+    return await future
+
+
+def _timeout_error(stage, timeout, **fields):
+    metrics.record_error(stage, 'TimeoutError')
+    return dict({'success': False, 'timeout': True, 'error': f"Tempo limite de {timeout}s excedido"}, **fields)
+
+
+class AsyncAdScraper:
+    """Classe para extração assíncrona de anúncios (rede no event loop, análise do HTML em executor)."""
+
+    def __init__(self, archive=None, executor=None, timeout=DEFAULT_TIMEOUT, max_connections=DEFAULT_MAX_CONNECTIONS,
+                 max_keepalive=DEFAULT_MAX_KEEPALIVE, http2=False):
+        """
+        executor recebe a análise do HTML (None = executor padrão do loop; um
+        ProcessPoolExecutor evita disputar o GIL com o loop). timeout é o limite
+        padrão de cada extração (rede + análise), sobreposto por chamada.
+        max_connections limita as conexões abertas e max_keepalive as mantidas
+        ociosas para reaproveitamento. http2=True requer 'httpx[http2]'.
+        archive (um snapshots.SnapshotArchive) recebe o HTML de cada página.
+        """
+        try:
+            import httpx
+        except ImportError:
+            raise RuntimeError("O modo assíncrono requer o pacote 'httpx'")
+        from scraper import AdScraper
+
+        self._httpx = httpx
+        self._scraper = AdScraper(archive=archive)
+        self.archive = archive
+        self.executor = executor
+        self.timeout = timeout
+
+        # Cache de DNS só quando ativado no transporte (transport.configure(dns_ttl=...))
+        config = transport.get_transport()
+        if config.dns_ttl:
+            transport.dns_cache(config.dns_ttl).install()
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            headers=self._scraper.headers,
+            follow_redirects=True,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+        return False
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def scrape_ad(self, url, etag=None, last_modified=None, timeout=None):
+        """
+        Versão assíncrona de AdScraper.scrape_ad (mesmo formato de resultado).
+        Estourado o tempo limite, retorna um erro com 'timeout': True; o
+        cancelamento da tarefa é propagado normalmente (CancelledError).
+        """
+        timeout = timeout or self.timeout
+        platform = self._scraper.identify_platform(url)
+        try:
+            return await asyncio.wait_for(self._scrape_ad(url, platform, etag, last_modified), timeout)
+        except asyncio.TimeoutError:
+            return _timeout_error('scrape', timeout, platform=platform, url=url)
+
+    async def _scrape_ad(self, url, platform, etag, last_modified):
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        with metrics.stage_timer('scrape', platform):
+            try:
+                response = await self.client.get(url, headers=headers or None)
+                if response.status_code == 304:
+                    return {
+                        'success': True,
+                        'not_modified': True,
+                        'platform': platform,
+                        'url': url,
+                        'etag': etag,
+                        'last_modified': last_modified
+                    }
+                response.raise_for_status()
+            except self._httpx.HTTPError as e:
+                metrics.record_error('scrape', type(e).__name__)
+                return {
+                    'success': False,
+                    'error': f"Erro ao acessar a URL: {str(e)}",
+                    'platform': platform
+                }
+
+            metrics.registry.inc('spy_bytes_fetched_total', len(response.content), platform=platform)
+            if self.archive is not None:
+                await _offload(None, None, lambda: self.archive.put(
+                    url, response.content, platform=platform, encoding=response.encoding))
+
+            result = await _offload(self.executor, None, _parse_html, response.text, url, platform)
+            result['etag'] = response.headers.get('ETag')
+            result['last_modified'] = response.headers.get('Last-Modified')
+            return result
+
+    async def scrape_many(self, urls, concurrency=100, timeout=None):
+        """
+        Extrai um iterável de URLs com até 'concurrency' extrações simultâneas,
+        gerando (índice, resultado) à medida que ficam prontos. As URLs são lidas
+        sob demanda, então listas grandes não ficam inteiras em memória.
+        """
+        pending = {}
+        iterator = iter(enumerate(urls))
+        exhausted = False
+        try:
+            while pending or not exhausted:
+                while not exhausted and len(pending) < concurrency:
+                    try:
+                        index, url = next(iterator)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    url = url.strip()
+                    if url:
+                        pending[asyncio.ensure_future(self.scrape_ad(url, timeout=timeout))] = index
+                if not pending:
+                    break
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield pending.pop(task), task.result()
+        finally:
+            # Consumidor encerrou antes do fim (ou foi cancelado): cancela as extrações restantes
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+
+class AsyncCreativeAnalyzer:
+    """Classe que executa a análise e a geração de variações em executor, sem bloquear o loop."""
+
+    def __init__(self, executor=None, timeout=None, **options):
+        """executor None usa o executor padrão do loop; options são repassadas ao CreativeAnalyzer."""
+        from analyzer import CreativeAnalyzer
+
+        self.analyzer = CreativeAnalyzer(**options)
+        self.executor = executor
+        self.timeout = timeout
+
+    async def analyze_creative(self, ad_data, timeout=None):
+        timeout = timeout or self.timeout
+        try:
+            return await _offload(self.executor, timeout, self.analyzer.analyze_creative, ad_data)
+        except asyncio.TimeoutError:
+            return _timeout_error('analyze', timeout)
+
+    async def generate_variations(self, analysis_result, timeout=None):
+        timeout = timeout or self.timeout
+        try:
+            return await _offload(self.executor, timeout, self.analyzer.generate_variations, analysis_result)
+        except asyncio.TimeoutError:
+            return _timeout_error('analyze', timeout)
+
+
+class AsyncResultExporter:
+    """Classe que gera as exportações (em especial o PDF) em executor, sem bloquear o loop."""
+
+    def __init__(self, output_dir=None, pdf_mode='full', executor=None, timeout=None):
+        """
+        Mesmos parâmetros do ResultExporter. Como a geração de PDF é a etapa mais
+        pesada, um ProcessPoolExecutor dedicado costuma ser a melhor escolha.
+        """
+        self.output_dir = output_dir
+        self.pdf_mode = pdf_mode
+        self.executor = executor
+        self.timeout = timeout
+
+    async def export_to_pdf(self, ad_data, analysis_result, mode=None, timeout=None):
+        timeout = timeout or self.timeout
+        try:
+            return await _offload(self.executor, timeout, _export_to_pdf,
+                                  self.output_dir, self.pdf_mode, ad_data, analysis_result, mode)
+        except asyncio.TimeoutError:
+            return _timeout_error('export', timeout)
+
+    async def export_all(self, ad_data, analysis_result, force=False, timeout=None):
+        timeout = timeout or self.timeout
+        try:
+            return await _offload(self.executor, timeout, _export_all,
+                                  self.output_dir, self.pdf_mode, ad_data, analysis_result, force)
+        except asyncio.TimeoutError:
+            return _timeout_error('export', timeout)
+
+
+# Função para uso direto
+async def process_ad_async(url, output_dir=None, pdf_mode='full', timeout=None):
+    """Função auxiliar assíncrona: extrai, analisa e exporta um anúncio."""
+    async with AsyncAdScraper() as scraper:
+        ad_data = await scraper.scrape_ad(url, timeout=timeout)
+    if not ad_data.get('success'):
+        return {'success': False, 'error': ad_data.get('error', 'Falha no scraping'), 'ad_data': ad_data}
+
+    analyzer = AsyncCreativeAnalyzer(timeout=timeout)
+    analysis = await analyzer.analyze_creative(ad_data)
+    if analysis.get('success'):
+        analysis = await analyzer.generate_variations(analysis)
+    if not analysis.get('success'):
+        return {'success': False, 'error': analysis.get('error', 'Falha na análise'), 'ad_data': ad_data}
+
+    export = await AsyncResultExporter(output_dir, pdf_mode=pdf_mode, timeout=timeout).export_all(ad_data, analysis)
+    return {'success': bool(export.get('success')), 'ad_data': ad_data, 'analysis': analysis, 'export': export}
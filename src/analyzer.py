@@ -6,11 +6,108 @@ Identifica o ângulo principal e gera variações otimizadas.
 import re
 import json
 import os
+import random
+import string
+
+import metrics
+import profiler
+
+# Tabela declarativa com os templates de variação e de landing page de cada ângulo
+ANGLE_TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'angle_templates.json')
+
+# Trechos do texto original disponíveis nos templates (calculados sob demanda, uma vez por chamada)
+TEXT_SLOTS = {
+    'headline': lambda h, d, c: h,
+    'headline_after_exclamation': lambda h, d, c: h.split('!', 1)[-1].strip(),
+    'headline_after_colon': lambda h, d, c: h.split(':', 1)[-1].strip(),
+    'headline_penultimate_word': lambda h, d, c: h.split(' ')[-2:][0],
+    'description': lambda h, d, c: d,
+    'description_first_sentence': lambda h, d, c: d.split('.', 1)[0].strip(),
+    'description_after_first_sentence': lambda h, d, c: d.split('.', 1)[-1].strip(),
+    'description_after_exclamation': lambda h, d, c: d.split('!', 1)[-1].strip(),
+    'description_first_word': lambda h, d, c: d.split(' ')[:5][0],
+    'original_cta': lambda h, d, c: c,
+}
+
+_templates_cache = {}
+
+
+class _TextSlots(dict):
+    """Trechos do texto original, calculados na primeira vez em que um template os usa."""
+    
+    def __init__(self, headline, description, cta=''):
+        super().__init__()
+        self._text = (headline, description, cta)
+    
+    def __missing__(self, name):
+        value = self[name] = TEXT_SLOTS[name](*self._text)
+        return value
+
+
+def _compile(text, choices, where):
+    """Pré-processa um template em [(texto literal, slot ou escolha)], validando os nomes usados."""
+    parts = []
+    for literal, field, spec, conversion in string.Formatter().parse(text):
+        if field is not None and field not in TEXT_SLOTS and field not in choices:
+            raise ValueError(f"Campo desconhecido '{{{field}}}' em {where}")
+        if spec or conversion:
+            raise ValueError(f"Formatação não suportada em {where}: {text}")
+        parts.append((literal, field))
+    return parts
+
+
+def _fill(parts, slots, choices=None):
+    """Preenche um template pré-processado."""
+    return ''.join(
+        literal + ('' if field is None else choices[field] if choices and field in choices else slots[field])
+        for literal, field in parts
+    )
+
+
+def load_angle_templates(path=ANGLE_TEMPLATES_PATH):
+    """Carrega, valida e pré-processa a tabela de templates (uma única vez por arquivo)."""
+    templates = _templates_cache.get(path)
+    if templates is not None:
+        return templates
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        table = json.load(f)
+    
+    templates = {'variations': {}, 'landing_pages': {}}
+    for angle, spec in table.get('variations', {}).items():
+        choices = spec.get('choices', {})
+        for name, options in choices.items():
+            if not options or not all(isinstance(option, str) for option in options):
+                raise ValueError(f"Lista de escolhas '{name}' vazia ou inválida no ângulo '{angle}'")
+        compiled = {'choices': choices}
+        for field in ('headline', 'description', 'cta'):
+            if field not in spec:
+                raise ValueError(f"Template de variação '{angle}' sem o campo '{field}'")
+            compiled[field] = _compile(spec[field], choices, f"variations.{angle}.{field}")
+        templates['variations'][angle] = compiled
+    
+    for angle, spec in table.get('landing_pages', {}).items():
+        compiled = {}
+        for field in ('subheadline', 'cta', 'testimonial'):
+            if field not in spec:
+                raise ValueError(f"Template de landing page '{angle}' sem o campo '{field}'")
+            compiled[field] = _compile(spec[field], {}, f"landing_pages.{angle}.{field}")
+        compiled['bullets'] = [_compile(bullet, {}, f"landing_pages.{angle}.bullets")
+                               for bullet in spec.get('bullets', [])]
+        templates['landing_pages'][angle] = compiled
+    if 'default' not in templates['landing_pages']:
+        raise ValueError("A tabela de landing pages precisa de um template 'default'")
+    
+    _templates_cache[path] = templates
+    return templates
 
 class CreativeAnalyzer:
     """Classe para análise de criativos e identificação de ângulos de persuasão."""
     
-    def __init__(self):
+    def __init__(self, templates_path=ANGLE_TEMPLATES_PATH, seed=None):
+        """templates_path aponta a tabela de templates dos ângulos; seed torna as variações reprodutíveis."""
+        self.templates = load_angle_templates(templates_path)
+        self._random = random.Random(seed)
         # Padrões linguísticos para identificação de ângulos
         self.patterns = {
             'emocional': [
@@ -45,6 +142,15 @@ class CreativeAnalyzer:
     
     def analyze_creative(self, ad_data):
         """Analisa o criativo e identifica o ângulo principal."""
+        platform = ad_data.get('platform', '') if isinstance(ad_data, dict) else ''
+        with metrics.stage_timer('analyze', platform), profiler.profile('analyze', platform):
+            result = self._analyze_creative(ad_data)
+        if not result['success']:
+            metrics.record_error('analyze', 'InvalidInput')
+        return result
+    
+    def _analyze_creative(self, ad_data):
+        """Implementação de analyze_creative, sem instrumentação."""
         if not ad_data or not isinstance(ad_data, dict):
             return {
                 'success': False,
@@ -74,7 +180,7 @@ class CreativeAnalyzer:
         # Ordena os ângulos por pontuação (do maior para o menor)
         sorted_angles = sorted(angle_scores.items(), key=lambda x: x[1], reverse=True)
         
-        return {
+        result = {
             'success': True,
             'primary_angle': primary_angle,
             'angle_scores': angle_scores,
@@ -85,9 +191,28 @@ class CreativeAnalyzer:
                 'cta': ad_data.get('cta', '')
             }
         }
+        
+        # Texto da landing page coletada pelo crawler (crawler.LandingPageCrawler), se houver
+        landing_data = ad_data.get('landing_page_data') or {}
+        if landing_data.get('success'):
+            result['landing_content'] = {
+                'headline': landing_data.get('headline', ''),
+                'description': landing_data.get('description', ''),
+                'cta': landing_data.get('cta', '')
+            }
+        
+        return result
     
     def generate_variations(self, analysis_result):
         """Gera variações do criativo com base na análise."""
+        with metrics.stage_timer('generate'), profiler.profile('generate'):
+            result = self._generate_variations(analysis_result)
+        if not result['success']:
+            metrics.record_error('generate', 'InvalidInput')
+        return result
+    
+    def _generate_variations(self, analysis_result):
+        """Implementação de generate_variations, sem instrumentação."""
         if not analysis_result or not analysis_result.get('success', False):
             return {
                 'success': False,
@@ -106,17 +231,15 @@ class CreativeAnalyzer:
         if not original_cta:
             original_cta = "Saiba mais"
         
-        # Gera variações com base em templates para cada ângulo
-        variations = {
-            'emocional': self._generate_emotional_variation(original_headline, original_description, original_cta),
-            'escassez': self._generate_scarcity_variation(original_headline, original_description, original_cta),
-            'autoridade': self._generate_authority_variation(original_headline, original_description, original_cta)
-        }
+        # Gera uma variação para cada ângulo da tabela de templates
+        slots = _TextSlots(original_headline, original_description, original_cta)
+        variations = {angle: self._generate_variation(angle, slots) for angle in self.templates['variations']}
         
-        # Gera uma variação de landing page
+        # Gera uma variação de landing page (a partir do texto da própria landing page, quando coletado)
+        landing_content = analysis_result.get('landing_content') or {}
         landing_page_variation = self._generate_landing_page_variation(
-            original_headline, 
-            original_description,
+            landing_content.get('headline') or original_headline,
+            landing_content.get('description') or original_description,
             analysis_result['primary_angle']
         )
         
@@ -132,191 +255,29 @@ class CreativeAnalyzer:
             }
         }
     
-    def _generate_emotional_variation(self, headline, description, cta):
-        """Gera uma variação com foco emocional."""
-        # Intensificadores emocionais
-        emotional_intensifiers = [
-            "Surpreendente", "Incrível", "Emocionante", "Fascinante", "Extraordinário",
-            "Maravilhoso", "Impressionante", "Sensacional", "Fantástico", "Espetacular"
-        ]
-        
-        # Verbos emocionais
-        emotional_verbs = [
-            "Descubra", "Sinta", "Experimente", "Imagine", "Transforme", 
-            "Encante-se", "Apaixone-se", "Surpreenda-se", "Emocione-se", "Viva"
-        ]
-        
-        # Frases emocionais para descrição
-        emotional_phrases = [
-            "Você vai se apaixonar por",
-            "Imagine como seria incrível",
-            "Sinta a diferença que",
-            "Transforme sua experiência com",
-            "Desperte sensações únicas com"
-        ]
-        
-        # Modificadores de CTA emocionais
-        emotional_cta_modifiers = [
-            "Descubra agora", "Sinta a diferença", "Experimente já",
-            "Transforme sua vida", "Viva essa experiência"
-        ]
-        
-        # Gera headline emocional
-        import random
-        emotional_headline = f"{random.choice(emotional_intensifiers)}! {random.choice(emotional_verbs)} {headline.split('!', 1)[-1].strip()}"
-        
-        # Gera descrição emocional
-        emotional_description = f"{random.choice(emotional_phrases)} {description.split('.', 1)[0].strip()}. Você merece essa experiência única!"
-        
-        # Gera CTA emocional
-        emotional_cta = random.choice(emotional_cta_modifiers)
-        
-        return {
-            'headline': emotional_headline,
-            'description': emotional_description,
-            'cta': emotional_cta,
-            'angle': 'emocional'
-        }
-    
-    def _generate_scarcity_variation(self, headline, description, cta):
-        """Gera uma variação com foco em escassez e urgência."""
-        # Intensificadores de escassez
-        scarcity_intensifiers = [
-            "ÚLTIMAS UNIDADES", "OFERTA LIMITADA", "POR TEMPO LIMITADO", 
-            "ACABANDO", "PROMOÇÃO RELÂMPAGO", "ESTOQUE LIMITADO",
-            "ÚLTIMAS HORAS", "OFERTA EXCLUSIVA", "VAGAS LIMITADAS"
-        ]
-        
-        # Frases de urgência
-        urgency_phrases = [
-            "Corra! Restam apenas poucas unidades",
-            "Não perca! Esta oferta termina hoje",
-            "Atenção! Promoção por tempo limitado",
-            "Últimas unidades disponíveis",
-            "Aproveite enquanto durar"
-        ]
-        
-        # Modificadores de CTA urgentes
-        urgent_cta_modifiers = [
-            "Garanta já", "Aproveite agora", "Compre antes que acabe",
-            "Reserve imediatamente", "Não perca essa chance"
-        ]
-        
-        # Gera headline com escassez
-        import random
-        scarcity_headline = f"{random.choice(scarcity_intensifiers)}: {headline.split(':', 1)[-1].strip()}"
-        
-        # Gera descrição com urgência
-        scarcity_description = f"{random.choice(urgency_phrases)}! {description.split('!', 1)[-1].strip()}. Oferta válida enquanto durar o estoque!"
-        
-        # Gera CTA urgente
-        scarcity_cta = random.choice(urgent_cta_modifiers)
-        
-        return {
-            'headline': scarcity_headline,
-            'description': scarcity_description,
-            'cta': scarcity_cta,
-            'angle': 'escassez'
-        }
-    
-    def _generate_authority_variation(self, headline, description, cta):
-        """Gera uma variação com foco em autoridade e prova social."""
-        # Intensificadores de autoridade
-        authority_intensifiers = [
-            "COMPROVADO", "CERTIFICADO", "RECOMENDADO POR ESPECIALISTAS",
-            "TESTADO E APROVADO", "CIENTIFICAMENTE COMPROVADO",
-            "LÍDER DE MERCADO", "PREMIADO", "RECONHECIDO INTERNACIONALMENTE"
-        ]
-        
-        # Frases de autoridade
-        authority_phrases = [
-            "Recomendado por 9 entre 10 especialistas",
-            "Comprovado por estudos científicos",
-            "Testado e aprovado por profissionais",
-            "Reconhecido como líder no segmento",
-            "Utilizado por milhares de clientes satisfeitos"
-        ]
-        
-        # Modificadores de CTA com autoridade
-        authority_cta_modifiers = [
-            "Confira os resultados", "Veja as avaliações", "Conheça a qualidade",
-            "Descubra por que somos líderes", "Comprove a eficácia"
-        ]
-        
-        # Gera headline com autoridade
-        import random
-        authority_headline = f"{random.choice(authority_intensifiers)}: {headline.split(':', 1)[-1].strip()}"
-        
-        # Gera descrição com autoridade
-        authority_description = f"{random.choice(authority_phrases)}. {description.split('.', 1)[-1].strip()}. Junte-se aos milhares de clientes satisfeitos!"
-        
-        # Gera CTA com autoridade
-        authority_cta = random.choice(authority_cta_modifiers)
-        
+    def _generate_variation(self, angle, slots):
+        """Gera a variação de um ângulo a partir da tabela de templates."""
+        template = self.templates['variations'][angle]
+        choices = {name: self._random.choice(options) for name, options in template['choices'].items()}
         return {
-            'headline': authority_headline,
-            'description': authority_description,
-            'cta': authority_cta,
-            'angle': 'autoridade'
+            'headline': _fill(template['headline'], slots, choices),
+            'description': _fill(template['description'], slots, choices),
+            'cta': _fill(template['cta'], slots, choices),
+            'angle': angle
         }
     
     def _generate_landing_page_variation(self, headline, description, primary_angle):
         """Gera uma variação de landing page com base no ângulo principal."""
-        # Estrutura básica de landing page
-        landing_page = {
+        landing_pages = self.templates['landing_pages']
+        template = landing_pages.get(primary_angle, landing_pages['default'])
+        slots = _TextSlots(headline, description)
+        return {
             'headline': headline,
-            'subheadline': '',
-            'bullets': [],
-            'cta': '',
-            'testimonial': ''
+            'subheadline': _fill(template['subheadline'], slots),
+            'bullets': [_fill(bullet, slots) for bullet in template['bullets']],
+            'cta': _fill(template['cta'], slots),
+            'testimonial': _fill(template['testimonial'], slots)
         }
-        
-        # Ajusta com base no ângulo principal
-        if primary_angle == 'emocional':
-            landing_page['subheadline'] = f"Descubra como transformar sua experiência com {headline.split(' ')[-2:][0]}"
-            landing_page['bullets'] = [
-                "✓ Sinta a diferença desde o primeiro momento",
-                "✓ Experimente uma sensação única e incomparável",
-                "✓ Transforme sua rotina com mais prazer e satisfação",
-                "✓ Desfrute de momentos inesquecíveis"
-            ]
-            landing_page['cta'] = "QUERO TRANSFORMAR MINHA EXPERIÊNCIA AGORA"
-            landing_page['testimonial'] = "\"Nunca imaginei que poderia me sentir tão bem! Simplesmente incrível!\" - Maria S."
-            
-        elif primary_angle == 'escassez':
-            landing_page['subheadline'] = f"Aproveite esta oportunidade única antes que acabe"
-            landing_page['bullets'] = [
-                "✓ Oferta por tempo limitado - Apenas hoje!",
-                "✓ Últimas unidades disponíveis no estoque",
-                "✓ Condições especiais que não se repetirão",
-                "✓ Bônus exclusivos apenas para os primeiros compradores"
-            ]
-            landing_page['cta'] = "GARANTIR MINHA OFERTA EXCLUSIVA"
-            landing_page['testimonial'] = "\"Quase perdi essa oportunidade incrível. Ainda bem que comprei a tempo!\" - João P."
-            
-        elif primary_angle == 'autoridade':
-            landing_page['subheadline'] = f"A escolha número 1 dos especialistas em {headline.split(' ')[-2:][0]}"
-            landing_page['bullets'] = [
-                "✓ Recomendado por 9 entre 10 profissionais da área",
-                "✓ Certificado pelos principais órgãos reguladores",
-                "✓ Desenvolvido com tecnologia de ponta e pesquisa avançada",
-                "✓ Utilizado por mais de 10.000 clientes satisfeitos"
-            ]
-            landing_page['cta'] = "CONHECER A SOLUÇÃO RECOMENDADA PELOS ESPECIALISTAS"
-            landing_page['testimonial'] = "\"Como especialista há 15 anos, posso afirmar: este é o melhor produto do mercado.\" - Dr. Carlos M."
-            
-        else:  # benefício ou solução de problema como fallback
-            landing_page['subheadline'] = f"A solução definitiva para {description.split(' ')[:5][0]}"
-            landing_page['bullets'] = [
-                "✓ Resolva seu problema de forma rápida e eficiente",
-                "✓ Economize tempo e dinheiro com nossa solução completa",
-                "✓ Resultados visíveis desde o primeiro uso",
-                "✓ Satisfação garantida ou seu dinheiro de volta"
-            ]
-            landing_page['cta'] = "QUERO RESOLVER MEU PROBLEMA AGORA"
-            landing_page['testimonial'] = "\"Finalmente encontrei algo que realmente funciona! Recomendo a todos.\" - Ana R."
-        
-        return landing_page
 
 
 # Função para uso direto
@@ -0,0 +1,249 @@
+"""
+Linha de comando para processamento em lote: scraping -> análise -> exportação
+em vários processos, com resultados em JSONL (uma linha por URL).
+
+As URLs vêm de um arquivo ou da entrada padrão; --shard i/n processa apenas a
+fatia i de n (pela URL, não pela posição), para dividir uma mesma lista entre
+várias máquinas. O progresso e a vazão são exibidos na saída de erro.
+
+Uso:
+    python src/batch.py urls.txt --workers 8 --output resultados.jsonl
+    cat urls.txt | python src/batch.py - --shard 3/8 --output-dir output
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+# Estado de cada processo worker (criado uma única vez no initializer)
+_worker = {}
+
+
+def parse_shard(value):
+    """Converte 'i/n' (1 <= i <= n) em (i, n)."""
+    try:
+        index, total = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Shard inválido: {value} (use i/n, ex.: 3/8)")
+    if total < 1 or not 1 <= index <= total:
+        raise argparse.ArgumentTypeError(f"Shard fora do intervalo: {value}")
+    return index, total
+
+
+def in_shard(url, shard):
+    """Indica se a URL pertence ao shard (i, n); a divisão é estável entre máquinas e execuções."""
+    if shard is None:
+        return True
+    index, total = shard
+    return zlib.crc32(url.encode('utf-8')) % total == index - 1
+
+
+def iter_urls(lines, shard=None):
+    """Gera (índice, URL) das linhas não vazias que pertencem ao shard; o índice é a linha na lista completa."""
+    for index, line in enumerate(lines):
+        url = line.strip()
+        if url and not url.startswith('#') and in_shard(url, shard):
+            yield index, url
+
+
+def _init_worker(output_dir, pdf_mode, export, limits=None):
+    from scraper import AdScraper
+    from analyzer import CreativeAnalyzer
+
+    _worker['scraper'] = AdScraper(limits=limits)
+    _worker['limits'] = limits
+    _worker['analyzer'] = CreativeAnalyzer()
+    _worker['output_dir'] = output_dir
+    _worker['pdf_mode'] = pdf_mode
+    _worker['export'] = export
+
+
+def _process_url(index, url):
+    """Executa as etapas de uma URL no processo worker; retorna o item no mesmo formato do pipeline."""
+    from exporter import ResultExporter
+
+    item = {'index': index, 'url': url, 'success': True}
+    try:
+        item['stage'] = 'scrape'
+        item['ad_data'] = _worker['scraper'].scrape_ad(url)
+        if not item['ad_data'].get('success'):
+            item['success'] = False
+            item['error'] = item['ad_data'].get('error', 'Falha no scraping')
+            return item
+
+        item['stage'] = 'analyze'
+        analyzer = _worker['analyzer']
+        analysis = analyzer.analyze_creative(item['ad_data'])
+        if analysis['success']:
+            analysis = analyzer.generate_variations(analysis)
+        item['analysis'] = analysis
+        if not analysis.get('success'):
+            item['success'] = False
+            item['error'] = analysis.get('error', 'Falha na análise')
+            return item
+
+        if _worker['export']:
+            item['stage'] = 'export'
+            exporter = ResultExporter(os.path.join(_worker['output_dir'], f"{index:08d}"), pdf_mode=_worker['pdf_mode'],
+                                      limits=_worker['limits'])
+            item['export'] = exporter.export_all(item['ad_data'], analysis)
+            if not item['export'].get('success'):
+                item['success'] = False
+                item['error'] = 'Falha em um ou mais formatos de exportação'
+    except Exception as e:
+        item['success'] = False
+        item['error'] = str(e)
+    return item
+
+
+class BatchProgress:
+    """Classe que acumula contagens e vazão do lote e as exibe periodicamente."""
+
+    def __init__(self, stream=sys.stderr, interval=5.0):
+        self.stream = stream
+        self.interval = interval
+        self.start = time.monotonic()
+        self._last_report = self.start
+        self.done = 0
+        self.failed = 0
+        self.stages = {}
+
+    def update(self, item):
+        self.done += 1
+        if not item['success']:
+            self.failed += 1
+            stage = item.get('stage', 'scrape')
+            self.stages[stage] = self.stages.get(stage, 0) + 1
+        now = time.monotonic()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report()
+
+    def summary(self):
+        elapsed = time.monotonic() - self.start
+        return {
+            'processed': self.done,
+            'succeeded': self.done - self.failed,
+            'failed': self.failed,
+            'failed_by_stage': dict(self.stages),
+            'elapsed_seconds': round(elapsed, 3),
+            'urls_per_second': round(self.done / elapsed, 3) if elapsed else 0.0
+        }
+
+    def report(self, final=False):
+        s = self.summary()
+        prefix = 'Concluído' if final else 'Progresso'
+        print(f"{prefix}: {s['processed']} URL(s), {s['succeeded']} ok, {s['failed']} com falha, "
+              f"{s['urls_per_second']:.2f} URL/s em {s['elapsed_seconds']:.1f}s", file=self.stream, flush=True)
+
+
+def run_batch_cli(lines, output, workers=None, shard=None, output_dir='output', pdf_mode='full',
+                  export=True, max_pending=None, progress=None, limits=None):
+    """
+    Processa as linhas (URLs) em 'workers' processos e grava um item JSON por linha em output.
+    No máximo max_pending URLs ficam em andamento, então a memória não cresce com o tamanho da lista.
+    limits (um limits.ResourceLimits) ativa o modo de memória limitada nos workers.
+    Se um processo worker morre (falta de memória, crash de extensão nativa), as URLs em
+    andamento são gravadas como falha e o pool é recriado para o restante da lista.
+    Retorna o resumo do lote.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 4
+    progress = progress or BatchProgress()
+
+    def new_pool():
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(output_dir, pdf_mode, export, limits))
+
+    pool = new_pool()
+    # future -> (índice, URL, pool que recebeu a URL)
+    pending = {}
+
+    def submit(index, url):
+        nonlocal pool
+        try:
+            future = pool.submit(_process_url, index, url)
+        except BrokenProcessPool:
+            pool.shutdown(wait=False)
+            pool = new_pool()
+            future = pool.submit(_process_url, index, url)
+        pending[future] = (index, url, pool)
+
+    def drain(return_when):
+        nonlocal pool
+        finished, _ = wait(pending, return_when=return_when)
+        for future in finished:
+            index, url, owner = pending.pop(future)
+            try:
+                item = future.result()
+            except BrokenProcessPool as e:
+                item = {'index': index, 'url': url, 'success': False, 'stage': 'worker',
+                        'error': f"Processo worker encerrado inesperadamente: {e}"}
+                # Todas as URLs do pool quebrado falham juntas; recria só uma vez
+                if owner is pool:
+                    pool.shutdown(wait=False)
+                    pool = new_pool()
+            output.write(json.dumps(item, ensure_ascii=False) + '\n')
+            progress.update(item)
+        output.flush()
+
+    try:
+        for index, url in iter_urls(lines, shard):
+            submit(index, url)
+            if len(pending) >= max_pending:
+                drain(FIRST_COMPLETED)
+        while pending:
+            drain(ALL_COMPLETED)
+    finally:
+        pool.shutdown()
+
+    progress.report(final=True)
+    return progress.summary()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Processamento em lote de URLs de anúncios (saída JSONL)')
+    parser.add_argument('input', nargs='?', default='-', help="arquivo com uma URL por linha ('-' = entrada padrão)")
+    parser.add_argument('-o', '--output', default='-', help="arquivo JSONL de saída ('-' = saída padrão)")
+    parser.add_argument('-w', '--workers', type=int, default=None, help='número de processos (padrão: CPUs)')
+    parser.add_argument('--shard', type=parse_shard, default=None, help='processa apenas a fatia i de n (ex.: 3/8)')
+    parser.add_argument('--output-dir', default='output', help='diretório das exportações (um subdiretório por URL)')
+    parser.add_argument('--pdf-mode', choices=('full', 'draft'), default='full')
+    parser.add_argument('--no-export', action='store_true', help='interrompe o processamento após a análise')
+    parser.add_argument('--progress-interval', type=float, default=5.0, help='intervalo (s) entre relatórios de progresso')
+    parser.add_argument('--bounded', action='store_true', help='modo de memória limitada com os limites padrão')
+    parser.add_argument('--max-bytes', type=int, help='bytes baixados por página (implica --bounded)')
+    parser.add_argument('--max-nodes', type=int, help='nós do DOM analisados por página (implica --bounded)')
+    parser.add_argument('--max-images', type=int, help='imagens por anúncio (implica --bounded)')
+    parser.add_argument('--max-seconds', type=float, help='tempo por anúncio no scraping e na exportação (implica --bounded)')
+    args = parser.parse_args(argv)
+
+    limits = None
+    overrides = {name: getattr(args, name) for name in ('max_bytes', 'max_nodes', 'max_images', 'max_seconds')
+                 if getattr(args, name) is not None}
+    if args.bounded or overrides:
+        from limits import ResourceLimits
+        limits = ResourceLimits(**overrides)
+
+    source = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8')
+    # O arquivo de saída é reescrito: uma nova execução não duplica as linhas da anterior
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        summary = run_batch_cli(source, output, workers=args.workers, shard=args.shard,
+                                output_dir=args.output_dir, pdf_mode=args.pdf_mode, export=not args.no_export,
+                                progress=BatchProgress(interval=args.progress_interval), limits=limits)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    return 0 if summary['failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
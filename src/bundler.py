@@ -0,0 +1,178 @@
+"""
+Módulo de exportação em lote para um único pacote (ZIP ou tar.zst).
+Os resultados de cada anúncio são renderizados em memória e gravados direto no
+pacote à medida que são produzidos, sem arquivos temporários em disco.
+"""
+
+import io
+import os
+import json
+import hashlib
+import tarfile
+import itertools
+import zipfile
+from datetime import datetime
+
+from exporter import ResultExporter, OUTPUT_FORMATS
+
+# Formatos de pacote suportados
+BUNDLE_FORMATS = ('zip', 'tar.zst')
+
+# Nome do índice gravado ao final do pacote
+BUNDLE_MANIFEST = 'manifest.json'
+
+
+class BundleExporter:
+    """Classe para exportação de vários anúncios em um único pacote, em streaming."""
+    
+    def __init__(self, target, bundle_format='zip', formats=None, pdf_mode='full'):
+        """
+        Inicializa o pacote.
+        
+        target pode ser um caminho ou um objeto de arquivo binário (inclusive não
+        posicionável, como a resposta de um servidor HTTP). formats limita os
+        formatos exportados por anúncio (padrão: todos de OUTPUT_FORMATS).
+        """
+        if bundle_format not in BUNDLE_FORMATS:
+            raise ValueError(f"Formato de pacote desconhecido: {bundle_format}")
+        
+        self.bundle_format = bundle_format
+        self.formats = list(formats or OUTPUT_FORMATS)
+        self.exporter = ResultExporter(output_dir=None, pdf_mode=pdf_mode)
+        self.entries = []
+        self.closed = False
+        
+        # Abre o destino se for um caminho
+        self._owns_target = isinstance(target, (str, os.PathLike))
+        self._target = open(target, 'wb') if self._owns_target else target
+        
+        if bundle_format == 'zip':
+            self._zip = zipfile.ZipFile(self._target, 'w', compression=zipfile.ZIP_DEFLATED)
+        else:
+            try:
+                import zstandard
+            except ImportError:
+                raise RuntimeError("O formato 'tar.zst' requer o pacote 'zstandard'")
+            self._zstd = zstandard.ZstdCompressor().stream_writer(self._target, closefd=False)
+            self._tar = tarfile.open(fileobj=self._zstd, mode='w|')
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+    
+    def add(self, ad_data, analysis_result, name=None):
+        """Renderiza os formatos de um anúncio e os grava no pacote. Retorna a entrada do índice."""
+        if self.closed:
+            raise ValueError('Pacote já foi fechado')
+        
+        index = len(self.entries)
+        folder = name or f"anuncio_{index + 1:05d}"
+        entry = {
+            'index': index,
+            'folder': folder,
+            'url': ad_data.get('url', '') if ad_data else '',
+            'platform': ad_data.get('platform', '') if ad_data else '',
+            'primary_angle': (analysis_result or {}).get('original', {}).get('primary_angle', ''),
+            'files': {},
+            'errors': {}
+        }
+        
+        if not ad_data or not analysis_result:
+            entry['errors']['all'] = 'Dados do anúncio ou resultado da análise ausentes'
+            self.entries.append(entry)
+            return entry
+        
+        for fmt in self.formats:
+            filename = OUTPUT_FORMATS[fmt][0]
+            path = f"{folder}/{filename}"
+            try:
+                if fmt == 'landing_page' and not analysis_result.get('landing_page'):
+                    raise ValueError('Dados da landing page ausentes')
+                size, digest = self._write_member(path, self.exporter.stream(fmt, ad_data, analysis_result))
+                entry['files'][fmt] = {
+                    'path': path,
+                    'size': size,
+                    'sha256': digest
+                }
+            except Exception as e:
+                entry['errors'][fmt] = str(e)
+        
+        self.entries.append(entry)
+        return entry
+    
+    def close(self):
+        """Grava o índice (manifest.json) e fecha o pacote."""
+        if self.closed:
+            return
+        
+        manifest = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'bundle_format': self.bundle_format,
+            'formats': self.formats,
+            'count': len(self.entries),
+            'entries': self.entries
+        }
+        payload = json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')
+        self._write_member(BUNDLE_MANIFEST, [payload])
+        
+        if self.bundle_format == 'zip':
+            self._zip.close()
+        else:
+            self._tar.close()
+            self._zstd.close()
+        
+        if self._owns_target:
+            self._target.close()
+        self.closed = True
+    
+    def _write_member(self, path, chunks):
+        """Grava um membro no pacote a partir de blocos de bytes; retorna (tamanho, sha256)."""
+        digest = hashlib.sha256()
+        size = 0
+        
+        # Gera o primeiro bloco antes de criar o membro: uma falha de renderização
+        # (ex.: dependência de PDF ausente) não deixa uma entrada vazia no pacote
+        chunks = iter(chunks)
+        chunks = itertools.chain([next(chunks, b'')], chunks)
+        
+        if self.bundle_format == 'zip':
+            # O ZIP aceita escrita incremental: cada bloco vai direto para o pacote
+            with self._zip.open(path, 'w', force_zip64=True) as member:
+                for chunk in chunks:
+                    member.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+        else:
+            # O tar precisa do tamanho antes do conteúdo: acumula apenas este membro
+            buffer = io.BytesIO()
+            for chunk in chunks:
+                buffer.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+            info = tarfile.TarInfo(path)
+            info.size = size
+            info.mtime = int(datetime.now().timestamp())
+            buffer.seek(0)
+            self._tar.addfile(info, buffer)
+        
+        return size, digest.hexdigest()
+
+
+# Função para uso direto
+def export_bundle(items, target, bundle_format='zip', formats=None, pdf_mode='full'):
+    """
+    Função auxiliar para exportar um lote de (ad_data, analysis_result) em um único pacote.
+    Retorna o índice gravado no pacote.
+    """
+    with BundleExporter(target, bundle_format=bundle_format, formats=formats, pdf_mode=pdf_mode) as bundle:
+        for ad_data, analysis_result in items:
+            bundle.add(ad_data, analysis_result)
+    
+    return {
+        'success': all(not entry['errors'] for entry in bundle.entries),
+        'count': len(bundle.entries),
+        'entries': bundle.entries
+    }
@@ -0,0 +1,287 @@
+"""
+Módulo de armazenamento local do corpus de criativos raspados.
+Guarda as saídas de scrape_ad e analyze_creative em SQLite, com índices por
+plataforma, domínio, ângulo principal e data do scraping, inserções em lote,
+busca textual (FTS5, sem acentos) e exportação em massa para arquivos
+colunares (Parquet).
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from urllib.parse import urlparse
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ads (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    headline TEXT,
+    description TEXT,
+    cta TEXT,
+    landing_page TEXT,
+    images TEXT,
+    primary_angle TEXT,
+    angle_scores TEXT,
+    content_hash TEXT NOT NULL,
+    scraped_at REAL NOT NULL,
+    UNIQUE (url, content_hash)
+);
+CREATE INDEX IF NOT EXISTS idx_ads_platform ON ads (platform, scraped_at);
+CREATE INDEX IF NOT EXISTS idx_ads_domain ON ads (domain, scraped_at);
+CREATE INDEX IF NOT EXISTS idx_ads_angle ON ads (primary_angle, scraped_at);
+CREATE INDEX IF NOT EXISTS idx_ads_scraped_at ON ads (scraped_at);
+CREATE INDEX IF NOT EXISTS idx_ads_url ON ads (url);
+"""
+
+# Índice de texto completo sobre headline, descrição e CTA. O tokenizador
+# unicode61 com remove_diacritics faz "ultimas" encontrar "últimas" (pt-BR).
+# Os triggers mantêm o índice sincronizado a cada inserção na tabela ads.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE ads_fts USING fts5(
+    headline, description, cta,
+    content='ads', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER ads_fts_insert AFTER INSERT ON ads BEGIN
+    INSERT INTO ads_fts (rowid, headline, description, cta) VALUES (new.id, new.headline, new.description, new.cta);
+END;
+CREATE TRIGGER ads_fts_delete AFTER DELETE ON ads BEGIN
+    INSERT INTO ads_fts (ads_fts, rowid, headline, description, cta) VALUES ('delete', old.id, old.headline, old.description, old.cta);
+END;
+CREATE TRIGGER ads_fts_update AFTER UPDATE ON ads BEGIN
+    INSERT INTO ads_fts (ads_fts, rowid, headline, description, cta) VALUES ('delete', old.id, old.headline, old.description, old.cta);
+    INSERT INTO ads_fts (rowid, headline, description, cta) VALUES (new.id, new.headline, new.description, new.cta);
+END;
+INSERT INTO ads_fts (ads_fts) VALUES ('rebuild');
+"""
+
+# Colunas devolvidas nas consultas e na exportação
+COLUMNS = ('id', 'url', 'domain', 'platform', 'headline', 'description', 'cta', 'landing_page',
+           'images', 'primary_angle', 'angle_scores', 'content_hash', 'scraped_at')
+
+# Campos que identificam uma versão do anúncio (mudou algum deles, é um registro novo)
+CONTENT_FIELDS = ('headline', 'description', 'cta', 'landing_page', 'images')
+
+
+class CorpusStore:
+    """Classe de acesso ao corpus local em SQLite (segura para uso por várias threads)."""
+    
+    def __init__(self, path, batch_size=500):
+        """Abre (ou cria) o corpus; inserções são gravadas em lotes de batch_size."""
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending = []
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        
+        # Cria o índice textual (e indexa os registros existentes) na primeira abertura
+        has_fts = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'ads_fts'").fetchone()
+        if not has_fts:
+            self._conn.executescript(FTS_SCHEMA)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+    
+    def add(self, ad_data, analysis=None, scraped_at=None):
+        """Enfileira um anúncio (e sua análise, se houver) para inserção no próximo lote."""
+        if not ad_data or not ad_data.get('success', True):
+            return False
+        row = self._to_row(ad_data, analysis, scraped_at or time.time())
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+        return True
+    
+    def add_many(self, items):
+        """Insere um iterável de (ad_data, analysis) e grava o lote final. Retorna quantos foram aceitos."""
+        added = 0
+        for ad_data, analysis in items:
+            added += self.add(ad_data, analysis)
+        self.flush()
+        return added
+    
+    def flush(self):
+        """Grava os anúncios pendentes."""
+        with self._lock:
+            self._flush_locked()
+    
+    def query(self, platform=None, domain=None, primary_angle=None, since=None, until=None,
+              limit=100, offset=0, order='desc'):
+        """Consulta anúncios pelos campos indexados, do scraping mais recente para o mais antigo."""
+        where, params = self._where(platform, domain, primary_angle, since, until)
+        direction = 'ASC' if order == 'asc' else 'DESC'
+        sql = f"SELECT {', '.join(COLUMNS)} FROM ads{where} ORDER BY scraped_at {direction} LIMIT ? OFFSET ?"
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit, offset]).fetchall()
+        return [self._from_row(row) for row in rows]
+    
+    def search(self, text, platform=None, primary_angle=None, rank_by_angle=None, limit=50, offset=0, raw=False):
+        """
+        Busca textual em headline, descrição e CTA (sem diferenciar acentos e maiúsculas).
+        
+        Por padrão o texto é buscado como frase exata; raw=True aceita a sintaxe do FTS5
+        (ex.: 'oferta OR desconto'). Com rank_by_angle (ex.: 'escassez'), os resultados
+        são ordenados pela pontuação desse ângulo e depois pela relevância textual.
+        """
+        query = text if raw else '"' + text.replace('"', '""') + '"'
+        clauses, params = ['ads_fts MATCH ?'], [query]
+        if platform:
+            clauses.append('ads.platform = ?')
+            params.append(platform)
+        if primary_angle:
+            clauses.append('ads.primary_angle = ?')
+            params.append(primary_angle)
+        
+        order = 'bm25(ads_fts)'
+        if rank_by_angle:
+            order = f"COALESCE(json_extract(ads.angle_scores, ?), 0) DESC, {order}"
+            params.append(f"$.{rank_by_angle}")
+        
+        columns = ', '.join(f"ads.{column}" for column in COLUMNS)
+        sql = (f"SELECT {columns} FROM ads_fts JOIN ads ON ads.id = ads_fts.rowid "
+               f"WHERE {' AND '.join(clauses)} ORDER BY {order} LIMIT ? OFFSET ?")
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit, offset]).fetchall()
+        return [self._from_row(row) for row in rows]
+    
+    def count(self, platform=None, domain=None, primary_angle=None, since=None, until=None):
+        """Conta anúncios que atendem aos filtros."""
+        where, params = self._where(platform, domain, primary_angle, since, until)
+        self.flush()
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM ads{where}", params).fetchone()[0]
+    
+    def counts_by(self, field, since=None, until=None):
+        """Agrega a contagem por plataforma, domínio ou ângulo principal."""
+        if field not in ('platform', 'domain', 'primary_angle'):
+            raise ValueError(f"Campo de agregação desconhecido: {field}")
+        where, params = self._where(None, None, None, since, until)
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {field}, COUNT(*) FROM ads{where} GROUP BY {field} ORDER BY COUNT(*) DESC", params
+            ).fetchall()
+        return dict(rows)
+    
+    def iter_rows(self, batch_size=10000, **filters):
+        """Percorre todos os registros (com filtros opcionais) em lotes, sem carregar o corpus inteiro."""
+        where, params = self._where(filters.get('platform'), filters.get('domain'), filters.get('primary_angle'),
+                                    filters.get('since'), filters.get('until'))
+        self.flush()
+        last_id = 0
+        while True:
+            clause = f"{where} AND id > ?" if where else " WHERE id > ?"
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT {', '.join(COLUMNS)} FROM ads{clause} ORDER BY id LIMIT ?",
+                    params + [last_id, batch_size]
+                ).fetchall()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+    
+    def export_parquet(self, path, batch_size=50000, **filters):
+        """Exporta o corpus para Parquet em lotes (requer pyarrow). Retorna o número de linhas."""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("A exportação para Parquet requer o pacote 'pyarrow'")
+        
+        schema = pa.schema([
+            ('id', pa.int64()), ('url', pa.string()), ('domain', pa.string()), ('platform', pa.string()),
+            ('headline', pa.string()), ('description', pa.string()), ('cta', pa.string()),
+            ('landing_page', pa.string()), ('images', pa.string()), ('primary_angle', pa.string()),
+            ('angle_scores', pa.string()), ('content_hash', pa.string()), ('scraped_at', pa.float64())
+        ])
+        total = 0
+        with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+            for rows in self.iter_rows(batch_size=batch_size, **filters):
+                columns = list(zip(*rows))
+                writer.write_table(pa.Table.from_arrays([pa.array(c, type=f.type) for c, f in zip(columns, schema)], schema=schema))
+                total += len(rows)
+        return total
+    
+    def close(self):
+        """Grava os pendentes e fecha o corpus."""
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+    
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        placeholders = ', '.join('?' * (len(COLUMNS) - 1))
+        self._conn.executemany(
+            f"INSERT OR IGNORE INTO ads ({', '.join(COLUMNS[1:])}) VALUES ({placeholders})", self._pending
+        )
+        self._conn.commit()
+        self._pending = []
+    
+    def _to_row(self, ad_data, analysis, scraped_at):
+        analysis = analysis or {}
+        primary_angle = analysis.get('primary_angle') or analysis.get('original', {}).get('primary_angle')
+        content = json.dumps({field: ad_data.get(field) for field in CONTENT_FIELDS}, sort_keys=True, ensure_ascii=False)
+        url = ad_data.get('url', '')
+        return (
+            url,
+            urlparse(url).netloc.lower(),
+            ad_data.get('platform', 'generic'),
+            ad_data.get('headline', ''),
+            ad_data.get('description', ''),
+            ad_data.get('cta', ''),
+            ad_data.get('landing_page', ''),
+            json.dumps(ad_data.get('images', []), ensure_ascii=False),
+            primary_angle,
+            json.dumps(analysis['angle_scores']) if analysis.get('angle_scores') else None,
+            hashlib.sha1(content.encode('utf-8')).hexdigest(),
+            scraped_at
+        )
+    
+    def _from_row(self, row):
+        record = dict(zip(COLUMNS, row))
+        record['images'] = json.loads(record['images']) if record['images'] else []
+        record['angle_scores'] = json.loads(record['angle_scores']) if record['angle_scores'] else {}
+        return record
+    
+    def _where(self, platform, domain, primary_angle, since, until):
+        clauses, params = [], []
+        for column, value in (('platform', platform), ('domain', domain), ('primary_angle', primary_angle)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value.lower() if column == 'domain' else value)
+        if since is not None:
+            clauses.append('scraped_at >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('scraped_at < ?')
+            params.append(until)
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+
+# Função para uso direto
+def store_results(path, items):
+    """Função auxiliar para gravar um iterável de (ad_data, analysis) no corpus indicado."""
+    with CorpusStore(path) as store:
+        return store.add_many(items)
+
+
+def search_corpus(path, text, **filters):
+    """Função auxiliar para buscar um texto no corpus indicado."""
+    with CorpusStore(path) as store:
+        return store.search(text, **filters)
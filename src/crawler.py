@@ -0,0 +1,230 @@
+"""
+Módulo de coleta das landing pages apontadas pelos anúncios.
+Resolve wrappers de redirecionamento (l.facebook.com etc.) e redirecionamentos
+HTTP, baixa as páginas finais em paralelo e as extrai com _scrape_generic_page.
+Destinos repetidos entre anúncios são baixados uma única vez (cache LRU de
+tamanho fixo); limites de saltos, bytes por página, número de hosts e tamanho
+do cache mantêm o custo previsível.
+"""
+
+import copy
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, urlunparse, parse_qs, urlencode, urljoin
+
+import metrics
+import transport
+
+from scraper import AdScraper
+
+# Wrappers de redirecionamento resolvidos sem requisição: host -> parâmetro com o destino
+REDIRECT_WRAPPERS = {
+    'l.facebook.com': 'u',
+    'lm.facebook.com': 'u',
+    'l.instagram.com': 'u',
+    'l.messenger.com': 'u',
+}
+
+# Parâmetros de rastreamento ignorados ao comparar destinos
+TRACKING_PARAMS = ('fbclid', 'gclid', 'msclkid', 'obclid', 'tblci')
+TRACKING_PREFIXES = ('utm_',)
+
+
+def unwrap_redirect(url):
+    """Retorna o destino de um wrapper conhecido (ex.: l.facebook.com/l.php?u=...), ou None."""
+    parsed = urlparse(url)
+    param = REDIRECT_WRAPPERS.get(parsed.netloc.lower())
+    if not param:
+        return None
+    target = parse_qs(parsed.query).get(param)
+    return target[0] if target else None
+
+
+def normalize_url(url):
+    """Forma canônica de um destino: host minúsculo, sem fragmento e sem parâmetros de rastreamento."""
+    parsed = urlparse(url)
+    query = [(k, v) for k, v in parse_qs(parsed.query, keep_blank_values=True).items()
+             if k not in TRACKING_PARAMS and not k.startswith(TRACKING_PREFIXES)]
+    return urlunparse((
+        parsed.scheme.lower(), parsed.netloc.lower(), parsed.path or '/', parsed.params,
+        urlencode(query, doseq=True), ''
+    ))
+
+
+class LandingPageCrawler:
+    """Classe que baixa e extrai landing pages em paralelo, com deduplicação e limites."""
+
+    def __init__(self, workers=8, max_redirects=5, max_bytes=2 * 1024 * 1024, max_hosts=500,
+                 per_host=2, timeout=10, allowed_hosts=None, cache_size=1024):
+        """
+        max_redirects limita os saltos (wrappers + redirecionamentos HTTP) por destino;
+        max_bytes limita o download de cada página (o restante é descartado);
+        max_hosts limita quantos hosts distintos são visitados e per_host quantas
+        requisições simultâneas cada host recebe. allowed_hosts, se informado,
+        restringe a coleta a esses hosts. cache_size limita quantos destinos
+        ficam guardados para deduplicação (os menos usados saem primeiro);
+        coletas com falha saem do cache ao terminar, para nova tentativa.
+        """
+        self.max_redirects = max_redirects
+        self.max_bytes = max_bytes
+        self.max_hosts = max_hosts
+        self.per_host = per_host
+        self.timeout = timeout
+        self.allowed_hosts = set(allowed_hosts) if allowed_hosts else None
+        self.cache_size = cache_size
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='crawl')
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+        self._host_slots = {}
+        self.stats = {'requested': 0, 'deduplicated': 0, 'fetched': 0, 'failed': 0, 'bytes': 0, 'truncated': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def crawl(self, url):
+        """Agenda a coleta de um destino; destinos já agendados reaproveitam o mesmo Future."""
+        # Wrappers conhecidos são resolvidos antes da deduplicação
+        target = url
+        for _ in range(self.max_redirects):
+            unwrapped = unwrap_redirect(target)
+            if not unwrapped:
+                break
+            target = unwrapped
+        key = normalize_url(target)
+
+        with self._lock:
+            self.stats['requested'] += 1
+            future = self._results.get(key)
+            metrics.record_cache('crawl_destination', future is not None)
+            if future is not None:
+                self.stats['deduplicated'] += 1
+                self._results.move_to_end(key)
+                return future
+            future = self._results[key] = self._pool.submit(self._fetch, url)
+            while len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+        # Fora do lock: se a coleta já terminou, o callback roda nesta thread
+        future.add_done_callback(lambda done: self._forget_failed(key, done))
+        return future
+
+    def fetch(self, url):
+        """Coleta um destino e aguarda o resultado (uma cópia própria, mesmo para destinos repetidos)."""
+        return copy.deepcopy(self.crawl(url).result())
+
+    def enrich(self, ad_data):
+        """Adiciona ao anúncio os dados extraídos da sua landing page ('landing_page_data')."""
+        url = ad_data.get('landing_page')
+        if url and ad_data.get('platform') != 'generic':
+            ad_data['landing_page_data'] = self.fetch(url)
+        return ad_data
+
+    def enrich_many(self, ads):
+        """Versão em lote de enrich: agenda todas as coletas antes de aguardar."""
+        pending = [(ad, self.crawl(ad['landing_page'])) for ad in ads
+                   if ad.get('landing_page') and ad.get('platform') != 'generic']
+        for ad, future in pending:
+            ad['landing_page_data'] = copy.deepcopy(future.result())
+        return ads
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def _forget_failed(self, key, future):
+        """Remove do cache a coleta com falha, para que o destino seja tentado de novo."""
+        if future.cancelled() or not future.result()['success']:
+            with self._lock:
+                if self._results.get(key) is future:
+                    del self._results[key]
+
+    def _fetch(self, url):
+        """Segue wrappers e redirecionamentos até a página final e a extrai."""
+        with metrics.stage_timer('crawl'):
+            try:
+                result = self._follow(url)
+            except Exception as e:
+                metrics.record_error('crawl', type(e).__name__)
+                result = {'success': False, 'error': f"Erro ao acessar a landing page: {str(e)}", 'url': url}
+        with self._lock:
+            self.stats['fetched' if result['success'] else 'failed'] += 1
+        return result
+
+    def _follow(self, url):
+        scraper = self._scraper()
+        current = url
+        redirects = []
+        for _ in range(self.max_redirects + 1):
+            unwrapped = unwrap_redirect(current)
+            if unwrapped:
+                redirects.append(current)
+                current = unwrapped
+                continue
+
+            host = urlparse(current).netloc.lower()
+            if urlparse(current).scheme not in ('http', 'https'):
+                return {'success': False, 'error': f"Esquema não suportado: {current}", 'url': url}
+            if self.allowed_hosts is not None and host not in self.allowed_hosts:
+                return {'success': False, 'error': f"Host fora da lista permitida: {host}", 'url': url}
+
+            with self._host_slot(host):
+                response = scraper.session.get(current, timeout=self.timeout, allow_redirects=False, stream=True)
+                try:
+                    if response.is_redirect:
+                        redirects.append(current)
+                        current = urljoin(current, response.headers['Location'])
+                        continue
+                    response.raise_for_status()
+                    body, truncated = self._read_limited(response)
+                    encoding = response.encoding or 'utf-8'
+                finally:
+                    response.close()
+
+            with self._lock:
+                self.stats['bytes'] += len(body)
+                self.stats['truncated'] += truncated
+            metrics.registry.inc('spy_bytes_fetched_total', len(body), platform='landing_page')
+
+            result = scraper._scrape_generic_page(body.decode(encoding, errors='replace'), current)
+            result.update({'final_url': current, 'redirects': redirects, 'bytes': len(body), 'truncated': truncated})
+            return result
+
+        return {'success': False, 'error': f"Limite de {self.max_redirects} redirecionamentos excedido", 'url': url}
+
+    def _read_limited(self, response):
+        """Lê o corpo até max_bytes; retorna (bytes, truncado)."""
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=65536):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= self.max_bytes:
+                return b''.join(chunks)[:self.max_bytes], True
+        return b''.join(chunks), False
+
+    def _host_slot(self, host):
+        """Semáforo do host; recusa hosts novos quando max_hosts já foi atingido."""
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                if self.max_hosts and len(self._host_slots) >= self.max_hosts:
+                    raise RuntimeError(f"Limite de {self.max_hosts} hosts atingido")
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+        return slot
+
+    def _scraper(self):
+        # Um AdScraper por thread, todos sobre a sessão compartilhada do transporte
+        if not hasattr(self._local, 'scraper'):
+            self._local.scraper = AdScraper(session=transport.shared_session())
+        return self._local.scraper
+
+
+# Função para uso direto
+def crawl_landing_pages(ads, **options):
+    """Função auxiliar para adicionar 'landing_page_data' a uma lista de anúncios extraídos."""
+    with LandingPageCrawler(**options) as crawler:
+        return crawler.enrich_many(ads)
@@ -0,0 +1,579 @@
+"""
+Módulo de processamento distribuído: workers sem estado retiram tarefas de scraping,
+análise e exportação de um broker e publicam a tarefa da etapa seguinte.
+
+A entrega é "pelo menos uma vez": a tarefa reservada fica sob lease e volta para a
+fila se o worker não confirmar a tempo. Por isso as chaves das tarefas são
+idempotentes (derivadas da URL e do hash do conteúdo): uma tarefa reexecutada
+publica a mesma próxima tarefa, que o broker ignora, e a exportação grava sempre
+no mesmo diretório. Os resultados de cada URL são agregados a partir das tarefas.
+
+O broker é uma interface (Broker); acompanham uma implementação em SQLite, para
+vários processos na mesma máquina, e um servidor TCP que expõe qualquer broker a
+workers em outras máquinas (ou em vários processos locais, para testar a escala).
+
+Uso:
+    python src/distributed.py broker --db tarefas.db --port 8950
+    python src/distributed.py submit urls.txt --broker tcp://127.0.0.1:8950
+    python src/distributed.py worker --broker tcp://127.0.0.1:8950 --output-dir output --threads 4
+    python src/distributed.py results --broker tcp://127.0.0.1:8950 -o resultados.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import hashlib
+import argparse
+import threading
+import socketserver
+
+import metrics
+
+# Tipos de tarefa, na ordem do processamento de um anúncio
+KINDS = ('scrape', 'analyze', 'export')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    job TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_claim ON tasks (status, kind, lease_expires);
+CREATE INDEX IF NOT EXISTS idx_tasks_job ON tasks (job);
+"""
+
+
+def _digest(*parts):
+    return hashlib.sha256('\x00'.join(parts).encode('utf-8')).hexdigest()
+
+
+def content_hash(value):
+    """Hash estável de um valor JSON (chaves ordenadas)."""
+    return _digest(json.dumps(value, sort_keys=True, ensure_ascii=False, default=str))
+
+
+def task_key(kind, url, content=None):
+    """
+    Chave idempotente de uma tarefa: a URL mais o hash do conteúdo de entrada.
+    A mesma entrada gera sempre a mesma chave; uma página alterada gera outra.
+    """
+    return f"{kind}:{_digest(url, content or '')}"
+
+
+class Broker:
+    """
+    Interface do broker de tarefas. Uma tarefa é um dict com id, key, kind, job
+    (a URL de origem), payload e attempts; as implementações devem garantir que
+    publicar uma chave já existente não tem efeito e que ack/nack só valem para o
+    dono atual do lease.
+    """
+
+    def publish(self, tasks):
+        """Publica tarefas (dicts com kind, key, job e payload); retorna quantas eram novas."""
+        raise NotImplementedError
+
+    def claim(self, worker_id, kinds=KINDS, limit=10, lease_seconds=300):
+        """Reserva até limit tarefas pendentes (ou com lease expirado) dos tipos indicados."""
+        raise NotImplementedError
+
+    def ack(self, task_id, worker_id, result=None):
+        """Confirma uma tarefa concluída; retorna False se o lease já não pertence ao worker."""
+        raise NotImplementedError
+
+    def nack(self, task_id, worker_id, error):
+        """Registra uma falha; a tarefa volta para a fila até atingir o limite de tentativas."""
+        raise NotImplementedError
+
+    def tasks(self, job=None):
+        """Lista as tarefas (de um job ou de todos), com status, resultado e erro."""
+        raise NotImplementedError
+
+    def stats(self):
+        """Contagem de tarefas por tipo e status."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SQLiteBroker(Broker):
+    """Broker em SQLite (modo WAL), compartilhado por processos da mesma máquina."""
+
+    def __init__(self, path, max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+    def publish(self, tasks):
+        now = time.time()
+        rows = [(task['key'], task['kind'], task['job'], json.dumps(task['payload'], ensure_ascii=False), now, now)
+                for task in tasks]
+        if not rows:
+            return 0
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute('BEGIN')
+            self._conn.executemany(
+                """INSERT OR IGNORE INTO tasks (key, kind, job, payload, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?)""", rows
+            )
+            self._conn.execute('COMMIT')
+            return self._conn.total_changes - before
+
+    def claim(self, worker_id, kinds=KINDS, limit=10, lease_seconds=300):
+        now = time.time()
+        kind_marks = ','.join('?' * len(kinds))
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Tarefas abandonadas (lease expirado) que já esgotaram as tentativas
+                self._conn.execute(
+                    """UPDATE tasks SET status = 'failed', lease_owner = NULL, lease_expires = NULL, updated_at = ?,
+                           error = COALESCE(error, 'Lease expirado sem confirmação')
+                       WHERE status = 'pending' AND lease_expires < ? AND attempts >= ?""",
+                    (now, now, self.max_attempts)
+                )
+                # Etapas mais adiantadas primeiro: conclui anúncios antes de começar novos
+                ids = [row[0] for row in self._conn.execute(
+                    f"""SELECT id FROM tasks
+                        WHERE status = 'pending' AND kind IN ({kind_marks})
+                          AND (lease_expires IS NULL OR lease_expires < ?)
+                        ORDER BY CASE kind WHEN 'export' THEN 0 WHEN 'analyze' THEN 1 ELSE 2 END, id
+                        LIMIT ?""",
+                    list(kinds) + [now, limit]
+                ).fetchall()]
+                rows = []
+                if ids:
+                    marks = ','.join('?' * len(ids))
+                    self._conn.execute(
+                        f"""UPDATE tasks SET lease_owner = ?, lease_expires = ?, attempts = attempts + 1,
+                                updated_at = ? WHERE id IN ({marks})""",
+                        [worker_id, now + lease_seconds, now] + ids
+                    )
+                    rows = self._conn.execute(
+                        f"SELECT id, key, kind, job, payload, attempts FROM tasks WHERE id IN ({marks}) ORDER BY id", ids
+                    ).fetchall()
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+        return [{'id': row[0], 'key': row[1], 'kind': row[2], 'job': row[3],
+                 'payload': json.loads(row[4]), 'attempts': row[5]} for row in rows]
+
+    def ack(self, task_id, worker_id, result=None):
+        return self._execute(
+            """UPDATE tasks SET status = 'done', result = ?, error = NULL, lease_owner = NULL,
+                   lease_expires = NULL, updated_at = ?
+               WHERE id = ? AND lease_owner = ? AND status = 'pending'""",
+            (json.dumps(result, ensure_ascii=False), time.time(), task_id, worker_id)
+        ) == 1
+
+    def nack(self, task_id, worker_id, error):
+        return self._execute(
+            """UPDATE tasks SET error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?,
+                   status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END
+               WHERE id = ? AND lease_owner = ? AND status = 'pending'""",
+            (str(error), time.time(), self.max_attempts, task_id, worker_id)
+        ) == 1
+
+    def tasks(self, job=None):
+        sql = 'SELECT id, key, kind, job, payload, status, attempts, result, error, updated_at FROM tasks'
+        params = ()
+        if job is not None:
+            sql += ' WHERE job = ?'
+            params = (job,)
+        with self._lock:
+            rows = self._conn.execute(sql + ' ORDER BY id', params).fetchall()
+        return [{'id': row[0], 'key': row[1], 'kind': row[2], 'job': row[3], 'payload': json.loads(row[4]),
+                 'status': row[5], 'attempts': row[6], 'result': json.loads(row[7]) if row[7] else None,
+                 'error': row[8], 'updated_at': row[9]} for row in rows]
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute('SELECT kind, status, COUNT(*) FROM tasks GROUP BY kind, status').fetchall()
+        stats = {kind: {'pending': 0, 'done': 0, 'failed': 0} for kind in KINDS}
+        for kind, status, count in rows:
+            stats.setdefault(kind, {})[status] = count
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+
+# Métodos do broker acessíveis pelo servidor TCP
+BROKER_METHODS = ('publish', 'claim', 'ack', 'nack', 'tasks', 'stats')
+
+
+class _BrokerHandler(socketserver.StreamRequestHandler):
+    """Protocolo em linhas JSON: {"method": ..., "args": [...]} -> {"result": ...} ou {"error": ...}."""
+
+    def handle(self):
+        broker = self.server.broker
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if request.get('method') not in BROKER_METHODS:
+                    raise ValueError(f"Método desconhecido: {request.get('method')}")
+                reply = {'result': getattr(broker, request['method'])(*request.get('args', []))}
+            except Exception as e:
+                reply = {'error': f"{type(e).__name__}: {str(e)}"}
+            self.wfile.write(json.dumps(reply, ensure_ascii=False).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class BrokerServer:
+    """Servidor TCP que expõe um broker (ex.: SQLiteBroker) aos workers remotos."""
+
+    def __init__(self, broker, host='127.0.0.1', port=0):
+        self.broker = broker
+        self.server = socketserver.ThreadingTCPServer((host, port), _BrokerHandler)
+        self.server.daemon_threads = True
+        self.server.broker = broker
+        self.address = f"tcp://{host}:{self.server.server_address[1]}"
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class RemoteBroker(Broker):
+    """Cliente de um BrokerServer (uma conexão por thread)."""
+
+    def __init__(self, address, timeout=60):
+        host, port = address[len('tcp://'):].rsplit(':', 1) if address.startswith('tcp://') else address.rsplit(':', 1)
+        self.host = host
+        self.port = int(port)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def publish(self, tasks):
+        return self._call('publish', list(tasks))
+
+    def claim(self, worker_id, kinds=KINDS, limit=10, lease_seconds=300):
+        return self._call('claim', worker_id, list(kinds), limit, lease_seconds)
+
+    def ack(self, task_id, worker_id, result=None):
+        return self._call('ack', task_id, worker_id, result)
+
+    def nack(self, task_id, worker_id, error):
+        return self._call('nack', task_id, worker_id, str(error))
+
+    def tasks(self, job=None):
+        return self._call('tasks', job)
+
+    def stats(self):
+        return self._call('stats')
+
+    def close(self):
+        stream = getattr(self._local, 'stream', None)
+        if stream is not None:
+            stream.close()
+            self._local.stream = None
+
+    def _call(self, method, *args):
+        stream = getattr(self._local, 'stream', None)
+        if stream is None:
+            connection = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            stream = self._local.stream = connection.makefile('rwb')
+        try:
+            stream.write(json.dumps({'method': method, 'args': args}, ensure_ascii=False).encode('utf-8') + b'\n')
+            stream.flush()
+            line = stream.readline()
+        except OSError:
+            # Conexão perdida: a próxima chamada reconecta (tarefas em andamento voltam pelo lease)
+            self.close()
+            raise
+        if not line:
+            self.close()
+            raise ConnectionError('Conexão com o broker encerrada')
+        reply = json.loads(line)
+        if 'error' in reply:
+            raise RuntimeError(f"Erro no broker: {reply['error']}")
+        return reply['result']
+
+
+def open_broker(spec, **options):
+    """Abre um broker a partir de 'tcp://host:porta' (RemoteBroker) ou de um caminho SQLite."""
+    if spec.startswith('tcp://'):
+        return RemoteBroker(spec)
+    return SQLiteBroker(spec, **options)
+
+
+class DistributedWorker:
+    """Worker sem estado: reserva tarefas, executa a etapa e publica a tarefa seguinte."""
+
+    def __init__(self, broker, output_dir, kinds=KINDS, claim_size=5, lease_seconds=300, pdf_mode='full',
+                 worker_id=None):
+        """
+        kinds restringe as etapas atendidas (ex.: só 'export' em máquinas com WeasyPrint).
+        Cada anúncio é exportado em output_dir/<hash da URL>, o mesmo em qualquer worker.
+        """
+        from scraper import AdScraper
+        from analyzer import CreativeAnalyzer
+        import transport
+
+        self.broker = broker
+        self.output_dir = output_dir
+        self.kinds = tuple(kinds)
+        self.claim_size = claim_size
+        self.lease_seconds = lease_seconds
+        self.pdf_mode = pdf_mode
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.scraper = AdScraper(session=transport.shared_session())
+        self.analyzer = CreativeAnalyzer()
+        self.processed = 0
+
+    def run(self, stop=None, idle_timeout=None, poll_interval=0.5):
+        """
+        Processa tarefas até stop (um threading.Event) ser acionado ou, com
+        idle_timeout, até a fila ficar vazia por esse tempo. Retorna quantas tarefas processou.
+        """
+        idle_since = None
+        while stop is None or not stop.is_set():
+            tasks = self.broker.claim(self.worker_id, self.kinds, self.claim_size, self.lease_seconds)
+            if not tasks:
+                idle_since = idle_since or time.monotonic()
+                if idle_timeout is not None and time.monotonic() - idle_since >= idle_timeout:
+                    break
+                time.sleep(poll_interval)
+                continue
+            idle_since = None
+            for task in tasks:
+                self.handle(task)
+        return self.processed
+
+    def handle(self, task):
+        """Executa uma tarefa; falhas são devolvidas ao broker (nack) para nova tentativa."""
+        with metrics.stage_timer(f"distributed_{task['kind']}"):
+            try:
+                getattr(self, f"_{task['kind']}")(task)
+            except Exception as e:
+                metrics.record_error(f"distributed_{task['kind']}", type(e).__name__)
+                self.broker.nack(task['id'], self.worker_id, e)
+        self.processed += 1
+        metrics.registry.inc('spy_distributed_tasks_total', kind=task['kind'])
+
+    def _scrape(self, task):
+        url = task['job']
+        ad_data = self.scraper.scrape_ad(url)
+        if not ad_data.get('success'):
+            return self.broker.nack(task['id'], self.worker_id, ad_data.get('error', 'Falha no scraping'))
+        # A próxima tarefa é publicada antes do ack: se o worker cair entre os dois,
+        # a reexecução publica a mesma chave (ignorada) e só então confirma
+        ad_hash = content_hash(ad_data)
+        self.broker.publish([{'kind': 'analyze', 'key': task_key('analyze', url, ad_hash), 'job': url,
+                              'payload': {'ad_data': ad_data}}])
+        self.broker.ack(task['id'], self.worker_id, {'content_hash': ad_hash})
+
+    def _analyze(self, task):
+        url = task['job']
+        ad_data = task['payload']['ad_data']
+        analysis = self.analyzer.analyze_creative(ad_data)
+        if analysis['success']:
+            analysis = self.analyzer.generate_variations(analysis)
+        if not analysis.get('success'):
+            return self.broker.nack(task['id'], self.worker_id, analysis.get('error', 'Falha na análise'))
+        # A chave da exportação deriva da chave da análise (as variações são aleatórias)
+        self.broker.publish([{'kind': 'export', 'key': task_key('export', url, task['key']), 'job': url,
+                              'payload': {'ad_data': ad_data, 'analysis': analysis}}])
+        self.broker.ack(task['id'], self.worker_id, {'primary_angle': analysis.get('original', {}).get('primary_angle')})
+
+    def _export(self, task):
+        from exporter import ResultExporter
+
+        exporter = ResultExporter(os.path.join(self.output_dir, _digest(task['job'])[:16]), pdf_mode=self.pdf_mode)
+        export = exporter.export_all(task['payload']['ad_data'], task['payload']['analysis'])
+        if not export.get('success'):
+            errors = [r.get('error') for r in export.get('results', {}).values() if r.get('error')]
+            return self.broker.nack(task['id'], self.worker_id, '; '.join(errors) or 'Falha na exportação')
+        self.broker.ack(task['id'], self.worker_id, export)
+
+
+def submit_urls(broker, urls, batch_size=1000):
+    """Publica uma tarefa de scraping por URL; URLs já enviadas são ignoradas. Retorna quantas eram novas."""
+    published = 0
+    batch = []
+    for url in urls:
+        url = url.strip()
+        if url and not url.startswith('#'):
+            batch.append({'kind': 'scrape', 'key': task_key('scrape', url), 'job': url, 'payload': {}})
+        if len(batch) >= batch_size:
+            published += broker.publish(batch)
+            batch = []
+    if batch:
+        published += broker.publish(batch)
+    return published
+
+
+def collect_results(broker):
+    """
+    Agrega as tarefas por URL: um resultado por job, com status 'done' (exportado),
+    'failed' (alguma etapa esgotou as tentativas) ou 'pending', e os dados da etapa
+    mais adiantada. Havendo mais de uma cadeia para a mesma URL (página alterada
+    entre reentregas), vale a concluída mais recente.
+    """
+    jobs = {}
+    for task in broker.tasks():
+        jobs.setdefault(task['job'], []).append(task)
+
+    for url, tasks in jobs.items():
+        result = {'url': url, 'status': 'pending', 'stage': 'scrape', 'ad_data': None, 'analysis': None,
+                  'export': None, 'error': None}
+        for kind in KINDS:
+            stage_tasks = [task for task in tasks if task['kind'] == kind]
+            if not stage_tasks:
+                break
+            done = [task for task in stage_tasks if task['status'] == 'done']
+            task = max(done, key=lambda t: t['updated_at']) if done else stage_tasks[-1]
+            result['stage'] = kind
+            result['error'] = task['error']
+            result.update({k: v for k, v in task['payload'].items() if k in ('ad_data', 'analysis')})
+            if task['status'] == 'failed' and not done:
+                result['status'] = 'failed'
+                break
+            if kind == 'export' and done:
+                result['status'] = 'done'
+                result['export'] = task['result']
+        yield result
+
+
+# Função para uso direto
+def run_local(urls, db_path, output_dir, workers=4, **options):
+    """
+    Função auxiliar para processar URLs com o broker SQLite e workers em threads
+    do processo atual; retorna os resultados agregados.
+    """
+    broker = SQLiteBroker(db_path)
+    try:
+        submit_urls(broker, urls)
+        threads = [threading.Thread(target=DistributedWorker(broker, output_dir, **options).run,
+                                    kwargs={'idle_timeout': 2.0}) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return list(collect_results(broker))
+    finally:
+        broker.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Processamento distribuído com broker de tarefas')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    broker_parser = subparsers.add_parser('broker', help='serve um broker SQLite por TCP')
+    broker_parser.add_argument('--db', default='tarefas.db')
+    broker_parser.add_argument('--host', default='127.0.0.1')
+    broker_parser.add_argument('--port', type=int, default=8950)
+    broker_parser.add_argument('--max-attempts', type=int, default=3)
+
+    submit_parser = subparsers.add_parser('submit', help='publica as URLs de um arquivo (ou - para stdin)')
+    submit_parser.add_argument('urls_file')
+
+    worker_parser = subparsers.add_parser('worker', help='processa tarefas até ser interrompido')
+    worker_parser.add_argument('--output-dir', default='output')
+    worker_parser.add_argument('--threads', type=int, default=4)
+    worker_parser.add_argument('--kinds', default=','.join(KINDS), help='etapas atendidas, separadas por vírgula')
+    worker_parser.add_argument('--lease', type=int, default=300, help='segundos até uma tarefa reservada voltar à fila')
+    worker_parser.add_argument('--pdf-mode', choices=('full', 'draft'), default='full')
+    worker_parser.add_argument('--idle-timeout', type=float, default=None, help='encerra após esse tempo sem tarefas')
+
+    results_parser = subparsers.add_parser('results', help='grava os resultados agregados em JSONL')
+    results_parser.add_argument('-o', '--output', default='-')
+
+    subparsers.add_parser('stats', help='mostra a contagem de tarefas por etapa e status')
+
+    for name, sub in subparsers.choices.items():
+        if name != 'broker':
+            sub.add_argument('--broker', default='tarefas.db', help='tcp://host:porta ou caminho do SQLite')
+
+    args = parser.parse_args()
+
+    if args.command == 'broker':
+        server = BrokerServer(SQLiteBroker(args.db, max_attempts=args.max_attempts), args.host, args.port)
+        print(f"Broker em {server.address} ({args.db})", file=sys.stderr)
+        try:
+            server.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server.server_close()
+            server.broker.close()
+        return 0
+
+    broker = open_broker(args.broker)
+    try:
+        if args.command == 'submit':
+            source = sys.stdin if args.urls_file == '-' else open(args.urls_file, 'r', encoding='utf-8')
+            with source:
+                print(f"{submit_urls(broker, source)} URL(s) nova(s) publicada(s)", file=sys.stderr)
+        elif args.command == 'worker':
+            stop = threading.Event()
+            kinds = [kind for kind in args.kinds.split(',') if kind]
+            workers = [DistributedWorker(broker, args.output_dir, kinds=kinds, lease_seconds=args.lease,
+                                         pdf_mode=args.pdf_mode) for _ in range(args.threads)]
+            threads = [threading.Thread(target=worker.run, args=(stop, args.idle_timeout)) for worker in workers]
+            for thread in threads:
+                thread.start()
+            try:
+                for thread in threads:
+                    thread.join()
+            except KeyboardInterrupt:
+                stop.set()
+                for thread in threads:
+                    thread.join()
+            print(f"{sum(worker.processed for worker in workers)} tarefa(s) processada(s)", file=sys.stderr)
+        elif args.command == 'results':
+            output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+            try:
+                for result in collect_results(broker):
+                    output.write(json.dumps(result, ensure_ascii=False) + '\n')
+            finally:
+                if output is not sys.stdout:
+                    output.close()
+        else:
+            print(json.dumps(broker.stats(), indent=2))
+    finally:
+        broker.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
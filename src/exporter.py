@@ -3,52 +3,238 @@ Módulo de exportação para gerar resultados em PDF, HTML e Markdown.
 """
 
 import os
+import io
 import json
-import markdown
-from weasyprint import HTML, CSS
-from fpdf2 import FPDF
+import hashlib
 import base64
 import re
 from datetime import datetime
 
+import metrics
+import profiler
+import limits
+
+# Formatos de saída: nome do arquivo e tipo de conteúdo
+OUTPUT_FORMATS = {
+    'html': ('variacoes.html', 'text/html; charset=utf-8'),
+    'markdown': ('variacoes.md', 'text/markdown; charset=utf-8'),
+    'pdf': ('variacoes.pdf', 'application/pdf'),
+    'landing_page': ('landing_page_variacao.html', 'text/html; charset=utf-8'),
+}
+
+# Versão dos templates; incremente ao alterar o layout de qualquer formato
+TEMPLATE_VERSION = '2'
+
+# Manifesto com o hash das entradas de cada formato já exportado
+MANIFEST_FILE = '.export_manifest.json'
+
+# Modos de PDF: 'full' usa WeasyPrint (HTML/CSS completo); 'draft' monta o
+# layout fixo direto com fpdf2, muito mais leve para exportações em lote
+PDF_MODES = ('full', 'draft')
+
+# Seções do PDF em modo rascunho: chave da variação, título e cor de fundo
+DRAFT_PDF_SECTIONS = [
+    ('emocional', 'Variação A: Foco Emocional', (248, 232, 232)),
+    ('escassez', 'Variação B: Foco em Escassez e Urgência', (248, 244, 232)),
+    ('autoridade', 'Variação C: Foco em Autoridade / Prova Social', (232, 248, 234)),
+]
+
+# Variações dos demais ângulos da tabela de templates (exibidas quando presentes no resultado)
+EXTRA_VARIATION_SECTIONS = [
+    ('solucao_problema', 'Variação D: Foco em Solução de Problema', (240, 232, 248)),
+    ('beneficio', 'Variação E: Foco em Benefícios', (232, 240, 248)),
+]
+
+# CSS aplicado na conversão do HTML para PDF
+PDF_CSS = """
+@page {
+    margin: 1cm;
+    @top-center {
+        content: "Spy Criativos - Variações de Anúncios";
+        font-size: 9pt;
+        color: #666;
+    }
+    @bottom-right {
+        content: "Página " counter(page) " de " counter(pages);
+        font-size: 9pt;
+        color: #666;
+    }
+}
+body {
+    font-family: "Noto Sans CJK SC", "WenQuanYi Zen Hei", sans-serif;
+    line-height: 1.5;
+    color: #333;
+}
+h1 {
+    color: #2c3e50;
+    border-bottom: 1px solid #eee;
+    padding-bottom: 10px;
+}
+h2 {
+    color: #3498db;
+    margin-top: 20px;
+}
+h3 {
+    color: #e74c3c;
+}
+.variation {
+    margin: 20px 0;
+    padding: 15px;
+    border: 1px solid #ddd;
+    border-radius: 5px;
+    background-color: #f9f9f9;
+}
+.original {
+    background-color: #e8f4f8;
+    border-color: #bde0ec;
+}
+.emocional {
+    background-color: #f8e8e8;
+    border-color: #ecbdbd;
+}
+.escassez {
+    background-color: #f8f4e8;
+    border-color: #ece5bd;
+}
+.autoridade {
+    background-color: #e8f8ea;
+    border-color: #bdecbf;
+}
+.headline {
+    font-size: 18px;
+    font-weight: bold;
+    margin-bottom: 10px;
+}
+.description {
+    margin-bottom: 10px;
+}
+.cta {
+    font-weight: bold;
+    color: #2980b9;
+}
+.image-container {
+    margin: 15px 0;
+    text-align: center;
+}
+.image-container img {
+    max-width: 100%;
+    max-height: 300px;
+    border: 1px solid #ddd;
+}
+.metadata {
+    font-size: 12px;
+    color: #777;
+    margin-top: 20px;
+    border-top: 1px solid #eee;
+    padding-top: 10px;
+}
+"""
+
 class ResultExporter:
     """Classe para exportação dos resultados em diferentes formatos."""
     
-    def __init__(self, output_dir='/home/ubuntu/spy-criativos/output'):
-        """Inicializa o exportador com o diretório de saída."""
+    def __init__(self, output_dir='/home/ubuntu/spy-criativos/output', pdf_mode='full', limits=None):
+        """
+        Inicializa o exportador com o diretório de saída.
+        
+        Se output_dir for None, nada é gravado em disco e os métodos export_*
+        devolvem o conteúdo gerado em memória (chave 'content').
+        pdf_mode define o modo de PDF padrão ('full' ou 'draft').
+        limits (um limits.ResourceLimits) limita imagens e textos exportados e o
+        tempo de export_all por anúncio; os cortes vão para o campo 'truncation'.
+        """
+        if pdf_mode not in PDF_MODES:
+            raise ValueError(f"Modo de PDF desconhecido: {pdf_mode}")
         self.output_dir = output_dir
-        os.makedirs(output_dir, exist_ok=True)
+        self.pdf_mode = pdf_mode
+        self.limits = limits
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
     
-    def export_all(self, ad_data, analysis_result):
-        """Exporta os resultados em todos os formatos disponíveis."""
+    def export_all(self, ad_data, analysis_result, force=False, pdf_mode=None):
+        """
+        Exporta os resultados em todos os formatos disponíveis.
+        
+        Com diretório de saída, cada formato só é regenerado se o hash das suas
+        entradas (dados do anúncio, resultado da análise e versão do template)
+        mudou desde a última exportação registrada no manifesto. Use force=True
+        para regenerar todos os formatos. pdf_mode sobrepõe o modo de PDF padrão.
+        """
         if not ad_data or not analysis_result:
             return {
                 'success': False,
                 'error': 'Dados do anúncio ou resultado da análise ausentes'
             }
         
-        results = {}
+        truncation = {}
+        deadline = None
+        if self.limits is not None:
+            ad_data, analysis_result = self.limits.bound_export(ad_data, analysis_result, truncation)
+            deadline = self.limits.deadline()
         
-        # Exporta para HTML
-        html_result = self.export_to_html(ad_data, analysis_result)
-        results['html'] = html_result
+        pdf_mode = pdf_mode or self.pdf_mode
+        exporters = [
+            ('html', self.export_to_html),
+            ('markdown', self.export_to_markdown),
+            ('pdf', lambda ad, analysis: self.export_to_pdf(ad, analysis, mode=pdf_mode)),
+            ('landing_page', self.export_landing_page)
+        ]
         
-        # Exporta para Markdown
-        md_result = self.export_to_markdown(ad_data, analysis_result)
-        results['markdown'] = md_result
+        manifest = self._load_manifest() if self.output_dir else {}
+        results = {}
         
-        # Exporta para PDF
-        pdf_result = self.export_to_pdf(ad_data, analysis_result)
-        results['pdf'] = pdf_result
+        platform = ad_data.get('platform', '')
+        with metrics.stage_timer('export', platform), profiler.profile('export', platform):
+            self._export_formats(exporters, manifest, results, ad_data, analysis_result, force, pdf_mode,
+                                 deadline, truncation)
         
-        # Exporta landing page
-        landing_result = self.export_landing_page(ad_data, analysis_result)
-        results['landing_page'] = landing_result
+        if self.output_dir:
+            self._save_manifest(manifest)
         
-        return {
+        result = {
             'success': all([r.get('success', False) for r in results.values()]),
             'results': results
         }
+        if truncation:
+            result['truncation'] = truncation
+            metrics.record_truncation('export', truncation)
+        return result
+    
+    def _export_formats(self, exporters, manifest, results, ad_data, analysis_result, force, pdf_mode,
+                        deadline=None, truncation=None):
+        """Exporta cada formato, pulando os que estão atualizados no manifesto (e os que não couberem no prazo)."""
+        for fmt, export in exporters:
+            if deadline is not None and deadline.expired():
+                limits.note(truncation, 'time', self.limits.max_seconds, round(deadline.elapsed(), 3))
+                results[fmt] = {
+                    'success': False,
+                    'truncated': True,
+                    'error': f"Tempo limite de {self.limits.max_seconds}s por anúncio excedido"
+                }
+                manifest.pop(fmt, None)
+                continue
+            
+            input_hash = self._input_hash(fmt, ad_data, analysis_result, pdf_mode)
+            file_path = os.path.join(self.output_dir, OUTPUT_FORMATS[fmt][0]) if self.output_dir else None
+            
+            # Pula formatos cujas entradas não mudaram
+            if not force and file_path and manifest.get(fmt) == input_hash and os.path.exists(file_path):
+                metrics.record_cache('export_manifest', True)
+                results[fmt] = {
+                    'success': True,
+                    'file_path': file_path,
+                    'skipped': True
+                }
+                continue
+            if file_path:
+                metrics.record_cache('export_manifest', False)
+            
+            with metrics.registry.timer('spy_export_duration_seconds', format=fmt):
+                results[fmt] = export(ad_data, analysis_result)
+            if results[fmt].get('success') and self.output_dir:
+                manifest[fmt] = input_hash
+            else:
+                manifest.pop(fmt, None)
     
     def export_to_html(self, ad_data, analysis_result):
         """Exporta os resultados para formato HTML."""
@@ -57,22 +243,14 @@ class ResultExporter:
             original = analysis_result.get('original', {})
             variations = analysis_result.get('variations', {})
             
-            # Cria o caminho do arquivo
-            file_path = os.path.join(self.output_dir, 'variacoes.html')
-            
             # Gera o HTML
             html_content = self._generate_html_content(ad_data, original, variations)
             
-            # Salva o arquivo
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-            
-            return {
-                'success': True,
-                'file_path': file_path
-            }
+            # Salva o arquivo (ou devolve em memória)
+            return self._save_output('html', html_content)
         
         except Exception as e:
+            metrics.record_error('export', type(e).__name__)
             return {
                 'success': False,
                 'error': f"Erro ao exportar para HTML: {str(e)}"
@@ -85,129 +263,30 @@ class ResultExporter:
             original = analysis_result.get('original', {})
             variations = analysis_result.get('variations', {})
             
-            # Cria o caminho do arquivo
-            file_path = os.path.join(self.output_dir, 'variacoes.md')
-            
             # Gera o Markdown
             md_content = self._generate_markdown_content(ad_data, original, variations)
             
-            # Salva o arquivo
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(md_content)
-            
-            return {
-                'success': True,
-                'file_path': file_path
-            }
+            # Salva o arquivo (ou devolve em memória)
+            return self._save_output('markdown', md_content)
         
         except Exception as e:
+            metrics.record_error('export', type(e).__name__)
             return {
                 'success': False,
                 'error': f"Erro ao exportar para Markdown: {str(e)}"
             }
     
-    def export_to_pdf(self, ad_data, analysis_result):
-        """Exporta os resultados para formato PDF usando WeasyPrint."""
+    def export_to_pdf(self, ad_data, analysis_result, mode=None):
+        """Exporta os resultados para formato PDF (WeasyPrint ou, em modo 'draft', fpdf2)."""
         try:
-            # Prepara os dados
-            original = analysis_result.get('original', {})
-            variations = analysis_result.get('variations', {})
+            if not self.output_dir:
+                return self._save_output('pdf', self.render_pdf(ad_data, analysis_result, mode=mode))
             
             # Cria o caminho do arquivo
-            file_path = os.path.join(self.output_dir, 'variacoes.pdf')
+            file_path = os.path.join(self.output_dir, OUTPUT_FORMATS['pdf'][0])
             
-            # Gera o HTML para conversão em PDF
-            html_content = self._generate_html_content(ad_data, original, variations, for_pdf=True)
-            
-            # Define o CSS para o PDF
-            css_content = """
-            @page {
-                margin: 1cm;
-                @top-center {
-                    content: "Spy Criativos - Variações de Anúncios";
-                    font-size: 9pt;
-                    color: #666;
-                }
-                @bottom-right {
-                    content: "Página " counter(page) " de " counter(pages);
-                    font-size: 9pt;
-                    color: #666;
-                }
-            }
-            body {
-                font-family: "Noto Sans CJK SC", "WenQuanYi Zen Hei", sans-serif;
-                line-height: 1.5;
-                color: #333;
-            }
-            h1 {
-                color: #2c3e50;
-                border-bottom: 1px solid #eee;
-                padding-bottom: 10px;
-            }
-            h2 {
-                color: #3498db;
-                margin-top: 20px;
-            }
-            h3 {
-                color: #e74c3c;
-            }
-            .variation {
-                margin: 20px 0;
-                padding: 15px;
-                border: 1px solid #ddd;
-                border-radius: 5px;
-                background-color: #f9f9f9;
-            }
-            .original {
-                background-color: #e8f4f8;
-                border-color: #bde0ec;
-            }
-            .emocional {
-                background-color: #f8e8e8;
-                border-color: #ecbdbd;
-            }
-            .escassez {
-                background-color: #f8f4e8;
-                border-color: #ece5bd;
-            }
-            .autoridade {
-                background-color: #e8f8ea;
-                border-color: #bdecbf;
-            }
-            .headline {
-                font-size: 18px;
-                font-weight: bold;
-                margin-bottom: 10px;
-            }
-            .description {
-                margin-bottom: 10px;
-            }
-            .cta {
-                font-weight: bold;
-                color: #2980b9;
-            }
-            .image-container {
-                margin: 15px 0;
-                text-align: center;
-            }
-            .image-container img {
-                max-width: 100%;
-                max-height: 300px;
-                border: 1px solid #ddd;
-            }
-            .metadata {
-                font-size: 12px;
-                color: #777;
-                margin-top: 20px;
-                border-top: 1px solid #eee;
-                padding-top: 10px;
-            }
-            """
-            
-            # Cria o PDF com WeasyPrint
-            html = HTML(string=html_content)
-            css = CSS(string=css_content)
-            html.write_pdf(file_path, stylesheets=[css])
+            # Cria o PDF direto no arquivo
+            self.render_pdf(ad_data, analysis_result, target=file_path, mode=mode)
             
             return {
                 'success': True,
@@ -215,6 +294,7 @@ class ResultExporter:
             }
         
         except Exception as e:
+            metrics.record_error('export', type(e).__name__)
             return {
                 'success': False,
                 'error': f"Erro ao exportar para PDF: {str(e)}"
@@ -232,31 +312,232 @@ class ResultExporter:
                     'error': 'Dados da landing page ausentes'
                 }
             
-            # Cria o caminho do arquivo
-            file_path = os.path.join(self.output_dir, 'landing_page_variacao.html')
-            
             # Gera o HTML da landing page
             html_content = self._generate_landing_page_html(ad_data, landing_page)
             
-            # Salva o arquivo
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-            
-            return {
-                'success': True,
-                'file_path': file_path
-            }
+            # Salva o arquivo (ou devolve em memória)
+            return self._save_output('landing_page', html_content)
         
         except Exception as e:
+            metrics.record_error('export', type(e).__name__)
             return {
                 'success': False,
                 'error': f"Erro ao exportar landing page: {str(e)}"
             }
     
+    def render(self, fmt, ad_data, analysis_result):
+        """Renderiza um formato ('html', 'markdown', 'pdf', 'landing_page') em memória e retorna bytes."""
+        if fmt == 'pdf':
+            return self.render_pdf(ad_data, analysis_result)
+        return b''.join(self.stream(fmt, ad_data, analysis_result))
+    
+    def stream(self, fmt, ad_data, analysis_result):
+        """
+        Gera o conteúdo de um formato em blocos de bytes (UTF-8), seção por seção,
+        sem montar o documento inteiro nem gravar em disco. Útil para respostas HTTP
+        em streaming. O PDF é produzido em um único bloco.
+        """
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Formato de exportação desconhecido: {fmt}")
+        
+        if fmt == 'pdf':
+            yield self.render_pdf(ad_data, analysis_result)
+            return
+        
+        original = analysis_result.get('original', {})
+        variations = analysis_result.get('variations', {})
+        
+        if fmt == 'html':
+            parts = self._iter_html_content(ad_data, original, variations)
+        elif fmt == 'markdown':
+            parts = self._iter_markdown_content(ad_data, original, variations)
+        else:
+            parts = self._iter_landing_page_html(ad_data, analysis_result.get('landing_page', {}))
+        
+        for part in parts:
+            yield part.encode('utf-8')
+    
+    def render_pdf(self, ad_data, analysis_result, target=None, mode=None):
+        """
+        Renderiza o PDF com WeasyPrint (mode='full') ou com fpdf2 (mode='draft').
+        
+        Sem target, o PDF é escrito em um BytesIO e os bytes são retornados.
+        Com target (caminho ou objeto de arquivo), o PDF é escrito nele e o target é retornado.
+        """
+        mode = mode or self.pdf_mode
+        if mode not in PDF_MODES:
+            raise ValueError(f"Modo de PDF desconhecido: {mode}")
+        
+        original = analysis_result.get('original', {})
+        variations = analysis_result.get('variations', {})
+        buffer = target if target is not None else io.BytesIO()
+        
+        if mode == 'draft':
+            pdf_bytes = self._render_draft_pdf(ad_data, original, variations)
+            if isinstance(buffer, str):
+                with open(buffer, 'wb') as f:
+                    f.write(pdf_bytes)
+            else:
+                buffer.write(pdf_bytes)
+        else:
+            # WeasyPrint é importado só quando o primeiro PDF completo é gerado
+            from weasyprint import HTML, CSS
+            
+            # Gera o HTML para conversão em PDF
+            html_content = self._generate_html_content(ad_data, original, variations, for_pdf=True)
+            HTML(string=html_content).write_pdf(buffer, stylesheets=[CSS(string=PDF_CSS)])
+        
+        if target is None:
+            return buffer.getvalue()
+        return target
+    
+    def _render_draft_pdf(self, ad_data, original, variations):
+        """Monta o PDF em modo rascunho com fpdf2: layout fixo, sem motor HTML/CSS."""
+        from fpdf import FPDF  # pacote fpdf2
+        
+        pdf = FPDF(format='A4')
+        pdf.set_title('Spy Criativos - Variações de Anúncios')
+        pdf.set_margins(15, 15, 15)
+        pdf.set_auto_page_break(True, margin=15)
+        pdf.add_page()
+        
+        # Título e metadados
+        pdf.set_font('Helvetica', 'B', 16)
+        pdf.set_text_color(44, 62, 80)
+        self._draft_cell(pdf, 9, 'Spy Criativos - Variações de Anúncios')
+        pdf.set_font('Helvetica', '', 9)
+        pdf.set_text_color(119, 119, 119)
+        self._draft_cell(pdf, 5, f"URL original: {ad_data.get('url', 'N/A')}")
+        self._draft_cell(pdf, 5, f"Plataforma: {ad_data.get('platform', 'N/A').capitalize()}")
+        self._draft_cell(pdf, 5, f"Data de geração: {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+        
+        # Criativo original seguido das três variações
+        sections = [(
+            f"Criativo Original - Ângulo Principal: {original.get('primary_angle', 'N/A').capitalize()}",
+            original,
+            (232, 244, 248)
+        )]
+        for key, title, color in DRAFT_PDF_SECTIONS:
+            sections.append((title, variations.get(key, {}), color))
+        for key, title, color in EXTRA_VARIATION_SECTIONS:
+            if key in variations:
+                sections.append((title, variations[key], color))
+        
+        for title, data, color in sections:
+            pdf.ln(5)
+            pdf.set_fill_color(*color)
+            pdf.set_font('Helvetica', 'B', 12)
+            pdf.set_text_color(231, 76, 60)
+            self._draft_cell(pdf, 8, title, fill=True)
+            pdf.set_font('Helvetica', 'B', 11)
+            pdf.set_text_color(51, 51, 51)
+            self._draft_cell(pdf, 6, data.get('headline', 'Sem título'), fill=True)
+            pdf.set_font('Helvetica', '', 10)
+            self._draft_cell(pdf, 5, data.get('description', 'Sem descrição'), fill=True)
+            pdf.set_font('Helvetica', 'B', 10)
+            pdf.set_text_color(41, 128, 185)
+            self._draft_cell(pdf, 6, f"CTA: {data.get('cta', 'Sem CTA')}", fill=True)
+        
+        return bytes(pdf.output())
+    
+    def _draft_cell(self, pdf, height, text, fill=False):
+        """Escreve um bloco de texto no PDF rascunho (fontes padrão aceitam apenas Latin-1)."""
+        text = str(text).encode('latin-1', 'replace').decode('latin-1')
+        pdf.multi_cell(0, height, text, fill=fill, new_x='LMARGIN', new_y='NEXT')
+    
+    def _save_output(self, fmt, content):
+        """Grava o conteúdo no diretório de saída ou, sem diretório, o devolve em memória."""
+        filename, content_type = OUTPUT_FORMATS[fmt]
+        
+        if not self.output_dir:
+            return {
+                'success': True,
+                'filename': filename,
+                'content_type': content_type,
+                'content': content.encode('utf-8') if isinstance(content, str) else content
+            }
+        
+        file_path = os.path.join(self.output_dir, filename)
+        if isinstance(content, str):
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+        else:
+            with open(file_path, 'wb') as f:
+                f.write(content)
+        
+        return {
+            'success': True,
+            'file_path': file_path
+        }
+    
+    def _input_hash(self, fmt, ad_data, analysis_result, pdf_mode=None):
+        """Calcula o hash das entradas que determinam o conteúdo de um formato."""
+        if fmt == 'landing_page':
+            inputs = {
+                'images': ad_data.get('images', [])[:1],
+                'landing_page': analysis_result.get('landing_page', {})
+            }
+        else:
+            inputs = {
+                'url': ad_data.get('url', ''),
+                'platform': ad_data.get('platform', ''),
+                'images': ad_data.get('images', []),
+                'original': analysis_result.get('original', {}),
+                'variations': analysis_result.get('variations', {})
+            }
+        if ad_data.get('image_data'):
+            inputs['thumbnails'] = [image.get('phash') for image in ad_data['image_data']]
+        inputs['format'] = fmt
+        inputs['template_version'] = TEMPLATE_VERSION
+        if fmt == 'pdf':
+            inputs['pdf_mode'] = pdf_mode or self.pdf_mode
+            inputs['pdf_css'] = PDF_CSS
+        
+        payload = json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _image_src(self, ad_data, image_url):
+        """
+        Miniatura em cache da imagem (images.ImageProcessor) embutida como data URI;
+        sem miniatura, usa a URL remota original.
+        """
+        for image in ad_data.get('image_data', []):
+            thumbnail = image.get('thumbnail')
+            if image.get('url') == image_url and thumbnail and os.path.exists(thumbnail):
+                with open(thumbnail, 'rb') as f:
+                    return f"data:image/jpeg;base64,{base64.b64encode(f.read()).decode('ascii')}"
+        return image_url
+    
+    def _load_manifest(self):
+        """Carrega o manifesto de exportação do diretório de saída."""
+        manifest_path = os.path.join(self.output_dir, MANIFEST_FILE)
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        
+        # Manifestos de outra versão de template são descartados
+        if manifest.get('template_version') != TEMPLATE_VERSION:
+            return {}
+        return manifest.get('formats', {})
+    
+    def _save_manifest(self, manifest):
+        """Grava o manifesto de exportação de forma atômica."""
+        manifest_path = os.path.join(self.output_dir, MANIFEST_FILE)
+        tmp_path = manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'template_version': TEMPLATE_VERSION, 'formats': manifest}, f, indent=2)
+        os.replace(tmp_path, manifest_path)
+    
     def _generate_html_content(self, ad_data, original, variations, for_pdf=False):
         """Gera o conteúdo HTML para as variações."""
+        return ''.join(self._iter_html_content(ad_data, original, variations, for_pdf))
+    
+    def _iter_html_content(self, ad_data, original, variations, for_pdf=False):
+        """Gera o conteúdo HTML para as variações, em blocos por seção."""
         # Cabeçalho HTML
-        html = f"""<!DOCTYPE html>
+        yield f"""<!DOCTYPE html>
 <html lang="pt-BR">
 <head>
     <meta charset="UTF-8">
@@ -360,19 +641,19 @@ class ResultExporter:
 
         # Adiciona imagens se disponíveis
         if ad_data.get('images') and len(ad_data['images']) > 0:
-            html += '    <div class="image-container">\n'
+            yield '    <div class="image-container">\n'
             for img_url in ad_data['images'][:1]:  # Limita a uma imagem para não sobrecarregar
-                html += f'        <img src="{img_url}" alt="Imagem do anúncio">\n'
-            html += '    </div>\n'
+                yield f'        <img src="{self._image_src(ad_data, img_url)}" alt="Imagem do anúncio">\n'
+            yield '    </div>\n'
 
-        html += '</div>\n\n'
+        yield '</div>\n\n'
 
         # Adiciona as variações
-        html += '<h2>Variações Geradas</h2>\n'
+        yield '<h2>Variações Geradas</h2>\n'
         
         # Variação Emocional
         emocional = variations.get('emocional', {})
-        html += f"""
+        yield f"""
     <div class="variation emocional">
         <h3>Variação A: Foco Emocional</h3>
         <div class="headline">{emocional.get('headline', 'Sem título')}</div>
@@ -383,7 +664,7 @@ class ResultExporter:
 
         # Variação Escassez
         escassez = variations.get('escassez', {})
-        html += f"""
+        yield f"""
     <div class="variation escassez">
         <h3>Variação B: Foco em Escassez e Urgência</h3>
         <div class="headline">{escassez.get('headline', 'Sem título')}</div>
@@ -394,7 +675,7 @@ class ResultExporter:
 
         # Variação Autoridade
         autoridade = variations.get('autoridade', {})
-        html += f"""
+        yield f"""
     <div class="variation autoridade">
         <h3>Variação C: Foco em Autoridade / Prova Social</h3>
         <div class="headline">{autoridade.get('headline', 'Sem título')}</div>
@@ -403,8 +684,22 @@ class ResultExporter:
     </div>
 """
 
+        # Variações dos demais ângulos
+        for key, title, _ in EXTRA_VARIATION_SECTIONS:
+            if key not in variations:
+                continue
+            variation = variations[key]
+            yield f"""
+    <div class="variation {key}">
+        <h3>{title}</h3>
+        <div class="headline">{variation.get('headline', 'Sem título')}</div>
+        <div class="description">{variation.get('description', 'Sem descrição')}</div>
+        <div class="cta">CTA: {variation.get('cta', 'Sem CTA')}</div>
+    </div>
+"""
+
         # Rodapé
-        html += """
+        yield """
     <div class="metadata">
         <p>Gerado automaticamente pelo Spy Criativos</p>
         <p>Todas as variações são otimizadas para maior conversão com base em análise de IA</p>
@@ -412,12 +707,14 @@ class ResultExporter:
 </body>
 </html>
 """
-        
-        return html
     
     def _generate_markdown_content(self, ad_data, original, variations):
         """Gera o conteúdo Markdown para as variações."""
-        md = f"""# Spy Criativos - Variações de Anúncios
+        return ''.join(self._iter_markdown_content(ad_data, original, variations))
+    
+    def _iter_markdown_content(self, ad_data, original, variations):
+        """Gera o conteúdo Markdown para as variações, em blocos por seção."""
+        yield f"""# Spy Criativos - Variações de Anúncios
 
 **URL original:** {ad_data.get('url', 'N/A')}  
 **Plataforma:** {ad_data.get('platform', 'N/A').capitalize()}  
@@ -440,14 +737,14 @@ class ResultExporter:
 
         # Adiciona informações sobre imagens
         if ad_data.get('images') and len(ad_data['images']) > 0:
-            md += f"**Imagens:** {len(ad_data['images'])} imagem(ns) disponível(is)\n\n"
+            yield f"**Imagens:** {len(ad_data['images'])} imagem(ns) disponível(is)\n\n"
         
         # Adiciona as variações
-        md += "## Variações Geradas\n\n"
+        yield "## Variações Geradas\n\n"
         
         # Variação Emocional
         emocional = variations.get('emocional', {})
-        md += f"""### Variação A: Foco Emocional
+        yield f"""### Variação A: Foco Emocional
 
 **Headline:**  
 {emocional.get('headline', 'Sem título')}
@@ -462,7 +759,7 @@ class ResultExporter:
 
         # Variação Escassez
         escassez = variations.get('escassez', {})
-        md += f"""### Variação B: Foco em Escassez e Urgência
+        yield f"""### Variação B: Foco em Escassez e Urgência
 
 **Headline:**  
 {escassez.get('headline', 'Sem título')}
@@ -477,7 +774,7 @@ class ResultExporter:
 
         # Variação Autoridade
         autoridade = variations.get('autoridade', {})
-        md += f"""### Variação C: Foco em Autoridade / Prova Social
+        yield f"""### Variação C: Foco em Autoridade / Prova Social
 
 **Headline:**  
 {autoridade.get('headline', 'Sem título')}
@@ -488,19 +785,39 @@ class ResultExporter:
 **CTA:**  
 {autoridade.get('cta', 'Sem CTA')}
 
+"""
+
+        # Variações dos demais ângulos
+        for key, title, _ in EXTRA_VARIATION_SECTIONS:
+            if key not in variations:
+                continue
+            variation = variations[key]
+            yield f"""### {title}
+
+**Headline:**  
+{variation.get('headline', 'Sem título')}
+
+**Descrição:**  
+{variation.get('description', 'Sem descrição')}
+
+**CTA:**  
+{variation.get('cta', 'Sem CTA')}
+
 """
 
         # Rodapé
-        md += """---
+        yield """---
 
 *Gerado automaticamente pelo Spy Criativos*  
 *Todas as variações são otimizadas para maior conversão com base em análise de IA*
 """
-        
-        return md
     
     def _generate_landing_page_html(self, ad_data, landing_page):
         """Gera o HTML para a landing page."""
+        return ''.join(self._iter_landing_page_html(ad_data, landing_page))
+    
+    def _iter_landing_page_html(self, ad_data, landing_page):
+        """Gera o HTML para a landing page, em blocos (cabeçalho e corpo)."""
         # Extrai dados da landing page
         headline = landing_page.get('headline', 'Produto/Serviço Incrível')
         subheadline = landing_page.get('subheadline', 'Descubra como transformar sua experiência')
@@ -511,10 +828,10 @@ class ResultExporter:
         # Imagem do produto (usa a primeira imagem do anúncio, se disponível)
         image_url = '#'
         if ad_data.get('images') and len(ad_data['images']) > 0:
-            image_url = ad_data['images'][0]
+            image_url = self._image_src(ad_data, ad_data['images'][0])
         
         # Gera o HTML da landing page
-        html = f"""<!DOCTYPE html>
+        yield f"""<!DOCTYPE html>
 <html lang="pt-BR">
 <head>
     <meta charset="UTF-8">
@@ -664,7 +981,8 @@ class ResultExporter:
         }}
     </style>
 </head>
-<body>
+"""
+        yield f"""<body>
     <header>
         <div class="container">
             <h3>Apresentamos</h3>
@@ -707,12 +1025,16 @@ class ResultExporter:
 </body>
 </html>
 """
-        
-        return html
 
 
 # Função para uso direto
-def export_results(ad_data, analysis_result, output_dir=None):
+def export_results(ad_data, analysis_result, output_dir=None, force=False, pdf_mode='full'):
     """Função auxiliar para exportar resultados em todos os formatos."""
-    exporter = ResultExporter(output_dir=output_dir)
-    return exporter.export_all(ad_data, analysis_result)
+    exporter = ResultExporter(output_dir=output_dir, pdf_mode=pdf_mode)
+    return exporter.export_all(ad_data, analysis_result, force=force)
+
+
+def render_result(fmt, ad_data, analysis_result):
+    """Função auxiliar para renderizar um formato em memória (bytes), sem gravar em disco."""
+    exporter = ResultExporter(output_dir=None)
+    return exporter.render(fmt, ad_data, analysis_result)
@@ -0,0 +1,334 @@
+"""
+Módulo de processamento das imagens dos anúncios.
+As imagens são baixadas em paralelo (threads) e decodificadas em um pool de
+processos, que calcula hashes perceptuais (pHash e dHash) e grava miniaturas
+pequenas em cache. Um índice SQLite guarda os hashes e permite encontrar
+criativos que usam o mesmo visual (ou quase o mesmo) em anúncios diferentes.
+
+Requer o pacote 'Pillow'.
+"""
+
+import os
+import io
+import math
+import time
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import metrics
+import transport
+
+# Tamanho da imagem reduzida usada no pHash e quantidade de coeficientes da DCT (8x8 = 64 bits)
+PHASH_SIZE = 32
+PHASH_BITS = 8
+
+# O pHash é dividido em 8 faixas de 8 bits: duas imagens a distância < 8 coincidem
+# em pelo menos uma faixa, então a busca por similares consulta só essas faixas.
+BANDS = 8
+
+# Cossenos da DCT-II usados no pHash: _COS[u][x] = cos((2x + 1) * u * pi / (2N))
+_COS = [[math.cos((2 * x + 1) * u * math.pi / (2 * PHASH_SIZE)) for x in range(PHASH_SIZE)]
+        for u in range(PHASH_BITS)]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    url TEXT PRIMARY KEY,
+    phash TEXT,
+    dhash TEXT,
+    width INTEGER,
+    height INTEGER,
+    thumbnail TEXT,
+    error TEXT,
+    processed_at REAL NOT NULL,
+    b0 INTEGER, b1 INTEGER, b2 INTEGER, b3 INTEGER, b4 INTEGER, b5 INTEGER, b6 INTEGER, b7 INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_images_b0 ON images (b0);
+CREATE INDEX IF NOT EXISTS idx_images_b1 ON images (b1);
+CREATE INDEX IF NOT EXISTS idx_images_b2 ON images (b2);
+CREATE INDEX IF NOT EXISTS idx_images_b3 ON images (b3);
+CREATE INDEX IF NOT EXISTS idx_images_b4 ON images (b4);
+CREATE INDEX IF NOT EXISTS idx_images_b5 ON images (b5);
+CREATE INDEX IF NOT EXISTS idx_images_b6 ON images (b6);
+CREATE INDEX IF NOT EXISTS idx_images_b7 ON images (b7);
+CREATE TABLE IF NOT EXISTS ad_images (
+    ad_url TEXT NOT NULL,
+    image_url TEXT NOT NULL,
+    PRIMARY KEY (ad_url, image_url)
+);
+CREATE INDEX IF NOT EXISTS idx_ad_images_image ON ad_images (image_url);
+"""
+
+
+def _phash(gray):
+    """pHash de uma imagem em tons de cinza PHASH_SIZE x PHASH_SIZE (DCT separável, só as baixas frequências)."""
+    pixels = list(gray.getdata())
+    rows = [pixels[y * PHASH_SIZE:(y + 1) * PHASH_SIZE] for y in range(PHASH_SIZE)]
+    # DCT nas linhas, apenas as PHASH_BITS primeiras frequências
+    row_dct = [[sum(p * c for p, c in zip(row, _COS[u])) for u in range(PHASH_BITS)] for row in rows]
+    # DCT nas colunas
+    coefficients = [sum(row_dct[y][u] * _COS[v][y] for y in range(PHASH_SIZE))
+                    for v in range(PHASH_BITS) for u in range(PHASH_BITS)]
+    # A mediana ignora o componente DC, que só reflete o brilho médio
+    median = sorted(coefficients[1:])[len(coefficients[1:]) // 2]
+    value = 0
+    for coefficient in coefficients:
+        value = (value << 1) | (coefficient > median)
+    return value
+
+
+def _dhash(image):
+    """dHash: compara pixels vizinhos de uma versão 9x8 em tons de cinza."""
+    from PIL import Image
+
+    small = image.convert('L').resize((9, 8), Image.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for y in range(8):
+        for x in range(8):
+            value = (value << 1) | (pixels[y * 9 + x] > pixels[y * 9 + x + 1])
+    return value
+
+
+def _process_image(data, thumbnail_path, thumbnail_size):
+    """Executado no pool de processos: decodifica a imagem, calcula os hashes e grava a miniatura."""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    width, height = image.size
+    # Em JPEGs, decodifica direto em escala reduzida (bem mais rápido que decodificar e reduzir)
+    image.draft('RGB', (max(thumbnail_size[0], PHASH_SIZE), max(thumbnail_size[1], PHASH_SIZE)))
+    image = image.convert('RGB')
+
+    gray = image.convert('L').resize((PHASH_SIZE, PHASH_SIZE), Image.LANCZOS)
+    phash = _phash(gray)
+    dhash = _dhash(image)
+
+    image.thumbnail(thumbnail_size)
+    image.save(thumbnail_path, 'JPEG', quality=80, optimize=True)
+    return {
+        'phash': f"{phash:016x}",
+        'dhash': f"{dhash:016x}",
+        'width': width,
+        'height': height,
+        'thumbnail': thumbnail_path
+    }
+
+
+def hamming(a, b):
+    """Distância de Hamming entre dois hashes em hexadecimal."""
+    return (int(a, 16) ^ int(b, 16)).bit_count()
+
+
+def _bands(phash):
+    value = int(phash, 16)
+    return [(value >> (8 * (BANDS - 1 - i))) & 0xFF for i in range(BANDS)]
+
+
+class ImageIndex:
+    """Classe de acesso ao índice de imagens em SQLite (segura para uso por várias threads)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+    def add(self, url, info):
+        """Registra o resultado do processamento de uma imagem (ou o erro, em info['error'])."""
+        bands = _bands(info['phash']) if info.get('phash') else [None] * BANDS
+        with self._lock:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO images
+                   (url, phash, dhash, width, height, thumbnail, error, processed_at, b0, b1, b2, b3, b4, b5, b6, b7)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                [url, info.get('phash'), info.get('dhash'), info.get('width'), info.get('height'),
+                 info.get('thumbnail'), info.get('error'), time.time()] + bands
+            )
+            self._conn.commit()
+
+    def get(self, url):
+        """Retorna os dados de uma imagem já processada, ou None."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT url, phash, dhash, width, height, thumbnail, error FROM images WHERE url = ?', (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('url', 'phash', 'dhash', 'width', 'height', 'thumbnail', 'error'), row))
+
+    def link(self, ad_url, image_urls):
+        """Associa as imagens ao anúncio."""
+        with self._lock:
+            self._conn.executemany('INSERT OR IGNORE INTO ad_images (ad_url, image_url) VALUES (?, ?)',
+                                   [(ad_url, image_url) for image_url in image_urls])
+            self._conn.commit()
+
+    def similar(self, phash, max_distance=6, limit=50):
+        """Imagens com pHash a no máximo max_distance bits (max_distance < 8), das mais próximas às mais distantes."""
+        if max_distance >= BANDS:
+            raise ValueError(f"max_distance deve ser menor que {BANDS}")
+        bands = _bands(phash)
+        conditions = ' OR '.join(f"b{i} = ?" for i in range(BANDS))
+        with self._lock:
+            rows = self._conn.execute(f"SELECT url, phash, thumbnail FROM images WHERE {conditions}", bands).fetchall()
+        matches = []
+        for url, candidate, thumbnail in rows:
+            distance = hamming(phash, candidate)
+            if distance <= max_distance:
+                matches.append({'url': url, 'phash': candidate, 'thumbnail': thumbnail, 'distance': distance})
+        matches.sort(key=lambda match: match['distance'])
+        return matches[:limit]
+
+    def groups(self, max_distance=6, min_size=2):
+        """Agrupa os anúncios que usam visuais iguais ou quase iguais; retorna listas de URLs de anúncios."""
+        with self._lock:
+            images = self._conn.execute('SELECT url, phash FROM images WHERE phash IS NOT NULL').fetchall()
+            links = self._conn.execute('SELECT ad_url, image_url FROM ad_images').fetchall()
+
+        parent = {url: url for url, _ in images}
+
+        def find(url):
+            while parent[url] != url:
+                parent[url] = parent[parent[url]]
+                url = parent[url]
+            return url
+
+        for url, phash in images:
+            for match in self.similar(phash, max_distance, limit=1000):
+                a, b = find(url), find(match['url'])
+                if a != b:
+                    parent[a] = b
+
+        clusters = {}
+        for ad_url, image_url in links:
+            if image_url in parent:
+                clusters.setdefault(find(image_url), set()).add(ad_url)
+        return sorted((sorted(ads) for ads in clusters.values() if len(ads) >= min_size), key=len, reverse=True)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ImageProcessor:
+    """Classe que baixa, processa e indexa as imagens dos anúncios."""
+
+    def __init__(self, cache_dir='image_cache', workers=None, download_workers=8, thumbnail_size=(320, 320),
+                 max_images=4, max_bytes=10 * 1024 * 1024, timeout=15):
+        """
+        As miniaturas ficam em cache_dir/thumbs e o índice em cache_dir/images.db.
+        workers é o tamanho do pool de processos (padrão: CPUs); download_workers o
+        de threads de download. max_images limita as imagens processadas por anúncio
+        e max_bytes o tamanho de cada download.
+        """
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            raise RuntimeError("O processamento de imagens requer o pacote 'Pillow'")
+        self.cache_dir = cache_dir
+        self.thumbnail_size = tuple(thumbnail_size)
+        self.max_images = max_images
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        os.makedirs(os.path.join(cache_dir, 'thumbs'), exist_ok=True)
+        self.index = ImageIndex(os.path.join(cache_dir, 'images.db'))
+        self._process_pool = ProcessPoolExecutor(max_workers=workers)
+        self._download_pool = ThreadPoolExecutor(max_workers=download_workers, thread_name_prefix='image-download')
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def process(self, ad_data):
+        """Processa as imagens de um anúncio e adiciona 'image_data' (hashes e miniaturas) a ele."""
+        return self.process_many([ad_data])[0]
+
+    def process_many(self, ads):
+        """Processa as imagens de vários anúncios; cada imagem é baixada e processada uma única vez."""
+        futures = {}
+        for ad in ads:
+            for url in ad.get('images', [])[:self.max_images]:
+                if url not in futures:
+                    futures[url] = self._submit(url)
+
+        results = {url: future.result() for url, future in futures.items()}
+        for ad in ads:
+            urls = ad.get('images', [])[:self.max_images]
+            ad['image_data'] = [dict(results[url], url=url) for url in urls]
+            if ad.get('url') and urls:
+                self.index.link(ad['url'], urls)
+        return ads
+
+    def close(self):
+        self._download_pool.shutdown(wait=True)
+        self._process_pool.shutdown(wait=True)
+        self.index.close()
+
+    def _submit(self, url):
+        """Agenda uma imagem (reaproveitando o índice e processamentos em andamento da mesma URL)."""
+        with self._lock:
+            future = self._inflight.get(url)
+            if future is not None:
+                return future
+            cached = self.index.get(url)
+            metrics.record_cache('image_index', cached is not None and not cached['error'])
+            if cached is not None and not cached['error'] and os.path.exists(cached['thumbnail'] or ''):
+                future = self._download_pool.submit(lambda: cached)
+            else:
+                future = self._download_pool.submit(self._fetch_and_process, url)
+                self._inflight[url] = future
+                future.add_done_callback(lambda _: self._forget(url))
+            return future
+
+    def _forget(self, url):
+        with self._lock:
+            self._inflight.pop(url, None)
+
+    def _fetch_and_process(self, url):
+        """Baixa a imagem (thread) e a envia ao pool de processos; o resultado é gravado no índice."""
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        thumbnail_path = os.path.join(self.cache_dir, 'thumbs', f"{key}.jpg")
+        try:
+            data = self._download(url)
+            info = self._process_pool.submit(_process_image, data, thumbnail_path, self.thumbnail_size).result()
+        except Exception as e:
+            metrics.record_error('images', type(e).__name__)
+            info = {'error': str(e)}
+        self.index.add(url, info)
+        return dict(info, url=url)
+
+    def _download(self, url):
+        if not hasattr(self._local, 'session'):
+            from scraper import AdScraper
+            self._local.session = AdScraper(session=transport.shared_session()).session
+        response = self._local.session.get(url, timeout=self.timeout, stream=True)
+        try:
+            response.raise_for_status()
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(chunk_size=65536):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > self.max_bytes:
+                    raise ValueError(f"Imagem maior que {self.max_bytes} bytes")
+        finally:
+            response.close()
+        metrics.registry.inc('spy_bytes_fetched_total', size, platform='image')
+        return b''.join(chunks)
+
+
+# Função para uso direto
+def process_ad_images(ads, cache_dir='image_cache', **options):
+    """Função auxiliar para processar as imagens de uma lista de anúncios."""
+    with ImageProcessor(cache_dir, **options) as processor:
+        return processor.process_many(ads)
@@ -0,0 +1,308 @@
+"""
+Módulo de fila de jobs persistente (SQLite) para lotes grandes de URLs.
+Cada URL guarda a etapa atual (scrape -> analyze -> export -> done), o número de
+tentativas e um lease; o progresso é gravado após cada etapa, então uma execução
+interrompida continua exatamente de onde parou.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+from scraper import AdScraper
+from analyzer import CreativeAnalyzer
+from exporter import ResultExporter
+import metrics
+import transport
+
+# Etapas do job, na ordem em que são executadas
+STAGES = ('scrape', 'analyze', 'export', 'done')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    stage TEXT NOT NULL DEFAULT 'scrape',
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    ad_data TEXT,
+    analysis TEXT,
+    export TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, lease_expires);
+"""
+
+
+class JobQueue:
+    """Classe de acesso à fila de jobs em SQLite (segura para uso por várias threads e processos)."""
+    
+    def __init__(self, path, max_attempts=3, lease_seconds=300):
+        """Abre (ou cria) a fila no arquivo SQLite indicado."""
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+    
+    def enqueue(self, urls, batch_size=1000):
+        """Adiciona URLs à fila em lotes; URLs já presentes são ignoradas. Retorna quantas foram inseridas."""
+        inserted = 0
+        batch = []
+        for url in urls:
+            url = url.strip()
+            if url:
+                batch.append((url, time.time()))
+            if len(batch) >= batch_size:
+                inserted += self._insert(batch)
+                batch = []
+        if batch:
+            inserted += self._insert(batch)
+        return inserted
+    
+    def claim(self, worker_id, batch_size=50):
+        """
+        Reserva até batch_size jobs pendentes (ou com lease expirado) para o worker.
+        A tentativa é contada na reserva: um job que derruba o worker não volta à
+        fila indefinidamente. Retorna uma lista de dicts com id, url, stage,
+        attempts e os dados já salvos.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Jobs abandonados (lease expirado ou liberado) que já esgotaram as tentativas
+                self._conn.execute(
+                    """UPDATE jobs SET status = 'failed', lease_owner = NULL, lease_expires = NULL, updated_at = ?,
+                           error = COALESCE(error, 'Tentativas esgotadas sem conclusão')
+                       WHERE status = 'pending' AND (lease_expires IS NULL OR lease_expires < ?) AND attempts >= ?""",
+                    (now, now, self.max_attempts)
+                )
+                rows = self._conn.execute(
+                    """SELECT id FROM jobs
+                       WHERE status = 'pending' AND (lease_expires IS NULL OR lease_expires < ?)
+                       ORDER BY id LIMIT ?""",
+                    (now, batch_size)
+                ).fetchall()
+                ids = [row[0] for row in rows]
+                if ids:
+                    marks = ','.join('?' * len(ids))
+                    self._conn.execute(
+                        f"""UPDATE jobs SET lease_owner = ?, lease_expires = ?, attempts = attempts + 1,
+                                updated_at = ? WHERE id IN ({marks})""",
+                        [worker_id, now + self.lease_seconds, now] + ids
+                    )
+                    rows = self._conn.execute(
+                        f"SELECT id, url, stage, attempts, ad_data, analysis FROM jobs WHERE id IN ({marks}) ORDER BY id",
+                        ids
+                    ).fetchall()
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        
+        return [{
+            'id': row[0],
+            'url': row[1],
+            'stage': row[2],
+            'attempts': row[3],
+            'ad_data': json.loads(row[4]) if row[4] else None,
+            'analysis': json.loads(row[5]) if row[5] else None
+        } for row in rows] if ids else []
+    
+    def renew(self, job_ids, worker_id):
+        """Renova o lease dos jobs ainda reservados pelo worker; retorna os ids que continuam dele."""
+        if not job_ids:
+            return set()
+        marks = ','.join('?' * len(job_ids))
+        with self._lock:
+            self._conn.execute(
+                f"""UPDATE jobs SET lease_expires = ?
+                    WHERE id IN ({marks}) AND lease_owner = ? AND status = 'pending'""",
+                [time.time() + self.lease_seconds] + list(job_ids) + [worker_id]
+            )
+            rows = self._conn.execute(
+                f"SELECT id FROM jobs WHERE id IN ({marks}) AND lease_owner = ? AND status = 'pending'",
+                list(job_ids) + [worker_id]
+            ).fetchall()
+        return {row[0] for row in rows}
+    
+    def checkpoint(self, job_id, worker_id, stage, field=None, value=None):
+        """
+        Registra a conclusão de uma etapa: avança o job para 'stage' e salva o
+        resultado da etapa. Retorna 0 se o worker já não detém o lease do job.
+        """
+        assignments = ['stage = ?', 'error = NULL', 'updated_at = ?']
+        params = [stage, time.time()]
+        if field:
+            if field not in ('ad_data', 'analysis', 'export'):
+                raise ValueError(f"Campo de checkpoint desconhecido: {field}")
+            assignments.append(f"{field} = ?")
+            params.append(json.dumps(value, ensure_ascii=False))
+        if stage == 'done':
+            assignments += ["status = 'done'", 'lease_owner = NULL', 'lease_expires = NULL']
+        else:
+            # Renova o lease a cada etapa concluída
+            assignments.append('lease_expires = ?')
+            params.append(time.time() + self.lease_seconds)
+        params += [job_id, worker_id]
+        return self._execute(
+            f"UPDATE jobs SET {', '.join(assignments)} WHERE id = ? AND lease_owner = ?", params
+        )
+    
+    def fail(self, job_id, worker_id, error):
+        """
+        Registra uma falha: libera o lease e marca o job como 'failed' ao atingir
+        max_attempts (a tentativa já foi contada na reserva).
+        """
+        return self._execute(
+            """UPDATE jobs SET error = ?, lease_owner = NULL, lease_expires = NULL,
+                   status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, updated_at = ?
+               WHERE id = ? AND lease_owner = ?""",
+            (str(error), self.max_attempts, time.time(), job_id, worker_id)
+        )
+    
+    def release(self, worker_id=None):
+        """Libera os leases de um worker (ou de todos) sem contar tentativa; útil ao reiniciar uma execução."""
+        if worker_id is None:
+            return self._execute("UPDATE jobs SET lease_owner = NULL, lease_expires = NULL WHERE status = 'pending'")
+        return self._execute(
+            "UPDATE jobs SET lease_owner = NULL, lease_expires = NULL WHERE status = 'pending' AND lease_owner = ?",
+            (worker_id,)
+        )
+    
+    def retry_failed(self):
+        """Devolve os jobs com falha definitiva para a fila, zerando as tentativas."""
+        return self._execute("UPDATE jobs SET status = 'pending', attempts = 0 WHERE status = 'failed'")
+    
+    def stats(self):
+        """Retorna a contagem de jobs por status e, entre os pendentes, por etapa."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT status, stage, COUNT(*) FROM jobs GROUP BY status, stage'
+            ).fetchall()
+        stats = {'pending': 0, 'done': 0, 'failed': 0, 'stages': {}}
+        for status, stage, count in rows:
+            stats[status] = stats.get(status, 0) + count
+            if status == 'pending':
+                stats['stages'][stage] = stats['stages'].get(stage, 0) + count
+        return stats
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+    
+    def _insert(self, batch):
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute('BEGIN')
+            self._conn.executemany('INSERT OR IGNORE INTO jobs (url, updated_at) VALUES (?, ?)', batch)
+            self._conn.execute('COMMIT')
+            return self._conn.total_changes - before
+    
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+
+class BatchRunner:
+    """Classe que processa a fila: cada worker reserva lotes e grava checkpoint após cada etapa."""
+    
+    def __init__(self, job_queue, output_dir, workers=4, claim_size=20, pdf_mode='full'):
+        """Cada anúncio é exportado em output_dir/<id do job>."""
+        self.queue = job_queue
+        self.output_dir = output_dir
+        self.workers = workers
+        self.claim_size = claim_size
+        self.pdf_mode = pdf_mode
+        self.run_id = uuid.uuid4().hex[:8]
+        self.analyzer = CreativeAnalyzer()
+    
+    def run(self):
+        """Processa a fila até esvaziar; retorna as estatísticas finais."""
+        threads = [threading.Thread(target=self._work, args=(f"{self.run_id}-{i}",)) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.queue.stats()
+    
+    def _work(self, worker_id):
+        scraper = AdScraper(session=transport.shared_session())
+        while True:
+            jobs = self.queue.claim(worker_id, self.claim_size)
+            if not jobs:
+                return
+            for stage, count in self.queue.stats()['stages'].items():
+                metrics.registry.set_gauge('spy_queue_depth', count, queue=f"jobqueue_{stage}")
+            pending = [job['id'] for job in jobs]
+            for job in jobs:
+                # Renova o lease do lote inteiro: os jobs que aguardam a vez não podem expirar
+                owned = self.queue.renew(pending, worker_id)
+                pending.remove(job['id'])
+                if job['id'] not in owned:
+                    continue
+                try:
+                    self._process(job, worker_id, scraper)
+                except Exception as e:
+                    self.queue.fail(job['id'], worker_id, e)
+    
+    def _process(self, job, worker_id, scraper):
+        """
+        Executa as etapas restantes do job, gravando checkpoint ao final de cada
+        uma. Se o lease foi perdido (checkpoint retorna 0), outro worker assumiu o
+        job e o processamento para.
+        """
+        ad_data = job['ad_data']
+        analysis = job['analysis']
+        
+        if job['stage'] == 'scrape':
+            ad_data = scraper.scrape_ad(job['url'])
+            if not ad_data.get('success'):
+                return self.queue.fail(job['id'], worker_id, ad_data.get('error', 'Falha no scraping'))
+            if not self.queue.checkpoint(job['id'], worker_id, 'analyze', 'ad_data', ad_data):
+                return 0
+            job['stage'] = 'analyze'
+        
+        if job['stage'] == 'analyze':
+            analysis = self.analyzer.analyze_creative(ad_data)
+            if analysis['success']:
+                analysis = self.analyzer.generate_variations(analysis)
+            if not analysis.get('success'):
+                return self.queue.fail(job['id'], worker_id, analysis.get('error', 'Falha na análise'))
+            if not self.queue.checkpoint(job['id'], worker_id, 'export', 'analysis', analysis):
+                return 0
+            job['stage'] = 'export'
+        
+        if job['stage'] == 'export':
+            exporter = ResultExporter(os.path.join(self.output_dir, f"{job['id']:08d}"), pdf_mode=self.pdf_mode)
+            export = exporter.export_all(ad_data, analysis)
+            if not export.get('success'):
+                errors = [r.get('error') for r in export.get('results', {}).values() if r.get('error')]
+                return self.queue.fail(job['id'], worker_id, '; '.join(errors) or 'Falha na exportação')
+            return self.queue.checkpoint(job['id'], worker_id, 'done', 'export', export)
+
+
+# Função para uso direto
+def run_batch(urls, db_path, output_dir, workers=4, pdf_mode='full'):
+    """
+    Função auxiliar para enfileirar URLs e processar a fila persistente.
+    Chamadas repetidas com o mesmo db_path retomam o lote sem refazer etapas concluídas.
+    """
+    job_queue = JobQueue(db_path)
+    try:
+        job_queue.enqueue(urls)
+        # Leases de uma execução anterior interrompida não pertencem a ninguém
+        job_queue.release()
+        return BatchRunner(job_queue, output_dir, workers=workers, pdf_mode=pdf_mode).run()
+    finally:
+        job_queue.close()
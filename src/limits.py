@@ -0,0 +1,158 @@
+"""
+Módulo de limites de recursos por anúncio (modo de memória limitada).
+Define tetos para os bytes da resposta, o número de nós do DOM, as imagens por
+anúncio, o tamanho dos textos exportados e o tempo de processamento de cada
+anúncio. O scraper e o exportador aplicam os limites e registram cada corte no
+resultado (campo 'truncation'), para que páginas gigantes ou maliciosas não
+façam o RSS dos workers crescer sem controle.
+"""
+
+import re
+import time
+
+# Limites padrão do modo de memória limitada
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_MAX_NODES = 20000
+DEFAULT_MAX_IMAGES = 20
+DEFAULT_MAX_SECONDS = 30
+DEFAULT_MAX_TEXT = 5000
+
+# Início de um elemento (tags, comentários e doctype contam como nós)
+NODE_PATTERN = re.compile(r'<[a-zA-Z!]')
+# Conteúdo de <script> e <style>, que os extratores não usam
+SCRIPT_PATTERN = re.compile(r'(<(script|style)\b[^>]*>).*?(</\2\s*>)', re.IGNORECASE | re.DOTALL)
+
+# Campos de texto limitados na exportação
+TEXT_FIELDS = ('headline', 'subheadline', 'description', 'cta')
+
+
+def note(truncation, reason, limit, observed=None):
+    """Registra um corte em truncation[reason] (limite aplicado e, se conhecido, o valor observado)."""
+    entry = {'limit': limit}
+    if observed is not None:
+        entry['observed'] = observed
+    truncation[reason] = entry
+    return truncation
+
+
+class Deadline:
+    """Prazo de processamento de um anúncio."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.start = time.monotonic()
+
+    def elapsed(self):
+        return time.monotonic() - self.start
+
+    def remaining(self):
+        return max(0.0, self.seconds - self.elapsed()) if self.seconds else None
+
+    def expired(self):
+        return bool(self.seconds) and self.elapsed() >= self.seconds
+
+
+class ResourceLimits:
+    """Classe com os tetos de recursos por anúncio e as operações que os aplicam."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_nodes=DEFAULT_MAX_NODES, max_images=DEFAULT_MAX_IMAGES,
+                 max_seconds=DEFAULT_MAX_SECONDS, max_text=DEFAULT_MAX_TEXT, strip_scripts=True):
+        """
+        max_bytes limita o corpo baixado; max_nodes os elementos entregues ao
+        BeautifulSoup (o HTML é cortado antes da análise); max_images as imagens
+        por anúncio; max_seconds o tempo de cada anúncio (download e exportação
+        param no prazo, com o que já tiverem); max_text cada campo de texto
+        exportado. strip_scripts remove o conteúdo de <script> e <style> antes da
+        análise. Use None em qualquer limite para desativá-lo.
+        """
+        self.max_bytes = max_bytes
+        self.max_nodes = max_nodes
+        self.max_images = max_images
+        self.max_seconds = max_seconds
+        self.max_text = max_text
+        self.strip_scripts = strip_scripts
+
+    def deadline(self):
+        return Deadline(self.max_seconds)
+
+    def read_body(self, response, deadline, truncation, chunk_size=65536):
+        """Lê o corpo de uma resposta em streaming até max_bytes ou até o prazo acabar."""
+        declared = response.headers.get('Content-Length')
+        declared = int(declared) if declared and declared.isdigit() else None
+        chunks = []
+        size = 0
+        try:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                chunks.append(chunk)
+                size += len(chunk)
+                if self.max_bytes and size >= self.max_bytes:
+                    note(truncation, 'bytes', self.max_bytes, declared)
+                    return b''.join(chunks)[:self.max_bytes]
+                if deadline.expired():
+                    note(truncation, 'time', self.max_seconds, round(deadline.elapsed(), 3))
+                    break
+        finally:
+            response.close()
+        return b''.join(chunks)
+
+    def bound_html(self, html_content, truncation):
+        """Remove scripts/estilos e corta o HTML no nó max_nodes antes da análise."""
+        if self.strip_scripts:
+            original = len(html_content)
+            html_content = SCRIPT_PATTERN.sub(r'\1\3', html_content)
+            if len(html_content) < original:
+                truncation['scripts'] = {'removed_chars': original - len(html_content)}
+
+        if self.max_nodes:
+            for count, match in enumerate(NODE_PATTERN.finditer(html_content)):
+                if count == self.max_nodes:
+                    note(truncation, 'nodes', self.max_nodes)
+                    return html_content[:match.start()]
+        return html_content
+
+    def bound_images(self, result, truncation):
+        """Mantém no máximo max_images imagens no anúncio extraído."""
+        images = result.get('images') or []
+        if self.max_images is not None and len(images) > self.max_images:
+            note(truncation, 'images', self.max_images, len(images))
+            result['images'] = images[:self.max_images]
+        return result
+
+    def bound_export(self, ad_data, analysis_result, truncation):
+        """
+        Cópias limitadas das entradas da exportação: imagens (e miniaturas) até
+        max_images e textos do anúncio e das variações até max_text caracteres.
+        """
+        ad_data = dict(ad_data)
+        for field in ('images', 'image_data'):
+            items = ad_data.get(field) or []
+            if self.max_images is not None and len(items) > self.max_images:
+                note(truncation, field, self.max_images, len(items))
+                ad_data[field] = items[:self.max_images]
+
+        if not self.max_text:
+            return ad_data, analysis_result
+
+        cut = {}
+        ad_data = self._bound_texts(ad_data, cut)
+        analysis_result = dict(analysis_result)
+        for section in ('original', 'landing_page'):
+            if isinstance(analysis_result.get(section), dict):
+                analysis_result[section] = self._bound_texts(analysis_result[section], cut)
+        if isinstance(analysis_result.get('variations'), dict):
+            analysis_result['variations'] = {
+                angle: self._bound_texts(variation, cut) if isinstance(variation, dict) else variation
+                for angle, variation in analysis_result['variations'].items()
+            }
+        if cut:
+            note(truncation, 'text', self.max_text, max(cut.values()))
+        return ad_data, analysis_result
+
+    def _bound_texts(self, data, cut):
+        bounded = dict(data)
+        for field in TEXT_FIELDS:
+            value = bounded.get(field)
+            if isinstance(value, str) and len(value) > self.max_text:
+                cut[field] = max(cut.get(field, 0), len(value))
+                bounded[field] = value[:self.max_text]
+        return bounded
@@ -0,0 +1,178 @@
+"""
+Módulo de métricas por etapa (scraping, análise, exportação).
+Registra contadores, gauges e histogramas de latência e os expõe no formato
+texto do Prometheus, via endpoint HTTP (/metrics no server.py) ou arquivo.
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+# Limites dos buckets dos histogramas de latência (segundos)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Descrição e tipo de cada métrica conhecida
+METRICS_HELP = {
+    'spy_stage_duration_seconds': ('histogram', 'Latência de cada etapa por plataforma'),
+    'spy_parse_duration_seconds': ('histogram', 'Tempo de parsing do HTML por plataforma'),
+    'spy_export_duration_seconds': ('histogram', 'Tempo de exportação por formato'),
+    'spy_bytes_fetched_total': ('counter', 'Bytes baixados por plataforma'),
+    'spy_requests_total': ('counter', 'Itens processados por etapa e plataforma'),
+    'spy_errors_total': ('counter', 'Erros por etapa e tipo'),
+    'spy_cache_requests_total': ('counter', 'Consultas a caches por resultado (hit/miss)'),
+    'spy_queue_depth': ('gauge', 'Itens aguardando em cada fila'),
+    'spy_monitor_checks_total': ('counter', 'Revisitas do monitoramento por resultado'),
+    'spy_distributed_tasks_total': ('counter', 'Tarefas processadas pelos workers distribuídos por tipo'),
+    'spy_truncations_total': ('counter', 'Cortes aplicados pelos limites de recursos por etapa e motivo'),
+}
+
+
+class MetricsRegistry:
+    """Classe que acumula as métricas do processo (segura para uso por várias threads)."""
+    
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+    
+    def inc(self, name, value=1, **labels):
+        """Incrementa um contador."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def set_gauge(self, name, value, **labels):
+        """Define o valor atual de um gauge."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = value
+    
+    def observe(self, name, value, **labels):
+        """Registra uma observação em um histograma."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, limit in enumerate(self.buckets):
+                if value <= limit:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+    
+    @contextmanager
+    def timer(self, name, **labels):
+        """Mede o tempo do bloco e o registra no histograma indicado."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+    
+    def snapshot(self):
+        """Retorna uma cópia dos valores atuais (contadores, gauges e histogramas)."""
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'histograms': {k: {'buckets': list(v['buckets']), 'sum': v['sum'], 'count': v['count']}
+                               for k, v in self._histograms.items()}
+            }
+    
+    def render(self):
+        """Gera as métricas no formato de exposição texto do Prometheus."""
+        data = self.snapshot()
+        series = {}
+        for kind in ('counters', 'gauges', 'histograms'):
+            for (name, labels), value in data[kind].items():
+                series.setdefault(name, []).append((labels, value))
+        
+        lines = []
+        for name in sorted(series):
+            kind, help_text = METRICS_HELP.get(name, ('untyped', name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(series[name], key=lambda item: item[0]):
+                if isinstance(value, dict):
+                    for limit, count in zip(self.buckets, value['buckets']):
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', repr(float(limit))),))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {value['count']}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']:.6f}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+    
+    def write(self, path):
+        """Grava as métricas em arquivo de forma atômica (ex.: para o textfile collector do node_exporter)."""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+    
+    def reset(self):
+        """Zera todas as métricas."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+# Registro global usado pelo scraper, analisador e exportador
+registry = MetricsRegistry()
+
+
+@contextmanager
+def stage_timer(stage, platform=''):
+    """Mede a latência de uma etapa; exceções não tratadas são contadas como erro da etapa."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        record_error(stage, type(e).__name__)
+        raise
+    finally:
+        registry.observe('spy_stage_duration_seconds', time.perf_counter() - start, stage=stage, platform=platform or 'unknown')
+        registry.inc('spy_requests_total', stage=stage, platform=platform or 'unknown')
+
+
+def record_error(stage, error_type):
+    """Conta um erro de uma etapa pelo tipo."""
+    registry.inc('spy_errors_total', stage=stage, type=error_type)
+
+
+def record_cache(cache, hit):
+    """Conta uma consulta a um cache como hit ou miss."""
+    registry.inc('spy_cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+
+def record_truncation(stage, truncation):
+    """Conta os cortes do modo de memória limitada (um por motivo registrado no resultado)."""
+    for reason in truncation:
+        registry.inc('spy_truncations_total', stage=stage, reason=reason)
+
+
+def start_file_writer(path, interval=15):
+    """Grava as métricas em arquivo a cada 'interval' segundos, em uma thread daemon. Retorna o evento de parada."""
+    stop = threading.Event()
+    
+    def loop():
+        while not stop.wait(interval):
+            registry.write(path)
+        registry.write(path)
+    
+    threading.Thread(target=loop, daemon=True, name='metrics-writer').start()
+    return stop
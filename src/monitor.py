@@ -0,0 +1,269 @@
+"""
+Módulo de monitoramento de mudanças em anúncios e landing pages.
+Cada URL é revisitada em um intervalo próprio, que diminui quando a página muda
+e aumenta enquanto ela fica estável. As revisitas usam requisições condicionais
+(ETag / Last-Modified) e uma impressão digital dos campos extraídos; análise e
+exportação só rodam quando headline, descrição, imagens, CTA ou landing page mudam.
+
+Uso:
+    python src/monitor.py monitor.db --add urls.txt --output-dir output --forever
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from scraper import AdScraper
+from analyzer import CreativeAnalyzer
+from exporter import ResultExporter
+import metrics
+import transport
+
+# Campos extraídos cuja mudança dispara nova análise e exportação
+FINGERPRINT_FIELDS = ('headline', 'description', 'images', 'cta', 'landing_page')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    interval REAL NOT NULL,
+    next_check REAL NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fingerprint TEXT,
+    checks INTEGER NOT NULL DEFAULT 0,
+    changes INTEGER NOT NULL DEFAULT 0,
+    last_checked REAL,
+    last_changed REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_pages_next_check ON pages (next_check);
+"""
+
+
+def fingerprint(ad_data):
+    """Impressão digital dos campos relevantes de um anúncio extraído."""
+    fields = {field: ad_data.get(field) for field in FINGERPRINT_FIELDS}
+    payload = json.dumps(fields, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ChangeMonitor:
+    """Classe que agenda as revisitas e só reprocessa as páginas que mudaram."""
+
+    def __init__(self, path, output_dir='output', initial_interval=86400, min_interval=3600,
+                 max_interval=7 * 86400, speedup=0.5, backoff=1.5, pdf_mode='full', store=None):
+        """
+        Abre (ou cria) o estado do monitoramento no arquivo SQLite indicado.
+
+        Ao detectar mudança o intervalo da URL é multiplicado por speedup; sem
+        mudança, por backoff, sempre entre min_interval e max_interval (segundos).
+        Cada URL é exportada em output_dir/<id da página>. store (um
+        corpus.CorpusStore) recebe cada versão nova analisada.
+        """
+        self.path = path
+        self.output_dir = output_dir
+        self.initial_interval = initial_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.speedup = speedup
+        self.backoff = backoff
+        self.pdf_mode = pdf_mode
+        self.store = store
+        self.analyzer = CreativeAnalyzer()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+    def add(self, urls, interval=None):
+        """Passa a monitorar as URLs (primeira visita imediata); URLs já monitoradas são ignoradas."""
+        interval = interval or self.initial_interval
+        now = time.time()
+        rows = [(url.strip(), interval, now) for url in urls if url.strip()]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute('BEGIN')
+            self._conn.executemany('INSERT OR IGNORE INTO pages (url, interval, next_check) VALUES (?, ?, ?)', rows)
+            self._conn.execute('COMMIT')
+            return self._conn.total_changes - before
+
+    def remove(self, url):
+        with self._lock:
+            return self._conn.execute('DELETE FROM pages WHERE url = ?', (url,)).rowcount
+
+    def due(self, now=None, limit=1000):
+        """Retorna as páginas cuja revisita está vencida, das mais atrasadas para as mais recentes."""
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT id, url, interval, etag, last_modified, fingerprint FROM pages
+                   WHERE next_check <= ? ORDER BY next_check LIMIT ?""",
+                (now or time.time(), limit)
+            ).fetchall()
+        return [{
+            'id': row[0],
+            'url': row[1],
+            'interval': row[2],
+            'etag': row[3],
+            'last_modified': row[4],
+            'fingerprint': row[5]
+        } for row in rows]
+
+    def next_due(self):
+        """Momento (epoch) da próxima revisita agendada, ou None se não há páginas."""
+        with self._lock:
+            return self._conn.execute('SELECT MIN(next_check) FROM pages').fetchone()[0]
+
+    def check(self, page):
+        """
+        Revisita uma página e retorna o resultado: 'not_modified' (304), 'unchanged'
+        (campos iguais), 'changed' (analisada e exportada) ou 'failed'.
+        """
+        scraper = self._scraper()
+        now = time.time()
+        ad_data = scraper.scrape_ad(page['url'], etag=page['etag'], last_modified=page['last_modified'])
+
+        if not ad_data.get('success'):
+            status = 'failed'
+            # Falhas mantêm o intervalo e os validadores atuais
+            self._update(page, now, page['interval'], error=ad_data.get('error', 'Falha no scraping'))
+        elif ad_data.get('not_modified'):
+            status = 'not_modified'
+            self._update(page, now, self._next_interval(page['interval'], False))
+        else:
+            current = fingerprint(ad_data)
+            changed = current != page['fingerprint']
+            if changed:
+                self._reprocess(page, ad_data)
+            status = 'changed' if changed else 'unchanged'
+            self._update(page, now, self._next_interval(page['interval'], changed), ad_data=ad_data,
+                         fingerprint=current, changed=changed)
+
+        metrics.registry.inc('spy_monitor_checks_total', result=status)
+        return {'url': page['url'], 'status': status}
+
+    def run_once(self, workers=8, limit=1000):
+        """Revisita as páginas vencidas em paralelo; retorna a contagem por resultado."""
+        pages = self.due(limit=limit)
+        counts = {'not_modified': 0, 'unchanged': 0, 'changed': 0, 'failed': 0}
+        if not pages:
+            return counts
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='monitor') as pool:
+            for result in pool.map(self._safe_check, pages):
+                counts[result['status']] += 1
+        if self.store is not None:
+            self.store.flush()
+        return counts
+
+    def run_forever(self, workers=8, poll_interval=60, stop=None):
+        """Executa ciclos de revisita até 'stop' (threading.Event) ser sinalizado."""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            counts = self.run_once(workers=workers)
+            if any(counts.values()):
+                print(f"Monitoramento: {counts}")
+            next_due = self.next_due()
+            wait = poll_interval if next_due is None else min(poll_interval, max(0, next_due - time.time()))
+            stop.wait(wait)
+
+    def stats(self):
+        """Retorna totais do monitoramento (páginas, vencidas, revisitas e mudanças)."""
+        with self._lock:
+            row = self._conn.execute(
+                """SELECT COUNT(*), SUM(next_check <= ?), SUM(checks), SUM(changes), AVG(interval)
+                   FROM pages""",
+                (time.time(),)
+            ).fetchone()
+        return {
+            'pages': row[0],
+            'due': row[1] or 0,
+            'checks': row[2] or 0,
+            'changes': row[3] or 0,
+            'mean_interval': row[4] or 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _scraper(self):
+        # Um AdScraper por thread, todos sobre a sessão compartilhada do transporte
+        if not hasattr(self._local, 'scraper'):
+            self._local.scraper = AdScraper(session=transport.shared_session())
+        return self._local.scraper
+
+    def _safe_check(self, page):
+        try:
+            return self.check(page)
+        except Exception as e:
+            metrics.record_error('monitor', type(e).__name__)
+            self._update(page, time.time(), page['interval'], error=str(e))
+            return {'url': page['url'], 'status': 'failed'}
+
+    def _reprocess(self, page, ad_data):
+        """
+        Analisa e exporta a nova versão da página. Falhas levantam exceção, então a
+        impressão digital nova não é gravada e a versão é reprocessada na próxima revisita.
+        """
+        analysis = self.analyzer.analyze_creative(ad_data)
+        if not analysis['success']:
+            raise RuntimeError(analysis.get('error', 'Falha na análise'))
+        if self.store is not None:
+            self.store.add(ad_data, analysis)
+        analysis = self.analyzer.generate_variations(analysis)
+        if self.output_dir:
+            exporter = ResultExporter(os.path.join(self.output_dir, f"{page['id']:08d}"), pdf_mode=self.pdf_mode)
+            export = exporter.export_all(ad_data, analysis)
+            if not export.get('success'):
+                errors = [r.get('error') for r in export.get('results', {}).values() if r.get('error')]
+                raise RuntimeError('; '.join(errors) or 'Falha na exportação')
+
+    def _next_interval(self, interval, changed):
+        factor = self.speedup if changed else self.backoff
+        return min(self.max_interval, max(self.min_interval, interval * factor))
+
+    def _update(self, page, now, interval, ad_data=None, fingerprint=None, changed=False, error=None):
+        assignments = ['interval = ?', 'next_check = ?', 'last_checked = ?', 'checks = checks + 1', 'error = ?']
+        params = [interval, now + interval, now, error]
+        if ad_data is not None:
+            assignments += ['etag = ?', 'last_modified = ?', 'fingerprint = ?']
+            params += [ad_data.get('etag'), ad_data.get('last_modified'), fingerprint]
+        if changed:
+            assignments += ['changes = changes + 1', 'last_changed = ?']
+            params.append(now)
+        params.append(page['id'])
+        with self._lock:
+            self._conn.execute(f"UPDATE pages SET {', '.join(assignments)} WHERE id = ?", params)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Monitoramento de mudanças em anúncios e landing pages')
+    parser.add_argument('db', help='arquivo SQLite com o estado do monitoramento')
+    parser.add_argument('--add', help='arquivo com URLs (uma por linha) a monitorar')
+    parser.add_argument('--output-dir', default='output')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--pdf-mode', choices=('full', 'draft'), default='full')
+    parser.add_argument('--forever', action='store_true', help='continua revisitando até ser interrompido')
+    args = parser.parse_args()
+
+    monitor = ChangeMonitor(args.db, output_dir=args.output_dir, pdf_mode=args.pdf_mode)
+    try:
+        if args.add:
+            with open(args.add, 'r', encoding='utf-8') as f:
+                print(f"{monitor.add(f)} URL(s) adicionada(s)")
+        if args.forever:
+            monitor.run_forever(workers=args.workers)
+        else:
+            print(monitor.run_once(workers=args.workers))
+        print(monitor.stats())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.close()
@@ -0,0 +1,214 @@
+"""
+Módulo de pipeline em streaming: scraping -> análise -> exportação.
+Cada etapa tem seu próprio grupo de workers e uma fila limitada; uma etapa lenta
+bloqueia a anterior (backpressure), mantendo a memória constante em listas grandes.
+"""
+
+import os
+import queue
+import threading
+
+import metrics
+import transport
+
+from scraper import AdScraper
+from analyzer import CreativeAnalyzer
+from exporter import ResultExporter
+
+# Marcador de fim de fila entre as etapas
+_DONE = object()
+
+
+class AdPipeline:
+    """Classe para processamento de listas de URLs em etapas conectadas por filas limitadas."""
+    
+    def __init__(self, scrape_workers=8, analyze_workers=2, export_workers=2, queue_size=64,
+                 output_dir=None, pdf_mode='full', export=True, store=None, crawler=None, crawl_workers=4,
+                 images=None, image_workers=4, limits=None):
+        """
+        Configura o pipeline.
+        
+        queue_size limita cada fila entre etapas. Com output_dir, cada anúncio é
+        exportado em um subdiretório próprio (ex.: output_dir/00000001); sem ele,
+        a exportação fica em memória. export=False interrompe o pipeline na análise.
+        store (um corpus.CorpusStore) recebe cada anúncio analisado. Com crawler
+        (um crawler.LandingPageCrawler), uma etapa extra entre scraping e análise
+        coleta a landing page de cada anúncio; com images (um images.ImageProcessor),
+        outra etapa gera hashes e miniaturas das imagens. limits (um
+        limits.ResourceLimits) ativa o modo de memória limitada no scraping e na exportação.
+        """
+        self.scrape_workers = scrape_workers
+        self.analyze_workers = analyze_workers
+        self.export_workers = export_workers
+        self.queue_size = queue_size
+        self.output_dir = output_dir
+        self.pdf_mode = pdf_mode
+        self.export = export
+        self.store = store
+        self.crawler = crawler
+        self.crawl_workers = crawl_workers
+        self.images = images
+        self.image_workers = image_workers
+        self.limits = limits
+    
+    def run(self, urls):
+        """
+        Processa as URLs e gera os resultados à medida que ficam prontos
+        (a ordem de saída não é garantida; use o campo 'index').
+        """
+        stop = threading.Event()
+        # Etapas ativas, em ordem; cada par de etapas vizinhas é ligado por uma fila limitada
+        steps = [('scrape', self._scrape_worker, self.scrape_workers)]
+        if self.crawler is not None:
+            steps.append(('crawl', self._crawl_worker, self.crawl_workers))
+        if self.images is not None:
+            steps.append(('images', self._images_worker, self.image_workers))
+        steps.append(('analyze', self._analyze_worker, self.analyze_workers))
+        if self.export:
+            steps.append(('export', self._export_worker, self.export_workers))
+        
+        queues = [queue.Queue(self.queue_size) for _ in range(len(steps) + 1)]
+        scrape_queue, output_queue = queues[0], queues[-1]
+        stages = [(name, worker, count, queues[i], queues[i + 1]) for i, (name, worker, count) in enumerate(steps)]
+        
+        threads = [threading.Thread(target=self._feed, args=(urls, scrape_queue, self.scrape_workers, stop), daemon=True)]
+        for position, (name, worker, count, inbox, outbox) in enumerate(stages):
+            # Quantos marcadores de fim a última thread da etapa deve repassar
+            next_count = stages[position + 1][2] if position + 1 < len(stages) else 1
+            remaining = [count]
+            lock = threading.Lock()
+            for _ in range(count):
+                threads.append(threading.Thread(
+                    target=self._stage_loop,
+                    args=(name, worker, inbox, outbox, stop, remaining, lock, next_count),
+                    daemon=True
+                ))
+        
+        for thread in threads:
+            thread.start()
+        
+        try:
+            while True:
+                item = output_queue.get()
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            # Consumidor encerrou (ou terminou): libera as threads bloqueadas
+            stop.set()
+            for thread in threads:
+                thread.join(timeout=1)
+            if self.store is not None:
+                self.store.flush()
+    
+    def _feed(self, urls, scrape_queue, workers, stop):
+        """Lê as URLs sob demanda e alimenta a fila de scraping."""
+        try:
+            for index, url in enumerate(urls):
+                url = url.strip()
+                if not url:
+                    continue
+                if not self._put(scrape_queue, {'index': index, 'url': url, 'success': True}, stop):
+                    return
+        finally:
+            for _ in range(workers):
+                self._put(scrape_queue, _DONE, stop)
+    
+    def _stage_loop(self, name, worker, inbox, outbox, stop, remaining, lock, next_count):
+        """Laço de um worker: consome a fila de entrada e repassa o resultado para a próxima etapa."""
+        state = {}
+        while not stop.is_set():
+            try:
+                item = inbox.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                break
+            metrics.registry.set_gauge('spy_queue_depth', inbox.qsize(), queue=f"pipeline_{name}")
+            
+            # Itens com falha seguem direto, sem processamento nas etapas seguintes
+            if item.get('success', True):
+                try:
+                    worker(item, state)
+                except Exception as e:
+                    item['success'] = False
+                    item['error'] = str(e)
+            
+            if not self._put(outbox, item, stop):
+                return
+        
+        # A última thread da etapa avisa a próxima etapa que não há mais itens
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            for _ in range(next_count):
+                self._put(outbox, _DONE, stop)
+    
+    def _scrape_worker(self, item, state):
+        """Etapa de scraping (um AdScraper por thread, todos sobre a sessão compartilhada do transporte)."""
+        if 'scraper' not in state:
+            state['scraper'] = AdScraper(session=transport.shared_session(), limits=self.limits)
+        item['stage'] = 'scrape'
+        item['ad_data'] = state['scraper'].scrape_ad(item['url'])
+        if not item['ad_data'].get('success'):
+            item['success'] = False
+            item['error'] = item['ad_data'].get('error', 'Falha no scraping')
+    
+    def _crawl_worker(self, item, state):
+        """Etapa de coleta da landing page (falhas na coleta não interrompem o anúncio)."""
+        item['stage'] = 'crawl'
+        self.crawler.enrich(item['ad_data'])
+    
+    def _images_worker(self, item, state):
+        """Etapa de processamento das imagens (hashes perceptuais e miniaturas)."""
+        item['stage'] = 'images'
+        self.images.process(item['ad_data'])
+    
+    def _analyze_worker(self, item, state):
+        """Etapa de análise e geração de variações."""
+        if 'analyzer' not in state:
+            state['analyzer'] = CreativeAnalyzer()
+        analyzer = state['analyzer']
+        item['stage'] = 'analyze'
+        analysis = analyzer.analyze_creative(item['ad_data'])
+        if analysis['success']:
+            if self.store is not None:
+                self.store.add(item['ad_data'], analysis)
+            analysis = analyzer.generate_variations(analysis)
+        item['analysis'] = analysis
+        if not analysis.get('success'):
+            item['success'] = False
+            item['error'] = analysis.get('error', 'Falha na análise')
+    
+    def _export_worker(self, item, state):
+        """Etapa de exportação (em disco, um subdiretório por anúncio, ou em memória)."""
+        item['stage'] = 'export'
+        if self.output_dir:
+            exporter = ResultExporter(os.path.join(self.output_dir, f"{item['index']:08d}"), pdf_mode=self.pdf_mode,
+                                      limits=self.limits)
+        else:
+            if 'exporter' not in state:
+                state['exporter'] = ResultExporter(output_dir=None, pdf_mode=self.pdf_mode, limits=self.limits)
+            exporter = state['exporter']
+        item['export'] = exporter.export_all(item['ad_data'], item['analysis'])
+        if not item['export'].get('success'):
+            item['success'] = False
+            item['error'] = 'Falha em um ou mais formatos de exportação'
+    
+    def _put(self, target_queue, item, stop):
+        """Coloca um item na fila, bloqueando enquanto ela estiver cheia (backpressure)."""
+        while not stop.is_set():
+            try:
+                target_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+
+# Função para uso direto
+def run_pipeline(urls, **options):
+    """Função auxiliar para processar um iterável de URLs; gera um resultado por URL."""
+    pipeline = AdPipeline(**options)
+    return pipeline.run(urls)
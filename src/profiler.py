@@ -0,0 +1,263 @@
+"""
+Módulo de profiling opcional das etapas de scraping, análise e exportação.
+Uma fração das chamadas é amostrada com cProfile, tracemalloc e um amostrador
+de pilhas; os resultados são agregados por etapa e plataforma e gravados como
+relatórios comparáveis entre versões (pstats, pilhas colapsadas para flamegraph
+e maiores alocadores).
+
+Ativação:
+    import profiler; profiler.enable(sample_rate=0.05)
+ou pela variável de ambiente SPY_PROFILE=0.05 (SPY_PROFILE_DIR define a pasta dos relatórios).
+"""
+
+import os
+import sys
+import json
+import atexit
+import random
+import cProfile
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# Alocações do próprio perfilador não entram nos relatórios
+_ALLOCATION_FILTERS = (
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+)
+
+
+class StageProfiler:
+    """Classe que amostra chamadas das etapas e agrega os perfis por (etapa, plataforma)."""
+    
+    def __init__(self, sample_rate=0.01, interval=0.005, output_dir='profiles', top=30):
+        """
+        sample_rate é a fração de chamadas perfiladas (0 a 1); interval é o período
+        (s) do amostrador de pilhas; top limita as linhas dos relatórios de texto.
+        """
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.output_dir = output_dir
+        self.top = top
+        self._lock = threading.Lock()
+        # Só um cProfile pode estar ativo por vez no processo (no Python 3.12+ um segundo levanta ValueError)
+        self._profiling = threading.Lock()
+        self._stats = {}
+        self._stacks = {}
+        self._allocations = {}
+        self._summary = {}
+        self._active = {}
+        self._tracing_users = 0
+        self._owns_tracing = False
+        self._sampler = None
+    
+    @contextmanager
+    def profile(self, stage, platform=''):
+        """Perfila o bloco se a chamada for sorteada; caso contrário não faz nada."""
+        key = (stage, platform or 'unknown')
+        with self._lock:
+            summary = self._summary.setdefault(
+                key, {'calls': 0, 'samples': 0, 'skipped': 0, 'seconds': 0.0, 'peak_bytes': 0})
+            summary['calls'] += 1
+        thread_id = threading.get_ident()
+        # Etapas aninhadas na mesma thread ficam dentro do perfil da etapa externa
+        if thread_id in self._active or random.random() >= self.sample_rate:
+            yield
+            return
+        
+        # Outra thread já está sendo perfilada: a amostra é descartada em vez de esperar
+        if not self._profiling.acquire(blocking=False):
+            self._skip(summary)
+            yield
+            return
+        
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Perfilador externo (ex.: python -m cProfile) já ativo no processo
+            self._profiling.release()
+            self._skip(summary)
+            yield
+            return
+        
+        try:
+            start_snapshot = self._start_tracing()
+            self._register_thread(thread_id, key)
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                profile.disable()
+                elapsed = time.perf_counter() - start
+                self._unregister_thread(thread_id)
+                peak, diff = self._stop_tracing(start_snapshot)
+                self._record(key, profile, elapsed, peak, diff)
+        finally:
+            profile.disable()
+            self._profiling.release()
+    
+    def _skip(self, summary):
+        with self._lock:
+            summary['skipped'] += 1
+    
+    def write_reports(self, output_dir=None):
+        """Grava os relatórios agregados e retorna o caminho da pasta gerada."""
+        output_dir = output_dir or os.path.join(self.output_dir, datetime.now().strftime('%Y%m%d-%H%M%S'))
+        os.makedirs(output_dir, exist_ok=True)
+        
+        with self._lock:
+            stats = dict(self._stats)
+            stacks = dict(self._stacks)
+            allocations = {k: dict(v) for k, v in self._allocations.items()}
+            summary = {f"{stage}/{platform}": dict(v) for (stage, platform), v in self._summary.items()}
+        
+        for (stage, platform), stat in stats.items():
+            name = f"{stage}_{platform}"
+            # Binário do pstats: pode ser combinado e comparado entre versões (pstats, snakeviz)
+            stats_path = os.path.join(output_dir, f"{name}.pstats")
+            stat.dump_stats(stats_path)
+            with open(os.path.join(output_dir, f"{name}.txt"), 'w', encoding='utf-8') as f:
+                report = pstats.Stats(stats_path, stream=f)
+                report.sort_stats('cumulative').print_stats(self.top)
+        
+        # Pilhas colapsadas: compatível com flamegraph.pl, speedscope e inferno
+        with open(os.path.join(output_dir, 'stacks.collapsed'), 'w', encoding='utf-8') as f:
+            for stack, count in sorted(stacks.items()):
+                f.write(f"{stack} {count}\n")
+        
+        with open(os.path.join(output_dir, 'allocations.txt'), 'w', encoding='utf-8') as f:
+            for (stage, platform), lines in sorted(allocations.items()):
+                f.write(f"# {stage}/{platform}: maiores alocadores (bytes retidos, soma das amostras)\n")
+                for location, size in sorted(lines.items(), key=lambda item: item[1], reverse=True)[:self.top]:
+                    f.write(f"{size:>12} {location}\n")
+                f.write('\n')
+        
+        with open(os.path.join(output_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        
+        return output_dir
+    
+    def reset(self):
+        """Descarta os perfis acumulados."""
+        with self._lock:
+            self._stats.clear()
+            self._stacks.clear()
+            self._allocations.clear()
+            self._summary.clear()
+    
+    def _record(self, key, profile, elapsed, peak, diff):
+        with self._lock:
+            if key in self._stats:
+                self._stats[key].add(profile)
+            else:
+                self._stats[key] = pstats.Stats(profile)
+            summary = self._summary[key]
+            summary['samples'] += 1
+            summary['seconds'] += elapsed
+            summary['peak_bytes'] = max(summary['peak_bytes'], peak)
+            allocations = self._allocations.setdefault(key, {})
+            for stat in diff:
+                if stat.size_diff > 0:
+                    frame = stat.traceback[0]
+                    location = f"{frame.filename}:{frame.lineno}"
+                    allocations[location] = allocations.get(location, 0) + stat.size_diff
+    
+    def _start_tracing(self):
+        """Liga o tracemalloc (compartilhado entre amostras simultâneas) e tira o snapshot inicial."""
+        with self._lock:
+            if self._tracing_users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(1)
+                self._owns_tracing = True
+            self._tracing_users += 1
+            tracemalloc.reset_peak()
+        return tracemalloc.take_snapshot().filter_traces(_ALLOCATION_FILTERS)
+    
+    def _stop_tracing(self, start_snapshot):
+        """Compara com o snapshot inicial; o tracemalloc é global, então amostras simultâneas se somam."""
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces(_ALLOCATION_FILTERS)
+        diff = snapshot.compare_to(start_snapshot, 'lineno')
+        with self._lock:
+            self._tracing_users -= 1
+            if self._tracing_users == 0 and self._owns_tracing:
+                tracemalloc.stop()
+                self._owns_tracing = False
+        return peak, diff
+    
+    def _register_thread(self, thread_id, key):
+        with self._lock:
+            self._active[thread_id] = key
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_stacks, daemon=True, name='stack-sampler')
+                self._sampler.start()
+    
+    def _unregister_thread(self, thread_id):
+        with self._lock:
+            self._active.pop(thread_id, None)
+    
+    def _sample_stacks(self):
+        """Amostra periodicamente as pilhas das threads em perfilamento."""
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = dict(self._active)
+                if not active:
+                    self._sampler = None
+                    return
+            frames = sys._current_frames()
+            for thread_id, (stage, platform) in active.items():
+                frame = frames.get(thread_id)
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack = ';'.join([stage, platform] + names[::-1])
+                with self._lock:
+                    self._stacks[stack] = self._stacks.get(stack, 0) + 1
+
+
+# Perfilador global (None = profiling desligado)
+_profiler = None
+
+
+def enable(sample_rate=0.01, output_dir='profiles', **options):
+    """Liga o profiling global e retorna o perfilador."""
+    global _profiler
+    _profiler = StageProfiler(sample_rate=sample_rate, output_dir=output_dir, **options)
+    return _profiler
+
+
+def disable():
+    """Desliga o profiling global e retorna o perfilador anterior (para gravar os relatórios)."""
+    global _profiler
+    previous, _profiler = _profiler, None
+    return previous
+
+
+def get_profiler():
+    return _profiler
+
+
+def profile(stage, platform=''):
+    """Gancho usado pelas etapas: perfila o bloco quando o profiling está ligado."""
+    if _profiler is None:
+        return nullcontext()
+    return _profiler.profile(stage, platform)
+
+
+def write_reports(output_dir=None):
+    """Grava os relatórios do perfilador global; retorna a pasta ou None se o profiling estiver desligado."""
+    if _profiler is None:
+        return None
+    return _profiler.write_reports(output_dir)
+
+
+# Ativação por variável de ambiente (os relatórios são gravados ao final do processo)
+if os.environ.get('SPY_PROFILE'):
+    enable(float(os.environ['SPY_PROFILE']), output_dir=os.environ.get('SPY_PROFILE_DIR', 'profiles'))
+    atexit.register(write_reports)
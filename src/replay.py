@@ -0,0 +1,318 @@
+"""
+Módulo de gravação e reprodução de respostas HTTP para benchmarks determinísticos.
+No modo de gravação, as respostas obtidas pelo AdScraper são salvas como fixtures
+comprimidas; no modo de reprodução, um servidor HTTP local as devolve com latência,
+banda e injeção de erros configuráveis, sem acesso à rede.
+
+Uso:
+    python src/replay.py record urls.txt --dir fixtures
+    python src/replay.py serve --dir fixtures --port 8900 --latency 0.05 --error-rate 0.01
+"""
+
+import os
+import gzip
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, urljoin
+
+# Arquivo de índice das fixtures (URL -> chave, status e tipo de conteúdo)
+INDEX_FILE = 'index.json'
+
+
+def fixture_key(url):
+    """Chave estável de uma URL (nome do arquivo da fixture e caminho no servidor)."""
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+
+class FixtureStore:
+    """Classe de acesso a um diretório de fixtures (corpos comprimidos com gzip + índice JSON)."""
+
+    def __init__(self, fixture_dir):
+        self.fixture_dir = fixture_dir
+        os.makedirs(fixture_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.index = {}
+        index_path = os.path.join(fixture_dir, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        self._by_key = {entry['key']: url for url, entry in self.index.items()}
+
+    def add(self, url, body, status=200, content_type='text/html; charset=utf-8', location=None):
+        """Grava (ou substitui) a fixture de uma URL; location é o destino (absoluto) de um redirecionamento."""
+        key = fixture_key(url)
+        with gzip.open(os.path.join(self.fixture_dir, f"{key}.gz"), 'wb', compresslevel=6) as f:
+            f.write(body)
+        entry = {'key': key, 'status': status, 'content_type': content_type, 'size': len(body)}
+        if location:
+            entry['location'] = location
+        with self._lock:
+            self.index[url] = entry
+            self._by_key[key] = url
+            self._save_index()
+        return key
+
+    def get(self, key):
+        """Retorna (entrada do índice, corpo) de uma chave, ou None se não houver fixture."""
+        url = self._by_key.get(key)
+        if url is None:
+            return None
+        with gzip.open(os.path.join(self.fixture_dir, f"{key}.gz"), 'rb') as f:
+            return self.index[url], f.read()
+
+    def urls(self):
+        return list(self.index)
+
+    def _save_index(self):
+        index_path = os.path.join(self.fixture_dir, INDEX_FILE)
+        with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        os.replace(index_path + '.tmp', index_path)
+
+
+class FixtureRecorder:
+    """Classe que grava as respostas de uma sessão requests (hook de resposta) em um FixtureStore."""
+
+    def __init__(self, fixture_dir):
+        self.store = FixtureStore(fixture_dir)
+
+    def install(self, scraper):
+        """Passa a gravar todas as respostas da sessão do scraper."""
+        scraper.session.hooks['response'].append(self._record)
+        return scraper
+
+    def _record(self, response, *args, **kwargs):
+        # O hook roda em cada salto de um redirecionamento (antes de response.history
+        # existir): cada resposta é gravada sob a própria URL e os redirecionamentos
+        # guardam o Location absoluto, para que a cadeia inteira seja reproduzida
+        location = response.headers.get('Location') if response.is_redirect else None
+        self.store.add(response.url, response.content, response.status_code,
+                       response.headers.get('Content-Type', 'application/octet-stream'),
+                       location=urljoin(response.url, location) if location else None)
+        return response
+
+
+class FixtureServer:
+    """Servidor HTTP local que reproduz as fixtures com latência, banda e erros configuráveis."""
+
+    def __init__(self, fixture_dir, host='127.0.0.1', port=0, latency=0.0, jitter=0.0,
+                 bandwidth=None, error_rate=0.0, error_status=503, reset_rate=0.0, seed=None, handshake=0.0):
+        """
+        latency/jitter em segundos por resposta; handshake em segundos por conexão nova
+        (simula o custo de DNS + TCP + TLS, evitado com keep-alive); bandwidth em bytes/s (None = sem limite);
+        error_rate é a fração de respostas com error_status; reset_rate é a fração de
+        conexões encerradas sem resposta. seed torna a injeção de erros reprodutível.
+        """
+        self.store = FixtureStore(fixture_dir)
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.reset_rate = reset_rate
+        self.handshake = handshake
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._cache = {}
+        self.stats = {'requests': 0, 'connections': 0, 'errors': 0, 'resets': 0, 'not_found': 0, 'bytes': 0}
+
+        self.httpd = ThreadingHTTPServer((host, port), _FixtureHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.fixtures = self
+        self.base_url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+    def start(self):
+        """Inicia o servidor em uma thread daemon."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True, name='fixture-server')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def install(self, scraper):
+        """Redireciona a sessão do scraper para este servidor (ver install_replay)."""
+        return install_replay(scraper, self.base_url)
+
+    def url_for(self, url):
+        """URL local que serve a fixture de uma URL original."""
+        return f"{self.base_url}/{fixture_key(url)}"
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def _draw(self):
+        with self._random_lock:
+            return self._random.random(), self._random.random(), self._random.uniform(-self.jitter, self.jitter)
+
+    def _load(self, key):
+        """Carrega a fixture (descomprimida) uma única vez e a mantém em memória."""
+        cached = self._cache.get(key)
+        if cached is None:
+            cached = self.store.get(key)
+            if cached is not None:
+                self._cache[key] = cached
+        return cached
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Cabeçalhos e corpo saem juntos (buffer + TCP_NODELAY): sem a espera de ~40 ms
+    # do Nagle com o ACK atrasado do cliente entre as duas escritas
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        fixtures = self.server.fixtures
+        fixtures._count('connections')
+        if fixtures.handshake:
+            time.sleep(fixtures.handshake)
+
+    def do_GET(self):
+        fixtures = self.server.fixtures
+        fixtures._count('requests')
+        reset_draw, error_draw, jitter = fixtures._draw()
+
+        delay = max(0.0, fixtures.latency + jitter)
+        if delay:
+            time.sleep(delay)
+
+        if reset_draw < fixtures.reset_rate:
+            fixtures._count('resets')
+            self.close_connection = True
+            return
+
+        if error_draw < fixtures.error_rate:
+            fixtures._count('errors')
+            return self._send_plain(fixtures.error_status, b'Erro injetado')
+
+        fixture = fixtures._load(urlparse(self.path).path.lstrip('/'))
+        if fixture is None:
+            fixtures._count('not_found')
+            return self._send_plain(404, b'Fixture inexistente')
+
+        entry, body = fixture
+        self.send_response(entry['status'])
+        self.send_header('Content-Type', entry['content_type'])
+        if entry.get('location'):
+            # URL original: o adaptador de install_replay a redireciona de volta para este servidor
+            self.send_header('Location', entry['location'])
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        if fixtures.bandwidth:
+            # Envia em blocos respeitando a banda configurada
+            chunk_size = max(1024, int(fixtures.bandwidth / 20))
+            for start in range(0, len(body), chunk_size):
+                chunk = body[start:start + chunk_size]
+                self.wfile.write(chunk)
+                self.wfile.flush()
+                time.sleep(len(chunk) / fixtures.bandwidth)
+        else:
+            self.wfile.write(body)
+        fixtures._count('bytes', len(body))
+
+    def _send_plain(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def install_replay(scraper, base_url):
+    """
+    Monta na sessão do scraper um adaptador que envia toda requisição ao servidor de
+    fixtures em base_url. A URL original continua sendo usada pelo scraper (detecção de
+    plataforma, URLs relativas), só o destino da conexão muda.
+    """
+    from requests.adapters import HTTPAdapter
+    import transport
+
+    class ReplayAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            request.url = f"{base_url}/{fixture_key(request.url)}"
+            return super().send(request, **kwargs)
+
+    config = transport.get_transport()
+    adapter = ReplayAdapter(pool_connections=config.pool_connections, pool_maxsize=config.pool_maxsize)
+    scraper.session.mount('http://', adapter)
+    scraper.session.mount('https://', adapter)
+    return scraper
+
+
+# Função para uso direto
+def record_urls(urls, fixture_dir):
+    """Função auxiliar para baixar e gravar as fixtures de uma lista de URLs."""
+    from scraper import AdScraper
+
+    recorder = FixtureRecorder(fixture_dir)
+    scraper = recorder.install(AdScraper())
+    recorded = 0
+    for url in urls:
+        url = url.strip()
+        if not url:
+            continue
+        try:
+            scraper.session.get(url, timeout=15)
+            recorded += 1
+        except Exception as e:
+            print(f"Erro ao gravar {url}: {str(e)}")
+    return recorded
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gravação e reprodução de fixtures HTTP')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help='grava as respostas de uma lista de URLs')
+    record_parser.add_argument('urls_file')
+    record_parser.add_argument('--dir', default='fixtures')
+
+    serve_parser = subparsers.add_parser('serve', help='serve as fixtures gravadas')
+    serve_parser.add_argument('--dir', default='fixtures')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8900)
+    serve_parser.add_argument('--latency', type=float, default=0.0)
+    serve_parser.add_argument('--jitter', type=float, default=0.0)
+    serve_parser.add_argument('--bandwidth', type=float, default=None)
+    serve_parser.add_argument('--error-rate', type=float, default=0.0)
+    serve_parser.add_argument('--reset-rate', type=float, default=0.0)
+    serve_parser.add_argument('--seed', type=int, default=None)
+    serve_parser.add_argument('--handshake', type=float, default=0.0)
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        with open(args.urls_file, 'r', encoding='utf-8') as f:
+            print(f"{record_urls(f, args.dir)} fixture(s) gravada(s) em {args.dir}")
+    else:
+        server = FixtureServer(args.dir, host=args.host, port=args.port, latency=args.latency,
+                               jitter=args.jitter, bandwidth=args.bandwidth, error_rate=args.error_rate,
+                               reset_rate=args.reset_rate, seed=args.seed, handshake=args.handshake)
+        print(f"Servindo {len(server.store.urls())} fixture(s) em {server.base_url}")
+        try:
+            server.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.httpd.server_close()
@@ -3,17 +3,49 @@ Módulo de scraping para extração de criativos de anúncios.
 Suporta Meta Ads Library, Taboola, Outbrain e páginas comuns de dropshipping.
 """
 
-import requests
-from bs4 import BeautifulSoup
 import re
 import json
 import os
-from urllib.parse import urlparse, urljoin
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlparse, urljoin, urlunparse, parse_qsl, urlencode
+
+import metrics
+import profiler
+import transport
+import limits
+
+# Contêineres de cada anúncio em páginas de resultados (modo de vários anúncios por página)
+CARD_SELECTORS = {
+    'meta': 'div[data-testid="ad-library-card"], div._7jvw, div.xh8yej3',
+    'taboola': 'div.videoCube, div.trc_spotlight_item',
+    'outbrain': 'div.ob-dynamic-rec-container, li.ob-dynamic-rec-container, div.ob-rec-container',
+}
+
+# Identificador do anúncio no texto do card do Meta Ads Library
+META_AD_ID_PATTERN = re.compile(r'(?:ID da biblioteca|Library ID)\s*:?\s*(\d+)', re.IGNORECASE)
+
+# Próxima página: link rel="next" ou cursor de paginação no JSON embutido na página
+NEXT_LINK_PATTERNS = (
+    re.compile(r'<(?:a|link)\b[^>]*\brel=["\']next["\'][^>]*\bhref=["\']([^"\']+)["\']', re.IGNORECASE),
+    re.compile(r'<(?:a|link)\b[^>]*\bhref=["\']([^"\']+)["\'][^>]*\brel=["\']next["\']', re.IGNORECASE),
+)
+CURSOR_PATTERN = re.compile(r'"(?:forward_cursor|end_cursor|next_cursor)"\s*:\s*"([^"]+)"')
 
 class AdScraper:
     """Classe para extração de criativos de anúncios de diferentes plataformas."""
     
-    def __init__(self):
+    def __init__(self, archive=None, session=None, limits=None):
+        """
+        archive (um snapshots.SnapshotArchive) recebe o HTML completo de cada página baixada.
+        session permite reaproveitar uma sessão existente (ex.: transport.shared_session(),
+        que mantém as conexões abertas entre scrapers e threads); sem ela, o scraper cria
+        a sua com o pool e o cache de DNS do transporte padrão.
+        limits (um limits.ResourceLimits) ativa o modo de memória limitada: bytes,
+        nós do DOM, imagens e tempo por anúncio ficam sob teto, e cada corte é
+        registrado no campo 'truncation' do resultado.
+        """
+        self.archive = archive
+        self.limits = limits
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
@@ -22,8 +54,24 @@ class AdScraper:
             'Upgrade-Insecure-Requests': '1',
             'Cache-Control': 'max-age=0'
         }
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        self._session = None
+        if session is not None:
+            self.session = session
+    
+    @property
+    def session(self):
+        """
+        Sessão HTTP do scraper, criada no primeiro uso (quem só extrai HTML já obtido,
+        como o modo assíncrono e a reextração de snapshots, não precisa de requests).
+        """
+        if self._session is None:
+            self.session = transport.get_transport().create_session()
+        return self._session
+    
+    @session.setter
+    def session(self, session):
+        session.headers.update(self.headers)
+        self._session = session
     
     def identify_platform(self, url):
         """Identifica a plataforma com base na URL."""
@@ -38,33 +86,212 @@ class AdScraper:
         else:
             return 'generic'
     
-    def scrape_ad(self, url):
-        """Extrai informações de um anúncio com base na URL fornecida."""
+    def scrape_ad(self, url, etag=None, last_modified=None):
+        """
+        Extrai informações de um anúncio com base na URL fornecida.
+        
+        etag e last_modified (de uma extração anterior) tornam a requisição
+        condicional: se a página não mudou, o servidor responde 304 e o resultado
+        traz 'not_modified': True, sem os campos extraídos.
+        """
+        import requests
         platform = self.identify_platform(url)
         
-        try:
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        
+        deadline = self.limits.deadline() if self.limits else None
+        with metrics.stage_timer('scrape', platform), profiler.profile('scrape', platform):
+            try:
+                if deadline is None:
+                    response = self.session.get(url, timeout=15, headers=headers or None)
+                else:
+                    timeout = min(15, deadline.remaining() or 15)
+                    response = self.session.get(url, timeout=timeout, headers=headers or None, stream=True)
+                if response.status_code == 304:
+                    return {
+                        'success': True,
+                        'not_modified': True,
+                        'platform': platform,
+                        'url': url,
+                        'etag': etag,
+                        'last_modified': last_modified
+                    }
+                response.raise_for_status()
+                truncation = {}
+                if deadline is None:
+                    content, text = response.content, response.text
+                else:
+                    # Corpo lido em streaming até o teto de bytes ou o fim do prazo
+                    content = self.limits.read_body(response, deadline, truncation)
+                    text = content.decode(response.encoding or 'utf-8', errors='replace')
+                metrics.registry.inc('spy_bytes_fetched_total', len(content), platform=platform)
+                if self.archive is not None:
+                    self.archive.put(url, content, platform=platform, encoding=response.encoding)
+                
+                with metrics.registry.timer('spy_parse_duration_seconds', platform=platform):
+                    result = self.parse_html(text, url, platform)
+                
+                if deadline is not None:
+                    truncation.update(result.get('truncation', {}))
+                    if deadline.expired() and 'time' not in truncation:
+                        limits.note(truncation, 'time', self.limits.max_seconds, round(deadline.elapsed(), 3))
+                    if truncation:
+                        result['truncation'] = truncation
+                        metrics.record_truncation('scrape', truncation)
+                
+                # Validadores HTTP para requisições condicionais futuras
+                result['etag'] = response.headers.get('ETag')
+                result['last_modified'] = response.headers.get('Last-Modified')
+                return result
+                    
+            except requests.RequestException as e:
+                metrics.record_error('scrape', type(e).__name__)
+                return {
+                    'success': False,
+                    'error': f"Erro ao acessar a URL: {str(e)}",
+                    'platform': platform
+                }
+    
+    def parse_html(self, html_content, url, platform=None):
+        """
+        Aplica o extrator da plataforma a um HTML já obtido (ex.: de um snapshot arquivado).
+        Com limits, o HTML é reduzido antes da análise e as imagens, depois.
+        """
+        platform = platform or self.identify_platform(url)
+        truncation = {}
+        if self.limits is not None:
+            html_content = self.limits.bound_html(html_content, truncation)
+        
+        if platform == 'meta':
+            result = self._scrape_meta_ad(html_content, url)
+        elif platform == 'taboola':
+            result = self._scrape_taboola_ad(html_content, url)
+        elif platform == 'outbrain':
+            result = self._scrape_outbrain_ad(html_content, url)
+        else:
+            result = self._scrape_generic_page(html_content, url)
+        
+        if self.limits is not None:
+            truncation.update(result.pop('truncation', {}))
+            self.limits.bound_images(result, truncation)
+            if truncation:
+                result['truncation'] = truncation
+        return result
+    
+    def scrape_cards(self, html_content, url, platform=None):
+        """
+        Extrai todos os anúncios de uma página de resultados em uma única análise do HTML.
+        Retorna uma lista com um resultado por card; páginas sem cards reconhecidos
+        são tratadas como um único anúncio.
+        """
+        from bs4 import BeautifulSoup
+        platform = platform or self.identify_platform(url)
+        extract = getattr(self, f"_extract_{platform}", None)
+        if extract is None:
+            return [self._scrape_generic_page(html_content, url)]
+        
+        soup = BeautifulSoup(html_content, 'html.parser')
+        cards = soup.select(CARD_SELECTORS[platform])
+        # Cards aninhados (ex.: seletores que casam com o contêiner e com um filho) contam uma vez só
+        card_ids = {id(card) for card in cards}
+        cards = [card for card in cards if not any(id(parent) in card_ids for parent in card.parents)]
+        if not cards:
+            return [extract(soup, url, html_content[:5000])]
+        
+        results = []
+        for position, card in enumerate(cards):
+            result = extract(card, url, str(card)[:5000])
+            result['source_url'] = url
+            result['card_index'] = position
+            if platform == 'meta':
+                match = META_AD_ID_PATTERN.search(card.get_text(' ', strip=True))
+                if match:
+                    result['ad_id'] = match.group(1)
+                    result['url'] = f"https://www.facebook.com/ads/library/?id={match.group(1)}"
+            if result['url'] == url:
+                result['url'] = f"{url}#card-{position}"
+            results.append(result)
+        return results
+    
+    def next_page_url(self, html_content, url):
+        """URL da próxima página de resultados (link rel="next" ou cursor de paginação), ou None."""
+        for pattern in NEXT_LINK_PATTERNS:
+            match = pattern.search(html_content)
+            if match:
+                return urljoin(url, match.group(1).replace('&amp;', '&'))
+        match = CURSOR_PATTERN.search(html_content)
+        if match:
+            parsed = urlparse(url)
+            query = [(k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True) if k != 'cursor']
+            query.append(('cursor', match.group(1)))
+            return urlunparse(parsed._replace(query=urlencode(query)))
+        return None
+    
+    def scrape_listing(self, urls, max_pages=5, workers=4):
+        """
+        Extrai os anúncios de páginas de resultados, seguindo a paginação de cada URL
+        até max_pages páginas. Até 'workers' páginas são baixadas ao mesmo tempo: o
+        cursor é lido do HTML bruto, então a próxima página é pedida antes de a atual
+        ser analisada. Gera um resultado por anúncio (anúncios repetidos são omitidos).
+        A sessão do scraper é compartilhada pelas threads (o pool do transporte
+        mantém até pool_maxsize conexões por host).
+        """
+        import requests
+        
+        def fetch(url):
             response = self.session.get(url, timeout=15)
             response.raise_for_status()
+            metrics.registry.inc('spy_bytes_fetched_total', len(response.content), platform=self.identify_platform(url))
+            return response.text
+        
+        seen = set()
+        visited = set()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='listing') as pool:
+            pending = {}
+            for url in urls:
+                if url not in visited:
+                    visited.add(url)
+                    pending[pool.submit(fetch, url)] = (url, 1)
             
-            if platform == 'meta':
-                return self._scrape_meta_ad(response.text, url)
-            elif platform == 'taboola':
-                return self._scrape_taboola_ad(response.text, url)
-            elif platform == 'outbrain':
-                return self._scrape_outbrain_ad(response.text, url)
-            else:
-                return self._scrape_generic_page(response.text, url)
-                
-        except requests.RequestException as e:
-            return {
-                'success': False,
-                'error': f"Erro ao acessar a URL: {str(e)}",
-                'platform': platform
-            }
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, page = pending.pop(future)
+                    platform = self.identify_platform(url)
+                    try:
+                        html_content = future.result()
+                    except requests.RequestException as e:
+                        metrics.record_error('scrape', type(e).__name__)
+                        yield {'success': False, 'error': f"Erro ao acessar a URL: {str(e)}", 'platform': platform, 'url': url}
+                        continue
+                    
+                    next_url = self.next_page_url(html_content, url) if page < max_pages else None
+                    if next_url and next_url not in visited:
+                        visited.add(next_url)
+                        pending[pool.submit(fetch, next_url)] = (next_url, page + 1)
+                    
+                    with metrics.stage_timer('scrape', platform), profiler.profile('scrape', platform):
+                        with metrics.registry.timer('spy_parse_duration_seconds', platform=platform):
+                            cards = self.scrape_cards(html_content, url, platform)
+                    for result in cards:
+                        key = result.get('ad_id') or (result['headline'], result['description'], result['landing_page'])
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        yield result
     
     def _scrape_meta_ad(self, html_content, url):
         """Extrai informações de anúncios do Meta Ads Library."""
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html_content, 'html.parser')
+        return self._extract_meta(soup, url, html_content[:5000])
+    
+    def _extract_meta(self, soup, url, raw_html):
+        """Campos de um anúncio do Meta a partir da página inteira ou de um card (scrape_cards)."""
         result = {
             'success': True,
             'platform': 'meta',
@@ -74,7 +301,7 @@ class AdScraper:
             'images': [],
             'cta': '',
             'landing_page': '',
-            'raw_html': html_content[:5000]  # Armazena parte do HTML para análise
+            'raw_html': raw_html  # Armazena parte do HTML para análise
         }
         
         # Tenta extrair o título/headline
@@ -107,7 +334,12 @@ class AdScraper:
     
     def _scrape_taboola_ad(self, html_content, url):
         """Extrai informações de anúncios do Taboola."""
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html_content, 'html.parser')
+        return self._extract_taboola(soup, url, html_content[:5000])
+    
+    def _extract_taboola(self, soup, url, raw_html):
+        """Campos de um anúncio Taboola a partir da página inteira ou de um card (scrape_cards)."""
         result = {
             'success': True,
             'platform': 'taboola',
@@ -117,7 +349,7 @@ class AdScraper:
             'images': [],
             'cta': 'Saiba mais',  # CTA padrão do Taboola
             'landing_page': '',
-            'raw_html': html_content[:5000]
+            'raw_html': raw_html
         }
         
         # Tenta extrair o título/headline
@@ -141,7 +373,12 @@ class AdScraper:
     
     def _scrape_outbrain_ad(self, html_content, url):
         """Extrai informações de anúncios do Outbrain."""
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html_content, 'html.parser')
+        return self._extract_outbrain(soup, url, html_content[:5000])
+    
+    def _extract_outbrain(self, soup, url, raw_html):
+        """Campos de um anúncio Outbrain a partir da página inteira ou de um card (scrape_cards)."""
         result = {
             'success': True,
             'platform': 'outbrain',
@@ -151,7 +388,7 @@ class AdScraper:
             'images': [],
             'cta': 'Leia mais',  # CTA padrão do Outbrain
             'landing_page': '',
-            'raw_html': html_content[:5000]
+            'raw_html': raw_html
         }
         
         # Tenta extrair o título/headline
@@ -175,6 +412,7 @@ class AdScraper:
     
     def _scrape_generic_page(self, html_content, url):
         """Extrai informações de páginas genéricas (dropshipping, landing pages)."""
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html_content, 'html.parser')
         result = {
             'success': True,
@@ -210,6 +448,7 @@ class AdScraper:
         images = soup.select('img.product-image, img.hero-image, img.banner, img[src*="product"], img[src*="hero"]')
         if not images:
             # Fallback para imagens maiores que 100x100 pixels
+            max_images = self.limits.max_images if self.limits is not None else None
             all_images = soup.find_all('img')
             for img in all_images:
                 width = img.get('width')
@@ -217,6 +456,10 @@ class AdScraper:
                 if width and height and int(width) > 100 and int(height) > 100:
                     src = img.get('src')
                     if src and 'data:image' not in src:
+                        if max_images is not None and len(result['images']) >= max_images:
+                            # Teto atingido: para sem percorrer o restante da página
+                            result['truncation'] = limits.note({}, 'images', max_images)
+                            break
                         # Converte URL relativa para absoluta
                         if not src.startswith(('http://', 'https://')):
                             src = urljoin(url, src)
@@ -243,12 +486,16 @@ class AdScraper:
             response = self.session.get(image_url, stream=True)
             response.raise_for_status()
             
+            size = 0
             with open(save_path, 'wb') as f:
                 for chunk in response.iter_content(chunk_size=8192):
                     f.write(chunk)
+                    size += len(chunk)
+            metrics.registry.inc('spy_bytes_fetched_total', size, platform='image')
             
             return True
         except Exception as e:
+            metrics.record_error('download_image', type(e).__name__)
             print(f"Erro ao baixar imagem: {str(e)}")
             return False
     
@@ -265,6 +512,9 @@ class AdScraper:
 
 # Função para uso direto
 def scrape_ad_from_url(url):
-    """Função auxiliar para extrair informações de um anúncio a partir de uma URL."""
-    scraper = AdScraper()
+    """
+    Função auxiliar para extrair informações de um anúncio a partir de uma URL
+    (usa a sessão compartilhada, reaproveitando as conexões entre chamadas).
+    """
+    scraper = AdScraper(session=transport.shared_session())
     return scraper.scrape_ad(url)
@@ -0,0 +1,345 @@
+"""
+Serviço HTTP local que expõe scraping, análise e exportação para o frontend.
+Os scrapers, o analisador e o exportador são reaproveitados entre requisições
+por meio de pools de workers; exportações em PDF viram jobs assíncronos.
+
+Uso:
+    python src/server.py [--host 127.0.0.1] [--port 8000]
+"""
+
+import os
+import json
+import time
+import uuid
+import argparse
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from scraper import AdScraper
+from analyzer import CreativeAnalyzer
+from exporter import ResultExporter, OUTPUT_FORMATS, PDF_MODES
+import metrics
+import transport
+
+# Arquivos estáticos do frontend servidos a partir da raiz do projeto
+STATIC_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+STATIC_FILES = {
+    '/': ('index.html', 'text/html; charset=utf-8'),
+    '/index.html': ('index.html', 'text/html; charset=utf-8'),
+    '/styles.css': ('styles.css', 'text/css; charset=utf-8'),
+    '/script.js': ('script.js', 'application/javascript; charset=utf-8'),
+}
+
+# Tamanho máximo aceito no corpo das requisições
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class AdService:
+    """Classe que concentra os workers compartilhados entre as requisições."""
+    
+    def __init__(self, scrape_workers=16, analyze_workers=4, pdf_workers=2, job_ttl=900):
+        """Cria os pools de workers; job_ttl é o tempo (s) que um job de PDF concluído fica disponível."""
+        self._scrape_pool = ThreadPoolExecutor(max_workers=scrape_workers, thread_name_prefix='scrape')
+        self._analyze_pool = ThreadPoolExecutor(max_workers=analyze_workers, thread_name_prefix='analyze')
+        self._pdf_pool = ThreadPoolExecutor(max_workers=pdf_workers, thread_name_prefix='pdf')
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Tarefas aguardando um worker livre em cada pool (contadas aqui, sem acessar a fila interna do executor)
+        self._pending = {'scrape': 0, 'analyze': 0, 'pdf': 0}
+        self._inflight = {}
+        self._jobs = {}
+        self.job_ttl = job_ttl
+        
+        # O analisador não guarda estado por chamada e o exportador em memória não grava em disco
+        self.analyzer = CreativeAnalyzer()
+        self.exporter = ResultExporter(output_dir=None)
+    
+    def scrape(self, url, timeout=60):
+        """Faz o scraping da URL; requisições simultâneas para a mesma URL compartilham um único scraping."""
+        with self._lock:
+            future = self._inflight.get(url)
+            metrics.record_cache('scrape_inflight', future is not None)
+            if future is None:
+                future = self._submit('scrape', self._scrape_pool, self._scrape, url)
+                self._inflight[url] = future
+                future.add_done_callback(lambda f, url=url: self._forget(url, f))
+        return future.result(timeout=timeout)
+    
+    def analyze(self, ad_data, timeout=60):
+        """Analisa o criativo e gera as variações."""
+        return self._submit('analyze', self._analyze_pool, self._analyze, ad_data).result(timeout=timeout)
+    
+    def process(self, url, timeout=120):
+        """Scraping seguido de análise, no formato esperado pelo frontend."""
+        ad_data = self.scrape(url, timeout=timeout)
+        if not ad_data.get('success'):
+            return {'success': False, 'error': ad_data.get('error', 'Falha no scraping'), 'ad_data': ad_data}
+        
+        analysis_result = self.analyze(ad_data, timeout=timeout)
+        ad_data = {k: v for k, v in ad_data.items() if k != 'raw_html'}
+        return {
+            'success': analysis_result.get('success', False),
+            'ad_data': ad_data,
+            'analysis_result': analysis_result
+        }
+    
+    def submit_pdf_job(self, ad_data, analysis_result, pdf_mode=None):
+        """Enfileira a renderização de um PDF e retorna o id do job."""
+        self._expire_jobs()
+        job_id = uuid.uuid4().hex
+        job = {'status': 'pending', 'created': time.time(), 'result': None, 'error': None}
+        with self._lock:
+            self._jobs[job_id] = job
+        self._submit('pdf', self._pdf_pool, self._run_pdf_job, job, ad_data, analysis_result, pdf_mode)
+        return job_id
+    
+    def get_job(self, job_id):
+        """Retorna o job (ou None se não existir ou já tiver expirado)."""
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def update_gauges(self):
+        """Atualiza os gauges de profundidade das filas dos pools e dos jobs de PDF."""
+        with self._lock:
+            queued = dict(self._pending)
+            pending = sum(1 for job in self._jobs.values() if job['status'] in ('pending', 'running'))
+        for name, count in queued.items():
+            metrics.registry.set_gauge('spy_queue_depth', count, queue=f"server_{name}")
+        metrics.registry.set_gauge('spy_queue_depth', pending, queue='server_pdf_jobs')
+    
+    def shutdown(self):
+        """Encerra os pools de workers."""
+        for pool in (self._scrape_pool, self._analyze_pool, self._pdf_pool):
+            pool.shutdown(wait=False)
+    
+    def _submit(self, name, pool, func, *args):
+        """Envia uma tarefa ao pool, contando-a como pendente até um worker começar a executá-la."""
+        with self._lock:
+            self._pending[name] += 1
+        return pool.submit(self._run_pending, name, func, *args)
+    
+    def _run_pending(self, name, func, *args):
+        with self._lock:
+            self._pending[name] -= 1
+        return func(*args)
+    
+    def _scrape(self, url):
+        """Executa o scraping com o AdScraper da thread (a sessão HTTP é reaproveitada)."""
+        scraper = getattr(self._local, 'scraper', None)
+        if scraper is None:
+            scraper = self._local.scraper = AdScraper(session=transport.shared_session())
+        return scraper.scrape_ad(url)
+    
+    def _analyze(self, ad_data):
+        analysis = self.analyzer.analyze_creative(ad_data)
+        if analysis['success']:
+            return self.analyzer.generate_variations(analysis)
+        return analysis
+    
+    def _forget(self, url, future):
+        with self._lock:
+            if self._inflight.get(url) is future:
+                del self._inflight[url]
+    
+    def _run_pdf_job(self, job, ad_data, analysis_result, pdf_mode):
+        job['status'] = 'running'
+        try:
+            job['result'] = self.exporter.render_pdf(ad_data, analysis_result, mode=pdf_mode)
+            job['status'] = 'done'
+        except Exception as e:
+            job['error'] = f"Erro ao exportar para PDF: {str(e)}"
+            job['status'] = 'error'
+        job['finished'] = time.time()
+    
+    def _expire_jobs(self):
+        """Remove jobs concluídos há mais de job_ttl segundos."""
+        limit = time.time() - self.job_ttl
+        with self._lock:
+            for job_id in [j for j, job in self._jobs.items() if job.get('finished', time.time()) < limit]:
+                del self._jobs[job_id]
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """Handler HTTP da API (/api/*) e dos arquivos estáticos do frontend."""
+    
+    protocol_version = 'HTTP/1.1'
+    
+    def do_GET(self):
+        path = urlparse(self.path).path
+        
+        if path.startswith('/api/jobs/'):
+            return self._handle_job(path[len('/api/jobs/'):])
+        
+        if path == '/metrics':
+            self.server.service.update_gauges()
+            return self._send(200, metrics.registry.render().encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8')
+        
+        if path in STATIC_FILES:
+            filename, content_type = STATIC_FILES[path]
+            try:
+                with open(os.path.join(STATIC_ROOT, filename), 'rb') as f:
+                    return self._send(200, f.read(), content_type)
+            except OSError:
+                pass
+        
+        self._send_json(404, {'success': False, 'error': 'Recurso não encontrado'})
+    
+    def do_POST(self):
+        path = urlparse(self.path).path
+        service = self.server.service
+        
+        try:
+            body = self._read_json()
+        except ValueError as e:
+            return self._send_json(400, {'success': False, 'error': str(e)})
+        
+        try:
+            if path == '/api/scrape':
+                return self._send_json(200, service.scrape(self._require(body, 'url')))
+            if path == '/api/analyze':
+                return self._send_json(200, service.analyze(self._require(body, 'ad_data')))
+            if path == '/api/process':
+                return self._send_json(200, service.process(self._require(body, 'url')))
+            if path == '/api/export':
+                return self._handle_export(body)
+        except ValueError as e:
+            return self._send_json(400, {'success': False, 'error': str(e)})
+        except Exception as e:
+            return self._send_json(500, {'success': False, 'error': str(e)})
+        
+        self._send_json(404, {'success': False, 'error': 'Recurso não encontrado'})
+    
+    def _handle_export(self, body):
+        """Formatos de texto saem em streaming; o PDF vira um job assíncrono."""
+        service = self.server.service
+        ad_data = self._require(body, 'ad_data')
+        analysis_result = self._require(body, 'analysis_result')
+        if not isinstance(ad_data, dict) or not isinstance(analysis_result, dict):
+            raise ValueError("'ad_data' e 'analysis_result' devem ser objetos JSON")
+        fmt = body.get('format', 'html')
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Formato de exportação desconhecido: {fmt}")
+        
+        if fmt == 'pdf':
+            pdf_mode = body.get('pdf_mode')
+            if pdf_mode and pdf_mode not in PDF_MODES:
+                raise ValueError(f"Modo de PDF desconhecido: {pdf_mode}")
+            job_id = service.submit_pdf_job(ad_data, analysis_result, pdf_mode)
+            return self._send_json(202, {
+                'success': True,
+                'job_id': job_id,
+                'status_url': f"/api/jobs/{job_id}",
+                'result_url': f"/api/jobs/{job_id}/result"
+            })
+        
+        # O primeiro bloco é gerado antes do status: erros de renderização ainda viram um 500 em JSON
+        chunks = service.exporter.stream(fmt, ad_data, analysis_result)
+        first = next(chunks, b'')
+        
+        filename, content_type = OUTPUT_FORMATS[fmt]
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Disposition', f'attachment; filename="{filename}"')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for chunk in itertools.chain([first], chunks):
+                if chunk:
+                    self.wfile.write(f"{len(chunk):X}\r\n".encode('ascii') + chunk + b"\r\n")
+        except Exception as e:
+            # Resposta já iniciada: encerra a conexão sem o bloco final, para o cliente ver o corpo incompleto
+            metrics.record_error('export', type(e).__name__)
+            self.close_connection = True
+            return
+        self.wfile.write(b"0\r\n\r\n")
+    
+    def _handle_job(self, rest):
+        job_id, _, suffix = rest.partition('/')
+        job = self.server.service.get_job(job_id)
+        if job is None:
+            return self._send_json(404, {'success': False, 'error': 'Job não encontrado'})
+        
+        if suffix == 'result':
+            if job['status'] != 'done':
+                return self._send_json(409, {'success': False, 'status': job['status'], 'error': job['error']})
+            filename, content_type = OUTPUT_FORMATS['pdf']
+            return self._send(200, job['result'], content_type,
+                              {'Content-Disposition': f'attachment; filename="{filename}"'})
+        
+        self._send_json(200, {
+            'success': job['status'] != 'error',
+            'status': job['status'],
+            'error': job['error'],
+            'result_url': f"/api/jobs/{job_id}/result" if job['status'] == 'done' else None
+        })
+    
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError('Corpo da requisição muito grande')
+        raw = self.rfile.read(length) if length else b'{}'
+        try:
+            body = json.loads(raw.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise ValueError('JSON inválido')
+        if not isinstance(body, dict):
+            raise ValueError('O corpo deve ser um objeto JSON')
+        return body
+    
+    def _require(self, body, key):
+        if not body.get(key):
+            raise ValueError(f"Campo obrigatório ausente: {key}")
+        return body[key]
+    
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json; charset=utf-8')
+    
+    def _send(self, status, data, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, format, *args):
+        # Silencia o log padrão por requisição
+        pass
+
+
+def create_server(host='127.0.0.1', port=8000, **service_options):
+    """Cria o servidor HTTP com um AdService compartilhado."""
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    server.service = AdService(**service_options)
+    return server
+
+
+# Função para uso direto
+def serve(host='127.0.0.1', port=8000, **service_options):
+    """Inicia o serviço HTTP local e atende até ser interrompido (Ctrl+C)."""
+    server = create_server(host, port, **service_options)
+    print(f"Spy Criativos disponível em http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serviço HTTP local do Spy Criativos')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--scrape-workers', type=int, default=16)
+    parser.add_argument('--analyze-workers', type=int, default=4)
+    parser.add_argument('--pdf-workers', type=int, default=2)
+    args = parser.parse_args()
+    serve(args.host, args.port, scrape_workers=args.scrape_workers,
+          analyze_workers=args.analyze_workers, pdf_workers=args.pdf_workers)
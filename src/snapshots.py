@@ -0,0 +1,339 @@
+"""
+Módulo de arquivo de snapshots do HTML bruto das páginas raspadas.
+Cada corpo de resposta é comprimido com zstd (com um dicionário treinado sobre as
+próprias páginas) e endereçado pelo seu SHA-256: páginas idênticas são gravadas
+uma única vez. Os blocos são anexados a arquivos de segmento (append-only) e um
+índice SQLite guarda segmento, offset e tamanho de cada bloco; as leituras usam
+mmap. Assim uma nova versão dos extratores _scrape_* pode ser reaplicada a
+todas as páginas arquivadas sem acessar a rede.
+
+Requer o pacote 'zstandard'.
+"""
+
+import os
+import mmap
+import time
+import struct
+import sqlite3
+import hashlib
+import threading
+
+import metrics
+
+# Cabeçalho de cada bloco no segmento: marca, SHA-256 do corpo, id do dicionário e tamanho comprimido.
+# Torna os segmentos autodescritivos (o índice pode ser reconstruído a partir deles).
+RECORD_MAGIC = b'SNP1'
+RECORD_HEADER = struct.Struct('>4s32sII')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    raw_size INTEGER NOT NULL,
+    dict_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    platform TEXT,
+    encoding TEXT,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_url ON snapshots (url, fetched_at);
+CREATE INDEX IF NOT EXISTS idx_snapshots_platform ON snapshots (platform);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class SnapshotArchive:
+    """Classe de acesso ao arquivo de snapshots (segura para uso por várias threads)."""
+
+    def __init__(self, path, segment_size=256 * 1024 * 1024, level=9, train_after=1000, dict_size=112640,
+                 train_backoff=60):
+        """
+        Abre (ou cria) o arquivo no diretório indicado.
+
+        Um novo segmento é iniciado quando o atual passa de segment_size bytes.
+        Ao atingir train_after páginas sem dicionário, um dicionário de dict_size
+        bytes é treinado em segundo plano com as páginas já arquivadas (as
+        gravações não esperam pelo treino). Se o treino falha, o erro fica em
+        stats()['train_error'] e a próxima tentativa espera train_backoff
+        segundos, dobrando a cada nova falha.
+        """
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("O arquivo de snapshots requer o pacote 'zstandard'")
+        self._zstd = zstandard
+        self.path = path
+        self.segment_size = segment_size
+        self.level = level
+        self.train_after = train_after
+        self.dict_size = dict_size
+        self.train_backoff = train_backoff
+        os.makedirs(os.path.join(path, 'segments'), exist_ok=True)
+        os.makedirs(os.path.join(path, 'dictionaries'), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._map_lock = threading.Lock()
+        self._local = threading.local()
+        self._maps = {}
+        self._dictionaries = {}
+        self._trainer = None
+        self._train_failures = 0
+        self._train_retry_at = 0.0
+        self.train_error = None
+        self._conn = sqlite3.connect(os.path.join(path, 'index.db'), timeout=30,
+                                     check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'active_dictionary'").fetchone()
+        self._dict_id = int(row[0]) if row else 0
+        self._compressor = self._make_compressor()
+
+        row = self._conn.execute('SELECT MAX(segment) FROM blobs').fetchone()
+        self._segment = row[0] or 1
+        self._writer = open(self._segment_path(self._segment), 'ab')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def put(self, url, body, platform=None, encoding=None, fetched_at=None):
+        """Arquiva o corpo de uma resposta; corpos já presentes só ganham um novo registro de snapshot. Retorna o hash."""
+        if isinstance(body, str):
+            body = body.encode(encoding or 'utf-8')
+        digest = hashlib.sha256(body).digest()
+        key = digest.hex()
+
+        with self._lock:
+            exists = self._conn.execute('SELECT 1 FROM blobs WHERE hash = ?', (key,)).fetchone()
+            if not exists:
+                self._append(key, digest, body)
+            self._conn.execute(
+                'INSERT INTO snapshots (url, hash, platform, encoding, fetched_at) VALUES (?, ?, ?, ?, ?)',
+                (url, key, platform, encoding, fetched_at or time.time())
+            )
+            if not exists and not self._dict_id and self.train_after:
+                self._schedule_training_locked()
+        return key
+
+    def get(self, key):
+        """Retorna o corpo arquivado com o hash indicado, ou None."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT segment, offset, length, dict_id FROM blobs WHERE hash = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return self._read(*row)
+
+    def latest(self, url):
+        """Retorna o corpo do snapshot mais recente da URL, ou None."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT hash FROM snapshots WHERE url = ? ORDER BY fetched_at DESC LIMIT 1', (url,)
+            ).fetchone()
+        return self.get(row[0]) if row else None
+
+    def iter_snapshots(self, platform=None, latest_only=True):
+        """
+        Gera dicts com url, platform, encoding, fetched_at, hash e body. Com
+        latest_only, apenas o snapshot mais recente de cada URL. A ordem segue a
+        posição nos segmentos, para leitura sequencial do disco.
+        """
+        where = []
+        params = []
+        if latest_only:
+            where.append('s.id IN (SELECT MAX(id) FROM snapshots GROUP BY url)')
+        if platform:
+            where.append('s.platform = ?')
+            params.append(platform)
+        sql = f"""SELECT s.url, s.platform, s.encoding, s.fetched_at, s.hash, b.segment, b.offset, b.length, b.dict_id
+                  FROM snapshots s JOIN blobs b ON b.hash = s.hash
+                  {'WHERE ' + ' AND '.join(where) if where else ''}
+                  ORDER BY b.segment, b.offset"""
+        # Cursor próprio: a iteração pode ser longa e não deve segurar o lock
+        conn = sqlite3.connect(os.path.join(self.path, 'index.db'), timeout=30)
+        try:
+            for url, platform, encoding, fetched_at, key, segment, offset, length, dict_id in conn.execute(sql, params):
+                yield {
+                    'url': url,
+                    'platform': platform,
+                    'encoding': encoding,
+                    'fetched_at': fetched_at,
+                    'hash': key,
+                    'body': self._read(segment, offset, length, dict_id)
+                }
+        finally:
+            conn.close()
+
+    def reextract(self, scraper=None, platform=None):
+        """Reaplica os extratores atuais aos snapshots mais recentes; gera um resultado por URL."""
+        if scraper is None:
+            from scraper import AdScraper
+            scraper = AdScraper()
+        for snapshot in self.iter_snapshots(platform=platform):
+            html = snapshot['body'].decode(snapshot['encoding'] or 'utf-8', errors='replace')
+            result = scraper.parse_html(html, snapshot['url'], snapshot['platform'])
+            result['snapshot_hash'] = snapshot['hash']
+            result['fetched_at'] = snapshot['fetched_at']
+            yield result
+
+    def train_dictionary(self, sample_limit=1000):
+        """Treina um novo dicionário com as páginas mais recentes; as gravações seguintes passam a usá-lo."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT segment, offset, length, dict_id FROM blobs ORDER BY rowid DESC LIMIT ?', (sample_limit,)
+            ).fetchall()
+        # Leitura das amostras e treino fora do lock: as gravações continuam enquanto isso
+        samples = [self._read(*row) for row in rows]
+        dictionary = self._zstd.train_dictionary(self.dict_size, samples)
+        with self._lock:
+            return self._install_dictionary_locked(dictionary)
+
+    def stats(self):
+        """Retorna totais do arquivo (snapshots, blocos únicos, bytes originais e gravados)."""
+        with self._lock:
+            blobs, raw, stored = self._conn.execute(
+                'SELECT COUNT(*), SUM(raw_size), SUM(length + ?) FROM blobs', (RECORD_HEADER.size,)
+            ).fetchone()
+            snapshots = self._conn.execute('SELECT COUNT(*) FROM snapshots').fetchone()[0]
+        return {
+            'snapshots': snapshots,
+            'blobs': blobs,
+            'raw_bytes': raw or 0,
+            'stored_bytes': stored or 0,
+            'ratio': (raw / stored) if stored else 0.0,
+            'dictionary': self._dict_id,
+            'train_error': self.train_error
+        }
+
+    def close(self):
+        trainer = self._trainer
+        if trainer is not None:
+            trainer.join()
+        with self._lock, self._map_lock:
+            self._writer.close()
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+            self._conn.close()
+
+    def _append(self, key, digest, body):
+        """Anexa um bloco comprimido ao segmento atual e o registra no índice (chamado com o lock)."""
+        if self._writer.tell() >= self.segment_size:
+            self._writer.close()
+            self._segment += 1
+            self._writer = open(self._segment_path(self._segment), 'ab')
+        compressed = self._compressor.compress(body)
+        header = RECORD_HEADER.pack(RECORD_MAGIC, digest, self._dict_id, len(compressed))
+        offset = self._writer.tell() + RECORD_HEADER.size
+        self._writer.write(header)
+        self._writer.write(compressed)
+        # Leitores mapeiam o arquivo: o bloco precisa estar no disco antes de entrar no índice
+        self._writer.flush()
+        self._conn.execute(
+            'INSERT INTO blobs (hash, segment, offset, length, raw_size, dict_id) VALUES (?, ?, ?, ?, ?, ?)',
+            (key, self._segment, offset, len(compressed), len(body), self._dict_id)
+        )
+
+    def _read(self, segment, offset, length, dict_id):
+        mapped = self._map(segment, offset + length)
+        return self._decompressor(dict_id).decompress(mapped[offset:offset + length])
+
+    def _map(self, segment, needed):
+        """mmap do segmento; o segmento ativo é remapeado quando cresce além do trecho mapeado."""
+        mapped = self._maps.get(segment)
+        if mapped is None or len(mapped) < needed:
+            with self._map_lock:
+                mapped = self._maps.get(segment)
+                if mapped is None or len(mapped) < needed:
+                    with open(self._segment_path(segment), 'rb') as f:
+                        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    # O mapeamento anterior pode estar em uso por outra thread; é liberado pelo GC
+                    self._maps[segment] = mapped
+        return mapped
+
+    def _decompressor(self, dict_id):
+        # Descompressores zstd não são seguros entre threads: um por thread e dicionário
+        if not hasattr(self._local, 'decompressors'):
+            self._local.decompressors = {}
+        decompressors = self._local.decompressors
+        decompressor = decompressors.get(dict_id)
+        if decompressor is None:
+            if dict_id:
+                decompressor = self._zstd.ZstdDecompressor(dict_data=self._dictionary(dict_id))
+            else:
+                decompressor = self._zstd.ZstdDecompressor()
+            decompressors[dict_id] = decompressor
+        return decompressor
+
+    def _dictionary(self, dict_id):
+        dictionary = self._dictionaries.get(dict_id)
+        if dictionary is None:
+            with open(os.path.join(self.path, 'dictionaries', f"{dict_id}.zdict"), 'rb') as f:
+                dictionary = self._zstd.ZstdCompressionDict(f.read())
+            self._dictionaries[dict_id] = dictionary
+        return dictionary
+
+    def _make_compressor(self):
+        if self._dict_id:
+            return self._zstd.ZstdCompressor(level=self.level, dict_data=self._dictionary(self._dict_id))
+        return self._zstd.ZstdCompressor(level=self.level)
+
+    def _schedule_training_locked(self):
+        """Inicia o treino automático em segundo plano se o limite foi atingido (chamado com o lock)."""
+        if self._trainer is not None or time.monotonic() < self._train_retry_at:
+            return
+        if self._conn.execute('SELECT COUNT(*) FROM blobs').fetchone()[0] < self.train_after:
+            return
+        self._trainer = threading.Thread(target=self._train_background, daemon=True, name='snapshot-dictionary')
+        self._trainer.start()
+
+    def _train_background(self):
+        try:
+            self.train_dictionary(self.train_after)
+            self._train_failures = 0
+            self.train_error = None
+        except Exception as e:
+            # Sem dicionário as páginas continuam sendo gravadas (só comprimem menos)
+            metrics.record_error('snapshots', type(e).__name__)
+            self._train_failures += 1
+            self.train_error = f"{type(e).__name__}: {e}"
+            self._train_retry_at = time.monotonic() + self.train_backoff * 2 ** (self._train_failures - 1)
+        finally:
+            self._trainer = None
+
+    def _install_dictionary_locked(self, dictionary):
+        dict_id = dictionary.dict_id()
+        with open(os.path.join(self.path, 'dictionaries', f"{dict_id}.zdict"), 'wb') as f:
+            f.write(dictionary.as_bytes())
+        self._dictionaries[dict_id] = dictionary
+        self._dict_id = dict_id
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('active_dictionary', ?)", (str(dict_id),)
+        )
+        self._compressor = self._make_compressor()
+        return dict_id
+
+    def _segment_path(self, segment):
+        return os.path.join(self.path, 'segments', f"{segment:08d}.seg")
+
+
+# Função para uso direto
+def reextract_archive(path, platform=None):
+    """Função auxiliar para reaplicar os extratores a todas as páginas de um arquivo de snapshots."""
+    with SnapshotArchive(path) as archive:
+        yield from archive.reextract(platform=platform)
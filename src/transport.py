@@ -0,0 +1,243 @@
+"""
+Módulo de transporte HTTP compartilhado pelo scraper e pelos demais coletores.
+Configura o pool de conexões por host, reaproveita conexões keep-alive entre
+chamadas, permite HTTP/2 opcional (via httpx) e, opcionalmente, um cache de DNS
+em processo com TTL.
+"""
+
+import io
+import time
+import socket
+import threading
+
+# Parâmetros padrão do transporte
+DEFAULT_POOL_CONNECTIONS = 32   # hosts distintos mantidos no pool
+DEFAULT_POOL_MAXSIZE = 16       # conexões mantidas por host
+DEFAULT_DNS_TTL = 300           # segundos, quando o cache de DNS é ativado
+
+
+class DNSCache:
+    """Cache de resolução de nomes (socket.getaddrinfo) com TTL, instalado para todo o processo."""
+
+    def __init__(self, ttl=DEFAULT_DNS_TTL, max_entries=4096):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._original = None
+        self.hits = 0
+        self.misses = 0
+
+    def install(self):
+        """Substitui socket.getaddrinfo pela versão com cache (idempotente)."""
+        with self._lock:
+            if self._original is None:
+                self._original = socket.getaddrinfo
+                socket.getaddrinfo = self.getaddrinfo
+        return self
+
+    def uninstall(self):
+        with self._lock:
+            if self._original is not None:
+                socket.getaddrinfo = self._original
+                self._original = None
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        key = (host, port, family, type, proto, flags)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            original = self._original or socket.getaddrinfo
+            self.misses += 1
+        # Falhas de resolução não entram no cache
+        result = original(host, port, family, type, proto, flags)
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+            self._entries[key] = (now + self.ttl, result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class Transport:
+    """Classe que cria sessões requests com o pool, o HTTP/2 e o cache de DNS configurados."""
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 http2=False, dns_ttl=None):
+        """
+        pool_connections é o número de hosts mantidos no pool e pool_maxsize o de
+        conexões keep-alive por host (use ao menos o número de threads que
+        compartilham a sessão). http2=True envia as requisições HTTPS por um
+        cliente httpx com HTTP/2 (requer 'httpx[http2]'). dns_ttl (segundos, ex.:
+        DEFAULT_DNS_TTL) ativa o cache de DNS; como ele substitui
+        socket.getaddrinfo para todo o processo, fica desativado por padrão.
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.http2 = http2
+        self.dns_ttl = dns_ttl
+        self._lock = threading.Lock()
+        self._shared = None
+
+    def create_session(self, headers=None):
+        """Cria uma sessão nova com os adaptadores configurados."""
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        if self.dns_ttl:
+            dns_cache(self.dns_ttl).install()
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session.mount('http://', adapter)
+        session.mount('https://', Http2Adapter(self.pool_maxsize) if self.http2 else adapter)
+        if headers:
+            session.headers.update(headers)
+        return session
+
+    def shared_session(self):
+        """Sessão única do transporte, reaproveitada entre chamadas (e threads) para manter as conexões abertas."""
+        with self._lock:
+            if self._shared is None:
+                self._shared = self.create_session()
+            return self._shared
+
+    def close(self):
+        with self._lock:
+            if self._shared is not None:
+                self._shared.close()
+                self._shared = None
+
+
+class Http2Adapter:
+    """Adaptador requests que envia as requisições por um cliente httpx com HTTP/2 (multiplexadas por host)."""
+
+    def __init__(self, max_connections=DEFAULT_POOL_MAXSIZE):
+        try:
+            import httpx
+            import h2  # noqa: F401
+        except ImportError:
+            raise RuntimeError("HTTP/2 requer o pacote 'httpx[http2]'")
+        self._httpx = httpx
+        self.max_connections = max_connections
+        self._lock = threading.Lock()
+        self._clients = {}
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        from requests.models import Response
+        from requests.structures import CaseInsensitiveDict
+        from requests.utils import get_encoding_from_headers, select_proxy
+        from requests.exceptions import ConnectionError, Timeout
+
+        # verify, cert e o proxy são fixos em um cliente httpx: um cliente por combinação
+        client = self._client_for(verify, cert, select_proxy(request.url, proxies or {}))
+        if isinstance(timeout, tuple):
+            # requests aceita (conexão, leitura)
+            timeout = self._httpx.Timeout(timeout[1], connect=timeout[0])
+        try:
+            reply = client.send(client.build_request(request.method, request.url, headers=dict(request.headers),
+                                                     content=request.body, timeout=timeout), stream=stream)
+        except self._httpx.TimeoutException as e:
+            raise Timeout(e, request=request)
+        except self._httpx.HTTPError as e:
+            raise ConnectionError(e, request=request)
+
+        # Converte a resposta httpx em requests.Response (com stream=True o corpo é lido sob demanda)
+        response = Response()
+        response.status_code = reply.status_code
+        response.headers = CaseInsensitiveDict(reply.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = _StreamReader(reply) if stream else io.BytesIO(reply.content)
+        response.reason = reply.reason_phrase
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for client in clients.values():
+            client.close()
+
+    def _client_for(self, verify, cert, proxy):
+        key = (verify, cert if not isinstance(cert, list) else tuple(cert), proxy)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = self._httpx.Client(
+                    http2=True, follow_redirects=False, verify=verify, cert=cert, proxy=proxy,
+                    trust_env=False, limits=self._httpx.Limits(max_connections=self.max_connections))
+            return client
+
+
+class _StreamReader:
+    """Corpo de uma resposta httpx em streaming com a interface de arquivo esperada por requests (raw)."""
+
+    def __init__(self, reply):
+        self._reply = reply
+        self._chunks = reply.iter_bytes()
+        self._buffer = b''
+
+    def read(self, amt=None, **kwargs):
+        while amt is None or len(self._buffer) < amt:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if amt is None:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return data
+
+    def close(self):
+        self._reply.close()
+
+
+# Cache de DNS e transporte padrão do processo
+_dns_cache = None
+_default_transport = None
+_globals_lock = threading.Lock()
+
+
+# Funções para uso direto
+def dns_cache(ttl=DEFAULT_DNS_TTL):
+    """Cache de DNS do processo (criado na primeira chamada; chamadas seguintes atualizam o TTL)."""
+    global _dns_cache
+    with _globals_lock:
+        if _dns_cache is None:
+            _dns_cache = DNSCache(ttl)
+        else:
+            _dns_cache.ttl = ttl
+        return _dns_cache
+
+
+def get_transport():
+    """Transporte padrão do processo."""
+    global _default_transport
+    with _globals_lock:
+        if _default_transport is None:
+            _default_transport = Transport()
+        return _default_transport
+
+
+def configure(**options):
+    """Substitui o transporte padrão (ex.: configure(pool_maxsize=64, http2=True))."""
+    global _default_transport
+    with _globals_lock:
+        previous, _default_transport = _default_transport, Transport(**options)
+    if previous is not None:
+        previous.close()
+    return _default_transport
+
+
+def shared_session():
+    """Sessão compartilhada do transporte padrão."""
+    return get_transport().shared_session()
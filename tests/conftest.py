@@ -0,0 +1,30 @@
+"""Configuração comum dos testes: módulos de src/ importáveis e um anúncio de exemplo."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+@pytest.fixture
+def ad_data():
+    return {
+        'success': True,
+        'platform': 'generic',
+        'url': 'https://exemplo.com/produto',
+        'headline': 'Oferta incrível por tempo limitado',
+        'description': 'Resolva seu problema hoje. Comprovado por especialistas.',
+        'images': ['https://exemplo.com/produto.jpg'],
+        'cta': 'Comprar agora',
+        'landing_page': 'https://exemplo.com/produto',
+    }
+
+
+@pytest.fixture
+def analysis(ad_data):
+    from analyzer import CreativeAnalyzer
+
+    analyzer = CreativeAnalyzer(seed=1)
+    return analyzer.generate_variations(analyzer.analyze_creative(ad_data))
@@ -0,0 +1,67 @@
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip('httpx')
+
+from aio import AsyncAdScraper, process_ad_async
+from replay import FixtureServer, FixtureStore
+
+
+def _page(i):
+    return (f"<html><head><title>Loja</title></head><body><h1>Produto {i}</h1>"
+            f"<p class='description'>Oferta do produto {i}.</p></body></html>").encode('utf-8')
+
+
+@pytest.fixture
+def fixtures(tmp_path):
+    store = FixtureStore(str(tmp_path / 'fixtures'))
+    urls = [f"https://loja.com/produto/{i}" for i in range(12)]
+    for i, url in enumerate(urls):
+        store.add(url, _page(i))
+    return str(tmp_path / 'fixtures'), urls
+
+
+def test_scrape_many_yields_every_url_by_index(fixtures):
+    fixture_dir, urls = fixtures
+
+    async def scrape(server):
+        local = [server.url_for(url) for url in urls] + ['', f"{server.base_url}/inexistente"]
+        async with AsyncAdScraper() as scraper:
+            return {index: result async for index, result in scraper.scrape_many(local, concurrency=4)}
+
+    with FixtureServer(fixture_dir) as server:
+        results = asyncio.run(scrape(server))
+
+    assert len(results) == 13 and 12 not in results
+    assert all(results[i]['success'] and results[i]['headline'] == f"Produto {i}" for i in range(12))
+    assert not results[13]['success'] and '404' in results[13]['error']
+
+
+def test_slow_page_returns_timeout(fixtures):
+    fixture_dir, urls = fixtures
+
+    async def scrape(server):
+        async with AsyncAdScraper() as scraper:
+            return await scraper.scrape_ad(server.url_for(urls[0]), timeout=0.1)
+
+    with FixtureServer(fixture_dir, latency=1.0) as server:
+        result = asyncio.run(scrape(server))
+
+    assert not result['success'] and result['timeout'] and '0.1s' in result['error']
+
+
+def test_process_ad_async_exports_draft_pdf(fixtures, tmp_path):
+    pytest.importorskip('fpdf')
+    fixture_dir, urls = fixtures
+    output_dir = str(tmp_path / 'out')
+
+    with FixtureServer(fixture_dir) as server:
+        result = asyncio.run(process_ad_async(server.url_for(urls[3]), output_dir=output_dir, pdf_mode='draft'))
+
+    assert result['success'] and result['ad_data']['headline'] == 'Produto 3'
+    pdf = result['export']['results']['pdf']
+    assert pdf['success'] and os.path.getsize(pdf['file_path']) > 0
+    with open(pdf['file_path'], 'rb') as f:
+        assert f.read(5) == b'%PDF-'
@@ -0,0 +1,54 @@
+import io
+import json
+import os
+
+import batch
+import scraper
+
+
+class FakeScraper:
+    def __init__(self, **kwargs):
+        pass
+
+    def scrape_ad(self, url):
+        if 'derruba' in url:
+            # Simula a morte do processo worker (ex.: OOM killer)
+            os._exit(1)
+        return {
+            'success': True, 'platform': 'generic', 'url': url, 'headline': 'Oferta incrível hoje',
+            'description': 'Resolva seu problema agora.', 'images': [], 'cta': 'Comprar', 'landing_page': url,
+        }
+
+
+def _run(monkeypatch, tmp_path, urls):
+    monkeypatch.setattr(scraper, 'AdScraper', FakeScraper)
+    source = tmp_path / 'urls.txt'
+    source.write_text('\n'.join(urls) + '\n', encoding='utf-8')
+    output = tmp_path / 'resultados.jsonl'
+    code = batch.main([str(source), '-o', str(output), '-w', '1', '--no-export', '--progress-interval', '60'])
+    items = [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()]
+    return code, {item['url']: item for item in items}, len(items)
+
+
+def test_rerun_rewrites_output_instead_of_appending(monkeypatch, tmp_path):
+    urls = ['https://exemplo.com/1', 'https://exemplo.com/2']
+    _run(monkeypatch, tmp_path, urls)
+    code, items, lines = _run(monkeypatch, tmp_path, urls)
+
+    assert code == 0 and lines == 2
+    assert all(item['success'] and item['stage'] == 'analyze' for item in items.values())
+
+
+def test_worker_crash_is_recorded_and_the_batch_continues(monkeypatch):
+    monkeypatch.setattr(scraper, 'AdScraper', FakeScraper)
+    urls = ['https://exemplo.com/1', 'https://exemplo.com/derruba', 'https://exemplo.com/3']
+    output = io.StringIO()
+
+    # Uma URL em andamento por vez: só a URL que derrubou o worker é afetada
+    summary = batch.run_batch_cli(urls, output, workers=1, export=False, max_pending=1,
+                                  progress=batch.BatchProgress(stream=io.StringIO()))
+
+    items = {item['url']: item for item in map(json.loads, output.getvalue().splitlines())}
+    assert summary['failed'] == 1 and summary['failed_by_stage'] == {'worker': 1}
+    assert not items['https://exemplo.com/derruba']['success']
+    assert items['https://exemplo.com/1']['success'] and items['https://exemplo.com/3']['success']
@@ -0,0 +1,22 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+import bench_suite
+
+
+def test_only_missing_optional_packages_are_skipped():
+    assert bench_suite._missing_dependency(ModuleNotFoundError("No module named 'weasyprint'", name='weasyprint'))
+    assert bench_suite._missing_dependency(RuntimeError("O arquivo de snapshots requer o pacote 'zstandard'"))
+    # Módulo do próprio projeto ausente ou erro qualquer: falha do caso
+    assert bench_suite._missing_dependency(ModuleNotFoundError("No module named 'scraper'", name='scraper')) is None
+    assert bench_suite._missing_dependency(RuntimeError('Falha inesperada')) is None
+
+
+def test_crashing_case_is_reported_as_failure(tmp_path):
+    result = bench_suite.run_isolated('inexistente', 1, str(tmp_path))
+    assert 'failed' in result and 'KeyError' in result['failed']
+
+    baseline = {'inexistente': {'ops_per_s': 10.0, 'p95_ms': 1.0, 'maxrss_kib': 1}}
+    assert bench_suite.compare({'inexistente': result}, baseline, 0.2) == []
@@ -0,0 +1,31 @@
+import json
+import zipfile
+
+from bundler import BundleExporter, export_bundle
+
+
+def test_zip_bundle_contains_formats_and_manifest(tmp_path, ad_data, analysis):
+    target = tmp_path / 'lote.zip'
+    result = export_bundle([(ad_data, analysis)], str(target), formats=['html', 'markdown'])
+
+    assert result['success']
+    with zipfile.ZipFile(target) as archive:
+        names = set(archive.namelist())
+        assert {'anuncio_00001/variacoes.html', 'anuncio_00001/variacoes.md', 'manifest.json'} <= names
+        manifest = json.loads(archive.read('manifest.json'))
+        entry = manifest['entries'][0]
+        assert entry['files']['html']['size'] == len(archive.read('anuncio_00001/variacoes.html'))
+
+
+def test_failed_format_leaves_no_member(tmp_path, ad_data, analysis, monkeypatch):
+    target = tmp_path / 'lote.zip'
+    with BundleExporter(str(target), formats=['html', 'pdf']) as bundle:
+        def broken_pdf(*args, **kwargs):
+            raise RuntimeError("A exportação em PDF requer o pacote 'weasyprint'")
+        monkeypatch.setattr(bundle.exporter, 'render_pdf', broken_pdf)
+        entry = bundle.add(ad_data, analysis)
+
+    assert 'pdf' in entry['errors'] and 'pdf' not in entry['files']
+    with zipfile.ZipFile(target) as archive:
+        assert 'anuncio_00001/variacoes.pdf' not in archive.namelist()
+        assert 'anuncio_00001/variacoes.html' in archive.namelist()
@@ -0,0 +1,26 @@
+import pytest
+
+from corpus import CorpusStore
+
+
+def test_store_query_and_accent_insensitive_search(tmp_path, ad_data, analysis):
+    with CorpusStore(str(tmp_path / 'corpus.db'), batch_size=2) as store:
+        assert store.add(ad_data, analysis['original'], scraped_at=100)
+        # Mesmo conteúdo da mesma URL não é duplicado
+        assert store.add(ad_data, analysis['original'], scraped_at=200)
+        store.add(dict(ad_data, url='https://outro.com/a', platform='facebook', headline='Últimas unidades'),
+                  scraped_at=300)
+
+        assert store.count() == 2
+        assert store.counts_by('platform') == {'generic': 1, 'facebook': 1}
+        assert [ad['url'] for ad in store.query(domain='EXEMPLO.com')] == [ad_data['url']]
+        assert [ad['platform'] for ad in store.query(since=250)] == ['facebook']
+        assert [ad['headline'] for ad in store.search('ultimas')] == ['Últimas unidades']
+
+
+def test_failed_scrapes_and_unknown_fields_are_rejected(tmp_path, ad_data):
+    with CorpusStore(str(tmp_path / 'corpus.db')) as store:
+        assert not store.add({'success': False, 'error': 'Erro ao acessar a URL: 500'})
+        assert store.count() == 0
+        with pytest.raises(ValueError):
+            store.counts_by('headline')
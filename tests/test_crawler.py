@@ -0,0 +1,80 @@
+import pytest
+import requests
+
+import crawler
+from replay import FixtureServer, FixtureStore, install_replay
+from scraper import AdScraper
+
+PAGE = b"<html><head><title>Loja</title></head><body><h1>Produto da loja</h1></body></html>"
+WRAPPED = 'https://l.facebook.com/l.php?u=https%3A%2F%2Floja.com%2Fproduto&h=abc'
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    store = FixtureStore(str(tmp_path))
+    store.add('https://loja.com/produto', PAGE)
+    store.add('https://outro.com/', PAGE)
+    store.add('https://grande.com/', b'<html><h1>Grande</h1>' + b'x' * 100000 + b'</html>')
+    store.add('https://quebrado.com/', b'Erro interno', status=500)
+    store.add('https://r.com/a', b'', status=302, location='https://r.com/b')
+    store.add('https://r.com/b', b'', status=302, location='https://loja.com/produto')
+
+    with FixtureServer(str(tmp_path)) as fixtures:
+        # O crawler usa a sessão compartilhada do transporte: aponta-a para o servidor local
+        session = install_replay(AdScraper(session=requests.Session()), fixtures.base_url).session
+        monkeypatch.setattr(crawler.transport, 'shared_session', lambda: session)
+        yield fixtures
+
+
+def test_wrapped_and_direct_links_share_one_fetch_and_get_own_copies(server):
+    ads = [{'platform': 'meta', 'landing_page': WRAPPED}, {'platform': 'meta', 'landing_page': 'https://LOJA.com/produto'}]
+    with crawler.LandingPageCrawler() as pages:
+        pages.enrich_many(ads)
+        stats = dict(pages.stats)
+
+    first, second = ads[0]['landing_page_data'], ads[1]['landing_page_data']
+    assert first['success'] and first['headline'] == 'Produto da loja'
+    assert first['final_url'] == 'https://loja.com/produto' and first['redirects'] == [WRAPPED]
+    assert stats['deduplicated'] == 1 and stats['fetched'] == 1 and server.stats['requests'] == 1
+    assert first == second and first is not second
+
+
+def test_http_redirects_are_followed_up_to_the_limit(server):
+    with crawler.LandingPageCrawler(max_redirects=2) as pages:
+        result = pages.fetch('https://r.com/a')
+    assert result['success'] and result['redirects'] == ['https://r.com/a', 'https://r.com/b']
+
+    with crawler.LandingPageCrawler(max_redirects=1) as pages:
+        result = pages.fetch('https://r.com/a')
+    assert not result['success'] and 'redirecionamentos' in result['error']
+
+
+def test_body_and_host_caps(server):
+    with crawler.LandingPageCrawler(max_bytes=1000) as pages:
+        result = pages.fetch('https://grande.com/')
+    assert result['success'] and result['truncated'] and result['bytes'] == 1000
+
+    with crawler.LandingPageCrawler(allowed_hosts=['loja.com']) as pages:
+        assert not pages.fetch('https://outro.com/')['success']
+
+    with crawler.LandingPageCrawler(max_hosts=1) as pages:
+        assert pages.fetch('https://loja.com/produto')['success']
+        result = pages.fetch('https://outro.com/')
+    assert not result['success'] and 'Limite de 1 hosts' in result['error']
+
+
+def test_failed_destination_is_reported_and_retried(server):
+    with crawler.LandingPageCrawler() as pages:
+        results = [pages.fetch('https://quebrado.com/') for _ in range(2)]
+        stats = dict(pages.stats)
+
+    assert all(not r['success'] and '500' in r['error'] for r in results)
+    # A falha não fica no cache: a segunda chamada baixa de novo
+    assert stats['deduplicated'] == 0 and stats['failed'] == 2
+
+
+def test_dedup_cache_is_bounded(server):
+    with crawler.LandingPageCrawler(cache_size=1) as pages:
+        for url in ('https://loja.com/produto', 'https://outro.com/', 'https://loja.com/produto'):
+            assert pages.fetch(url)['success']
+        assert len(pages._results) == 1 and pages.stats['deduplicated'] == 0
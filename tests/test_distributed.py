@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+import distributed
+import exporter
+import scraper
+
+
+class FakeScraper:
+    def __init__(self, **kwargs):
+        pass
+
+    def scrape_ad(self, url):
+        if 'falha' in url:
+            return {'success': False, 'error': 'Erro ao acessar a URL: 500', 'platform': 'generic'}
+        return {
+            'success': True, 'platform': 'generic', 'url': url, 'headline': 'Oferta incrível hoje',
+            'description': 'Resolva seu problema agora.', 'images': [], 'cta': 'Comprar', 'landing_page': url,
+        }
+
+
+class FakeExporter:
+    def __init__(self, output_dir, pdf_mode='full'):
+        self.output_dir = output_dir
+
+    def export_all(self, ad_data, analysis_result):
+        return {'success': True, 'output_dir': self.output_dir, 'results': {}}
+
+
+def test_remote_workers_process_urls_and_report_failures(monkeypatch, tmp_path):
+    monkeypatch.setattr(scraper, 'AdScraper', FakeScraper)
+    monkeypatch.setattr(exporter, 'ResultExporter', FakeExporter)
+    urls = ['https://exemplo.com/1', 'https://exemplo.com/falha']
+
+    with distributed.BrokerServer(distributed.SQLiteBroker(str(tmp_path / 'tarefas.db'))) as server:
+        broker = distributed.RemoteBroker(server.address)
+        assert distributed.submit_urls(broker, urls) == 2
+        # Reenvio da mesma lista: chaves idempotentes, nada novo
+        assert distributed.submit_urls(broker, urls) == 0
+
+        worker = distributed.DistributedWorker(broker, str(tmp_path / 'out'))
+        worker.run(idle_timeout=0.2, poll_interval=0.05)
+        results = {result['url']: result for result in distributed.collect_results(broker)}
+        broker.close()
+
+    done = results['https://exemplo.com/1']
+    assert done['status'] == 'done' and done['stage'] == 'export' and done['analysis']['success']
+    failed = results['https://exemplo.com/falha']
+    assert failed['status'] == 'failed' and failed['stage'] == 'scrape' and '500' in failed['error']
+
+
+def test_expired_leases_are_redelivered_until_attempts_run_out(tmp_path):
+    broker = distributed.SQLiteBroker(str(tmp_path / 'tarefas.db'), max_attempts=2)
+    distributed.submit_urls(broker, ['https://exemplo.com/trava'])
+
+    # O worker some sem ack/nack: a tarefa volta quando o lease expira
+    for attempt in (1, 2):
+        tasks = broker.claim('worker', lease_seconds=0)
+        assert [task['attempts'] for task in tasks] == [attempt]
+        time.sleep(0.01)
+
+    assert broker.claim('worker') == []
+    assert broker.stats()['scrape']['failed'] == 1
+    broker.close()
+
+
+def test_remote_broker_reports_server_errors(tmp_path):
+    with distributed.BrokerServer(distributed.SQLiteBroker(str(tmp_path / 'tarefas.db'))) as server:
+        broker = distributed.RemoteBroker(server.address)
+        with pytest.raises(RuntimeError, match='Método desconhecido'):
+            broker._call('close')
+        assert broker.stats()['scrape'] == {'pending': 0, 'done': 0, 'failed': 0}
+        broker.close()
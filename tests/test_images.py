@@ -0,0 +1,89 @@
+import io
+
+import pytest
+import requests
+
+PIL = pytest.importorskip('PIL')
+from PIL import Image, ImageDraw, ImageEnhance
+
+import images
+from replay import FixtureServer, FixtureStore, install_replay
+from scraper import AdScraper
+
+
+def _creative():
+    image = Image.new('RGB', (400, 300), 'white')
+    draw = ImageDraw.Draw(image)
+    for x in range(0, 400, 4):
+        draw.line([(x, 0), (x, 300)], fill=(x * 255 // 400, 80, 160))
+    draw.ellipse((60, 50, 220, 210), fill=(250, 200, 0))
+    draw.rectangle((250, 120, 370, 280), fill=(20, 20, 20))
+    return image
+
+
+def _unrelated():
+    image = Image.new('RGB', (400, 300), 'black')
+    draw = ImageDraw.Draw(image)
+    for y in range(0, 300, 30):
+        draw.rectangle((0, y, 400, y + 15), fill=(255, 255, 255))
+    draw.polygon([(200, 20), (380, 280), (20, 280)], fill=(0, 120, 255))
+    return image
+
+
+def _encode(image, fmt='PNG', **options):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+ORIGINAL = 'https://cdn.exemplo.com/original.png'
+# Mesmo criativo reduzido, mais claro e recomprimido em JPEG
+NEAR_COPY = 'https://cdn.exemplo.com/copia.jpg'
+UNRELATED = 'https://cdn.exemplo.com/outro.png'
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    store = FixtureStore(str(tmp_path / 'fixtures'))
+    store.add(ORIGINAL, _encode(_creative()), content_type='image/png')
+    near = ImageEnhance.Brightness(_creative().resize((360, 270))).enhance(1.08)
+    store.add(NEAR_COPY, _encode(near, 'JPEG', quality=70), content_type='image/jpeg')
+    store.add(UNRELATED, _encode(_unrelated()), content_type='image/png')
+
+    with FixtureServer(str(tmp_path / 'fixtures')) as fixtures:
+        session = install_replay(AdScraper(session=requests.Session()), fixtures.base_url).session
+        monkeypatch.setattr(images.transport, 'shared_session', lambda: session)
+        yield fixtures
+
+
+def test_near_duplicates_are_indexed_together_and_cached(server, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    ads = [
+        {'url': 'https://exemplo.com/anuncio-1', 'images': [ORIGINAL, UNRELATED]},
+        {'url': 'https://exemplo.com/anuncio-2', 'images': [NEAR_COPY, ORIGINAL]},
+    ]
+    with images.ImageProcessor(cache_dir, workers=2) as processor:
+        processor.process_many(ads)
+        original = ads[0]['image_data'][0]
+        assert original['width'] == 400 and original['height'] == 300
+
+        matches = {match['url']: match['distance'] for match in processor.index.similar(original['phash'], 7)}
+        assert matches[ORIGINAL] == 0 and 0 < matches[NEAR_COPY] < 8
+        assert UNRELATED not in matches
+        assert images.hamming(original['phash'], ads[0]['image_data'][1]['phash']) >= 8
+        assert processor.index.groups(max_distance=7) == [['https://exemplo.com/anuncio-1', 'https://exemplo.com/anuncio-2']]
+    # Cada imagem baixada uma vez, mesmo repetida entre anúncios
+    assert server.stats['requests'] == 3
+
+    # Segunda passada: índice e miniaturas em cache, sem novos downloads
+    again = [{'url': 'https://exemplo.com/anuncio-3', 'images': [NEAR_COPY, UNRELATED]}]
+    with images.ImageProcessor(cache_dir, workers=1) as processor:
+        processor.process_many(again)
+    assert server.stats['requests'] == 3
+    assert again[0]['image_data'][0]['phash'] == ads[1]['image_data'][0]['phash']
+
+
+def test_broken_image_is_recorded_as_error(server, tmp_path):
+    with images.ImageProcessor(str(tmp_path / 'cache'), workers=1) as processor:
+        processor.process({'url': 'https://exemplo.com/anuncio', 'images': ['https://cdn.exemplo.com/sumiu.png']})
+        assert processor.index.get('https://cdn.exemplo.com/sumiu.png')['error']
@@ -0,0 +1,93 @@
+import time
+
+import jobqueue
+
+
+class FakeScraper:
+    hooks = {}
+
+    def __init__(self, **kwargs):
+        pass
+
+    def scrape_ad(self, url):
+        if url in self.hooks:
+            self.hooks[url]()
+        if 'falha' in url:
+            return {'success': False, 'error': 'Erro ao acessar a URL: 500', 'platform': 'generic'}
+        return {
+            'success': True, 'platform': 'generic', 'url': url, 'headline': 'Oferta incrível hoje',
+            'description': 'Resolva seu problema agora.', 'images': [], 'cta': 'Comprar', 'landing_page': url,
+        }
+
+
+class FakeExporter:
+    exported = []
+
+    def __init__(self, output_dir, pdf_mode='full'):
+        self.output_dir = output_dir
+
+    def export_all(self, ad_data, analysis_result):
+        self.exported.append(ad_data['url'])
+        return {'success': True, 'results': {}}
+
+
+def _runner(monkeypatch, tmp_path, urls, hooks=None, lease_seconds=300, claim_size=20):
+    monkeypatch.setattr(jobqueue, 'AdScraper', FakeScraper)
+    monkeypatch.setattr(jobqueue, 'ResultExporter', FakeExporter)
+    monkeypatch.setattr(FakeScraper, 'hooks', hooks or {})
+    monkeypatch.setattr(FakeExporter, 'exported', [])
+    queue = jobqueue.JobQueue(str(tmp_path / 'jobs.db'), lease_seconds=lease_seconds)
+    queue.enqueue(urls)
+    return queue, jobqueue.BatchRunner(queue, str(tmp_path / 'out'), workers=1, claim_size=claim_size)
+
+
+def test_batch_runs_to_done_and_fails_after_max_attempts(monkeypatch, tmp_path):
+    queue, runner = _runner(monkeypatch, tmp_path, ['https://exemplo.com/1', 'https://exemplo.com/falha'])
+
+    stats = runner.run()
+
+    assert stats['done'] == 1 and stats['failed'] == 1
+    attempts = queue._conn.execute("SELECT attempts FROM jobs WHERE url LIKE '%falha'").fetchone()[0]
+    assert attempts == queue.max_attempts
+
+
+def test_attempts_are_counted_at_claim(tmp_path):
+    queue = jobqueue.JobQueue(str(tmp_path / 'jobs.db'), max_attempts=2)
+    queue.enqueue(['https://exemplo.com/derruba-o-worker'])
+
+    # O worker morre sem chamar fail(); a execução seguinte libera os leases e tenta de novo
+    for _ in range(2):
+        assert queue.claim('worker')
+        queue.release()
+
+    assert queue.claim('worker') == []
+    assert queue.stats()['failed'] == 1
+
+
+def test_waiting_jobs_of_the_batch_keep_their_lease(monkeypatch, tmp_path):
+    stolen = []
+    urls = ['https://exemplo.com/lento', 'https://exemplo.com/2']
+    hooks = {
+        urls[0]: lambda: time.sleep(0.5),
+        urls[1]: lambda: stolen.extend(queue.claim('intruso')),
+    }
+    queue, runner = _runner(monkeypatch, tmp_path, urls, hooks, lease_seconds=0.3, claim_size=2)
+
+    stats = runner.run()
+
+    assert stolen == [] and stats['done'] == 2
+
+
+def test_lost_lease_stops_processing(monkeypatch, tmp_path):
+    def steal():
+        queue.release()
+        queue.claim('intruso')
+
+    url = 'https://exemplo.com/1'
+    queue, runner = _runner(monkeypatch, tmp_path, [url], {url: steal})
+
+    runner.run()
+
+    assert FakeExporter.exported == []
+    row = queue._conn.execute('SELECT stage, lease_owner FROM jobs').fetchone()
+    assert row == ('scrape', 'intruso')
@@ -0,0 +1,54 @@
+import requests
+
+from exporter import ResultExporter
+from limits import ResourceLimits
+from replay import FixtureServer, FixtureStore
+from scraper import AdScraper
+
+
+def _page(images, filler):
+    imgs = ''.join(f"<img class='product-image' src='/produto/{i}.jpg'>" for i in range(images))
+    return (f"<html><head><title>Oferta</title><script>var dados = '{'x' * 5000}';</script></head>"
+            f"<body><h1>Produto em promoção</h1>{imgs}{'<p>texto</p>' * filler}</body></html>").encode('utf-8')
+
+
+def _scrape(tmp_path, url, body, limits):
+    FixtureStore(str(tmp_path)).add(url, body)
+    with FixtureServer(str(tmp_path)) as server:
+        scraper = server.install(AdScraper(session=requests.Session(), limits=limits))
+        return scraper.scrape_ad(url)
+
+
+def test_bounded_scrape_records_each_cut(tmp_path):
+    url = 'https://loja.com/produto'
+    limits = ResourceLimits(max_bytes=60000, max_nodes=500, max_images=3)
+
+    result = _scrape(tmp_path, url, _page(images=10, filler=20000), limits)
+
+    assert result['success'] and result['headline'] == 'Produto em promoção'
+    assert len(result['images']) == 3
+    truncation = result['truncation']
+    assert truncation['bytes']['limit'] == 60000 and truncation['bytes']['observed'] > 60000
+    assert truncation['nodes'] == {'limit': 500}
+    assert truncation['images'] == {'limit': 3, 'observed': 10}
+    assert truncation['scripts']['removed_chars'] >= 5000
+
+
+def test_small_page_is_not_truncated(tmp_path):
+    result = _scrape(tmp_path, 'https://loja.com/pequena', _page(images=2, filler=5),
+                     ResourceLimits(strip_scripts=False))
+    assert result['success'] and len(result['images']) == 2 and 'truncation' not in result
+
+
+def test_export_bounds_texts_and_stops_at_the_deadline(tmp_path, ad_data, analysis):
+    ad_data = dict(ad_data, description='d' * 50)
+
+    bounded = ResultExporter(str(tmp_path / 'ok'), limits=ResourceLimits(max_text=20)).export_all(ad_data, analysis)
+    assert bounded['results']['html']['success']
+    # observed é o maior texto cortado (anúncio ou variações)
+    assert bounded['truncation']['text']['limit'] == 20 and bounded['truncation']['text']['observed'] >= 50
+
+    expired = ResultExporter(str(tmp_path / 'prazo'), limits=ResourceLimits(max_seconds=1e-9)).export_all(
+        ad_data, analysis)
+    assert not expired['success'] and 'time' in expired['truncation']
+    assert all(r.get('truncated') and 'Tempo limite' in r['error'] for r in expired['results'].values())
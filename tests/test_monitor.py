@@ -0,0 +1,43 @@
+import monitor
+
+
+class FakeScraper:
+    def __init__(self, **kwargs):
+        pass
+
+    def scrape_ad(self, url, etag=None, last_modified=None):
+        return {
+            'success': True, 'platform': 'generic', 'url': url, 'headline': 'Oferta incrível hoje',
+            'description': 'Resolva seu problema agora.', 'images': [], 'cta': 'Comprar', 'landing_page': url,
+        }
+
+
+class FakeExporter:
+    success = True
+
+    def __init__(self, output_dir, pdf_mode='full'):
+        pass
+
+    def export_all(self, ad_data, analysis_result):
+        if self.success:
+            return {'success': True, 'results': {'html': {'success': True}}}
+        return {'success': False, 'results': {'pdf': {'success': False, 'error': 'disco cheio'}}}
+
+
+def test_failed_export_keeps_the_page_pending_for_reprocessing(monkeypatch, tmp_path):
+    monkeypatch.setattr(monitor, 'AdScraper', FakeScraper)
+    monkeypatch.setattr(monitor, 'ResultExporter', FakeExporter)
+    monkeypatch.setattr(FakeExporter, 'success', False)
+    changes = monitor.ChangeMonitor(str(tmp_path / 'monitor.db'), output_dir=str(tmp_path / 'out'))
+    changes.add(['https://exemplo.com/produto'])
+
+    assert changes.run_once(workers=1)['failed'] == 1
+    page = changes._conn.execute('SELECT fingerprint, error FROM pages').fetchone()
+    assert page == (None, 'disco cheio')
+
+    # Export volta a funcionar: a mesma versão é reprocessada e então registrada
+    monkeypatch.setattr(FakeExporter, 'success', True)
+    page = changes.due(now=float('inf'))[0]
+    assert changes.check(page)['status'] == 'changed'
+    assert changes.check(changes.due(now=float('inf'))[0])['status'] == 'unchanged'
+    changes.close()
@@ -0,0 +1,34 @@
+import pipeline
+
+
+class FakeScraper:
+    def __init__(self, **kwargs):
+        pass
+
+    def scrape_ad(self, url):
+        if 'falha' in url:
+            return {'success': False, 'error': 'Erro ao acessar a URL: 500', 'platform': 'generic'}
+        return {
+            'success': True, 'platform': 'generic', 'url': url, 'headline': 'Oferta incrível hoje',
+            'description': 'Resolva seu problema agora.', 'images': [], 'cta': 'Comprar', 'landing_page': url,
+        }
+
+
+def test_pipeline_processes_every_url_and_reports_failures(monkeypatch):
+    monkeypatch.setattr(pipeline, 'AdScraper', FakeScraper)
+    urls = [f"https://exemplo.com/{i}" for i in range(20)] + ['https://exemplo.com/falha', '']
+
+    items = {item['index']: item for item in pipeline.run_pipeline(urls, scrape_workers=3, queue_size=2)}
+
+    assert len(items) == 21
+    scraped = [items[i] for i in range(20)]
+    # O PDF depende de pacotes opcionais; os demais formatos são sempre gerados
+    assert all(item['stage'] == 'export' and item['export']['results']['html']['success'] for item in scraped)
+    failed = items[20]
+    assert not failed['success'] and failed['stage'] == 'scrape' and '500' in failed['error']
+
+
+def test_pipeline_can_stop_after_analysis(monkeypatch):
+    monkeypatch.setattr(pipeline, 'AdScraper', FakeScraper)
+    items = list(pipeline.run_pipeline(['https://exemplo.com/1'], export=False))
+    assert items[0]['success'] and items[0]['analysis']['variations'] and 'export' not in items[0]
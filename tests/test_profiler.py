@@ -0,0 +1,27 @@
+import threading
+
+from profiler import StageProfiler
+
+
+def test_only_one_call_is_profiled_at_a_time(tmp_path):
+    profiler = StageProfiler(sample_rate=1, output_dir=str(tmp_path))
+    inside = threading.Event()
+    release = threading.Event()
+
+    def slow_stage():
+        with profiler.profile('scrape', 'generic'):
+            inside.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=slow_stage)
+    thread.start()
+    inside.wait(5)
+    # Segunda chamada concorrente: descartada em vez de levantar ou esperar
+    with profiler.profile('scrape', 'generic'):
+        sum(range(1000))
+    release.set()
+    thread.join()
+
+    summary = profiler._summary[('scrape', 'generic')]
+    assert summary['calls'] == 2 and summary['samples'] == 1 and summary['skipped'] == 1
+    assert profiler.write_reports(str(tmp_path / 'report'))
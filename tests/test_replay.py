@@ -0,0 +1,64 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from replay import FixtureRecorder, FixtureServer, FixtureStore
+from scraper import AdScraper
+
+
+class _RedirectHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/start':
+            self.send_response(302)
+            self.send_header('Location', '/final')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = b'<html><h1>Destino final</h1></html>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_server_replays_fixtures_over_one_keepalive_connection(tmp_path):
+    url = 'https://exemplo.com/produto'
+    FixtureStore(str(tmp_path)).add(url, b'<html><h1>Oferta</h1></html>')
+
+    with FixtureServer(str(tmp_path)) as server, requests.Session() as session:
+        bodies = [session.get(server.url_for(url), timeout=5).content for _ in range(3)]
+        missing = session.get(f"{server.base_url}/inexistente", timeout=5)
+
+    assert bodies == [b'<html><h1>Oferta</h1></html>'] * 3
+    assert missing.status_code == 404
+    assert server.stats['connections'] == 1 and server.stats['requests'] == 4 and server.stats['not_found'] == 1
+
+
+def test_recorded_redirect_chain_is_replayed(tmp_path):
+    origin = ThreadingHTTPServer(('127.0.0.1', 0), _RedirectHandler)
+    threading.Thread(target=origin.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{origin.server_address[1]}"
+    try:
+        recorder = FixtureRecorder(str(tmp_path))
+        recorder.install(AdScraper(session=requests.Session())).session.get(f"{base}/start", timeout=5)
+    finally:
+        origin.shutdown()
+        origin.server_close()
+
+    entry = FixtureStore(str(tmp_path)).index[f"{base}/start"]
+    assert entry['status'] == 302 and entry['location'] == f"{base}/final"
+
+    # Origem desligada: a cadeia inteira vem das fixtures
+    with FixtureServer(str(tmp_path)) as server:
+        scraper = server.install(AdScraper(session=requests.Session()))
+        response = scraper.session.get(f"{base}/start", timeout=5)
+        result = scraper.scrape_ad(f"{base}/start")
+
+    assert response.status_code == 200 and len(response.history) == 1
+    assert response.content == b'<html><h1>Destino final</h1></html>'
+    assert result['success'] and result['headline'] == 'Destino final'
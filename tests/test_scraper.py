@@ -0,0 +1,28 @@
+import requests
+
+from replay import FixtureServer, FixtureStore
+from scraper import AdScraper
+
+
+def _card(i):
+    return (f"<div class='videoCube'><span class='video-title'>Oferta {i}</span>"
+            f"<a class='videoCube_thumbnail_link' href='https://loja.com/{i}'></a></div>")
+
+
+def test_listing_keeps_going_when_one_page_fails(tmp_path):
+    first = 'https://trc.taboola.com/lista?page=1'
+    second = 'https://trc.taboola.com/lista?page=2'
+    broken = 'https://trc.taboola.com/quebrada'
+    store = FixtureStore(str(tmp_path))
+    store.add(first, f"<html><link rel='next' href='{second}'>{_card(1)}{_card(2)}</html>".encode('utf-8'))
+    store.add(second, f"<html>{_card(2)}{_card(3)}</html>".encode('utf-8'))
+    store.add(broken, b'Erro interno', status=500)
+
+    with FixtureServer(str(tmp_path)) as server:
+        scraper = server.install(AdScraper(session=requests.Session()))
+        results = list(scraper.scrape_listing([broken, first], workers=2))
+
+    failed = [r for r in results if not r['success']]
+    assert len(failed) == 1 and failed[0]['url'] == broken and '500' in failed[0]['error']
+    # O card repetido na segunda página aparece uma vez só
+    assert sorted(r['headline'] for r in results if r['success']) == ['Oferta 1', 'Oferta 2', 'Oferta 3']
@@ -0,0 +1,56 @@
+import json
+import threading
+import http.client
+
+import pytest
+
+import server as api
+
+
+@pytest.fixture
+def running_server():
+    httpd = api.create_server(port=0, scrape_workers=1, analyze_workers=1, pdf_workers=1)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+    httpd.service.shutdown()
+
+
+def _post(httpd, path, payload):
+    connection = http.client.HTTPConnection('127.0.0.1', httpd.server_address[1], timeout=10)
+    connection.request('POST', path, json.dumps(payload), {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    return response.status, response.getheader('Content-Type'), response.read()
+
+
+def test_export_streams_html(running_server, ad_data, analysis):
+    status, content_type, body = _post(running_server, '/api/export',
+                                       {'ad_data': ad_data, 'analysis_result': analysis, 'format': 'html'})
+    assert status == 200 and content_type.startswith('text/html')
+    assert ad_data['headline'].encode('utf-8') in body
+
+
+def test_export_rejects_invalid_payload_before_streaming(running_server):
+    status, content_type, body = _post(running_server, '/api/export',
+                                       {'ad_data': 'texto', 'analysis_result': {'original': {}}})
+    assert status == 400 and content_type.startswith('application/json')
+    assert not json.loads(body)['success']
+
+
+def test_export_render_error_is_json_500(running_server, ad_data, analysis, monkeypatch):
+    def broken_stream(*args, **kwargs):
+        raise RuntimeError('falha de renderização')
+        yield b''
+    monkeypatch.setattr(running_server.service.exporter, 'stream', broken_stream)
+
+    status, content_type, body = _post(running_server, '/api/export', {'ad_data': ad_data, 'analysis_result': analysis})
+    assert status == 500 and json.loads(body)['error'] == 'falha de renderização'
+
+
+def test_queue_gauges_use_own_counters(running_server, ad_data):
+    service = running_server.service
+    service.analyze(ad_data)
+    service.update_gauges()
+    assert service._pending == {'scrape': 0, 'analyze': 0, 'pdf': 0}
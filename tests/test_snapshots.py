@@ -0,0 +1,49 @@
+import pytest
+
+zstandard = pytest.importorskip('zstandard')
+
+from snapshots import SnapshotArchive
+
+
+def _page(i):
+    return (f"<html><head><title>Oferta {i}</title></head><body><div class='ad'>"
+            f"<h1>Produto {i} com desconto</h1><p>Compre hoje o item {i * 7} e ganhe frete grátis.</p>"
+            f"<a class='cta' href='/comprar/{i}'>Comprar agora</a></div></body></html>").encode('utf-8')
+
+
+def _wait_training(archive):
+    trainer = archive._trainer
+    if trainer is not None:
+        trainer.join()
+
+
+def test_pages_are_deduplicated_and_dictionary_is_trained_in_background(tmp_path):
+    with SnapshotArchive(str(tmp_path), train_after=50, dict_size=4096) as archive:
+        keys = [archive.put(f"https://exemplo.com/{i}", _page(i), platform='generic') for i in range(60)]
+        assert archive.put('https://exemplo.com/copia', _page(0)) == keys[0]
+        _wait_training(archive)
+        trained = archive.put('https://exemplo.com/nova', _page(999))
+
+        stats = archive.stats()
+        assert stats['snapshots'] == 62 and stats['blobs'] == 61
+        assert stats['dictionary'] and stats['train_error'] is None
+        assert archive.get(keys[10]) == _page(10) and archive.get(trained) == _page(999)
+        assert archive.latest('https://exemplo.com/copia') == _page(0)
+
+
+def test_training_failure_is_recorded_and_backed_off(tmp_path, monkeypatch):
+    calls = []
+
+    def broken_training(dict_size, samples):
+        calls.append(len(samples))
+        raise zstandard.ZstdError('amostras insuficientes')
+
+    monkeypatch.setattr(zstandard, 'train_dictionary', broken_training)
+    with SnapshotArchive(str(tmp_path), train_after=5, train_backoff=3600) as archive:
+        for i in range(20):
+            archive.put(f"https://exemplo.com/{i}", _page(i))
+            _wait_training(archive)
+
+        assert len(calls) == 1
+        assert 'amostras insuficientes' in archive.stats()['train_error']
+        assert archive.stats()['dictionary'] == 0 and archive.get(archive.put('x', _page(1))) == _page(1)
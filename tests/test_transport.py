@@ -0,0 +1,48 @@
+import socket
+
+import pytest
+import requests
+
+import transport
+from replay import FixtureServer, FixtureStore
+
+
+def test_dns_cache_is_opt_in(monkeypatch):
+    monkeypatch.setattr(transport, '_dns_cache', None)
+    original = socket.getaddrinfo
+    transport.Transport().create_session().close()
+    assert socket.getaddrinfo is original and transport._dns_cache is None
+
+
+def test_dns_cache_honours_ttl_and_counts_under_lock(monkeypatch):
+    monkeypatch.setattr(transport, '_dns_cache', None)
+    cache = transport.dns_cache(10)
+    assert transport.dns_cache(20) is cache and cache.ttl == 20
+
+    lookups = []
+    cache._original = lambda *args: lookups.append(args) or [('resolvido',)]
+    assert cache.getaddrinfo('exemplo.com', 443) == cache.getaddrinfo('exemplo.com', 443) == [('resolvido',)]
+    assert len(lookups) == 1 and (cache.hits, cache.misses) == (1, 1)
+
+
+def test_http2_adapter_streams_and_honours_verify_and_proxies(tmp_path):
+    pytest.importorskip('h2')
+    url = 'https://exemplo.com/produto'
+    body = b'<html>' + b'x' * 100000 + b'</html>'
+    FixtureStore(str(tmp_path)).add(url, body)
+
+    adapter = transport.Http2Adapter()
+    with FixtureServer(str(tmp_path)) as server, requests.Session() as session:
+        session.trust_env = False
+        session.mount('http://', adapter)
+        response = session.get(server.url_for(url), stream=True, timeout=(5, 5))
+        assert b''.join(response.iter_content(4096)) == body
+        response.close()
+
+        session.get(server.url_for(url), verify=False, timeout=5).raise_for_status()
+        assert len(adapter._clients) == 2
+
+        # Proxy inacessível: a requisição precisa passar por ele e falhar
+        with pytest.raises(requests.ConnectionError):
+            session.get(server.url_for(url), proxies={'http': 'http://127.0.0.1:9'}, timeout=5)
+    adapter.close()